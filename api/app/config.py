@@ -9,3 +9,104 @@ DEVICE = os.getenv("DEVICE", "auto")
 MAX_LENGTH = int(os.getenv("MAX_LENGTH", "512")) 
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+
+# Simulation engine: "per_impression", "aggregate" or "analytic"
+SIMULATION_ENGINE = os.getenv("SIMULATION_ENGINE", "aggregate")
+
+# Largest number of scenarios a single /simulate/sweep request may evaluate
+MAX_SWEEP_SCENARIOS = int(os.getenv("MAX_SWEEP_SCENARIOS", "100000"))
+# Per-impression sweeps draw every impression of every scenario; cap scenarios x impressions for that engine
+MAX_SWEEP_IMPRESSION_DRAWS = int(os.getenv("MAX_SWEEP_IMPRESSION_DRAWS", "100000000"))
+# Threads a batch simulation spreads its scenario chunks over; results do not depend on it
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", "1"))
+# Long-lived process pool started with the app for very large runs (0 disables it). Per-impression runs
+# above SIMULATION_SHARD_IMPRESSIONS are split into shards of that size and summed, pooled or not
+SIMULATION_PROCESSES = int(os.getenv("SIMULATION_PROCESSES", "0"))
+SIMULATION_SHARD_IMPRESSIONS = int(os.getenv("SIMULATION_SHARD_IMPRESSIONS", "4000000"))
+
+# LLM parameter-extraction cache: memory LRU tier plus optional SQLite tier (set LLM_CACHE_DB_PATH to enable)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "")
+LLM_CACHE_MAX_DISK_ENTRIES = int(os.getenv("LLM_CACHE_MAX_DISK_ENTRIES", "100000"))
+
+# Async LLM request path: per-call timeout, in-flight call limit and HTTP connection pool size
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+# Resilient OpenAI calls: overall deadline per call (retries and hedges included), retries with jittered
+# exponential backoff, an optional hedged duplicate once a call outlasts the recent latency quantile, and a
+# circuit breaker that serves the fallback for LLM_CIRCUIT_RESET_SECONDS after consecutive failures
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF_MS = float(os.getenv("LLM_RETRY_BACKOFF_MS", "200"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+# Streamed insights: the deadline covers opening the stream and its first text; after that each chunk
+# only has to arrive within this many seconds, however long the whole insight takes
+LLM_STREAM_IDLE_TIMEOUT_SECONDS = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT_SECONDS", "10"))
+# Structured parameter extraction: "json_schema" (OpenAI strict schema, HF grammar-constrained decoding),
+# "json_object" (OpenAI JSON mode, HF grammar) or "off"; the output is validated either way
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "json_schema")
+# Token budget for HF parameter extraction; constrained decoding stops at the closing brace well before it
+HF_PARAMS_MAX_NEW_TOKENS = int(os.getenv("HF_PARAMS_MAX_NEW_TOKENS", "64"))
+# CPU inference mode for the Hugging Face model when CUDA is unavailable: "none" (float32) or "int8" (dynamic
+# quantization: linear-layer weights stored as int8, activations quantized on the fly). Check a model with
+# python -m benchmarks.quantization_check before serving it quantized
+HF_CPU_QUANTIZATION = os.getenv("HF_CPU_QUANTIZATION", "none").lower()
+# Intra-op threads for CPU inference (0 keeps torch's default of every core); set it to cores / replicas per box
+HF_CPU_THREADS = int(os.getenv("HF_CPU_THREADS", "0"))
+# Hugging Face prompt-prefix cache: past key values of each prompt template's fixed instruction block, computed once
+# per model and reused by every generation; least recently used entries go when the byte budget is exceeded
+HF_PREFIX_CACHE_ENABLED = os.getenv("HF_PREFIX_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+HF_PREFIX_CACHE_MAX_MB = float(os.getenv("HF_PREFIX_CACHE_MAX_MB", "512"))
+# Threads dedicated to blocking Hugging Face inference, kept off the event loop
+HF_EXECUTOR_WORKERS = int(os.getenv("HF_EXECUTOR_WORKERS", "1"))
+
+# Hugging Face micro-batching: concurrent prompts are grouped up to a size or wait limit
+HF_BATCHING_ENABLED = os.getenv("HF_BATCHING_ENABLED", "true").lower() in ("1", "true", "yes")
+HF_BATCH_MAX_SIZE = int(os.getenv("HF_BATCH_MAX_SIZE", "8"))
+HF_BATCH_MAX_WAIT_MS = float(os.getenv("HF_BATCH_MAX_WAIT_MS", "10"))
+
+# Shared model server for multi-worker deployments: when a socket path is set, API workers send Hugging Face
+# generations to the one inference process listening there (python -m app.utils.model_server) instead of each
+# loading the model. The server batches across workers and refuses work beyond HF_MODEL_SERVER_MAX_PENDING
+# in-flight generations, so callers fall back instead of queueing without bound
+HF_MODEL_SERVER_SOCKET = os.getenv("HF_MODEL_SERVER_SOCKET", "")
+HF_MODEL_SERVER_MAX_PENDING = int(os.getenv("HF_MODEL_SERVER_MAX_PENDING", "64"))
+# How long a worker's startup preload waits for the model server to answer
+HF_MODEL_SERVER_WAIT_SECONDS = float(os.getenv("HF_MODEL_SERVER_WAIT_SECONDS", "300"))
+
+# Load the Hugging Face model at startup instead of on the first HF request, then run one short generation
+HF_PRELOAD = os.getenv("HF_PRELOAD", "false").lower() in ("1", "true", "yes")
+HF_WARMUP = os.getenv("HF_WARMUP", "true").lower() in ("1", "true", "yes")
+
+# Default LLM backend when a request does not pick one: "openai", "huggingface" or "stub"
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+# Artificial latency of the offline stub backend, per call and per streamed token
+STUB_LLM_LATENCY_MS = float(os.getenv("STUB_LLM_LATENCY_MS", "0"))
+STUB_LLM_TOKEN_LATENCY_MS = float(os.getenv("STUB_LLM_TOKEN_LATENCY_MS", "0"))
+
+# Structured JSON logs: minimum level, and the fraction of INFO/DEBUG records kept (warnings and errors are always kept)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+# Adaptive simulation: impressions double from the minimum until the conversion-rate confidence interval's
+# half-width is within the relative target, the ROI fit tag is settled, or the maximum is reached
+ADAPTIVE_MIN_IMPRESSIONS = int(os.getenv("ADAPTIVE_MIN_IMPRESSIONS", "2000"))
+ADAPTIVE_MAX_IMPRESSIONS = int(os.getenv("ADAPTIVE_MAX_IMPRESSIONS", "10000000"))
+ADAPTIVE_TARGET_HALF_WIDTH = float(os.getenv("ADAPTIVE_TARGET_HALF_WIDTH", "0.05"))
+ADAPTIVE_CONFIDENCE = float(os.getenv("ADAPTIVE_CONFIDENCE", "0.95"))
+
+# Batch campaign jobs: SQLite result store, items per job, campaigns evaluated at once across all jobs,
+# and campaign starts per second (0 for no limit) so a big portfolio cannot exhaust the LLM quota
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "1000"))
+BATCH_JOB_CONCURRENCY = int(os.getenv("BATCH_JOB_CONCURRENCY", "8"))
+BATCH_JOB_RATE_PER_SECOND = float(os.getenv("BATCH_JOB_RATE_PER_SECOND", "5"))
+
+# Identical /simulate requests in flight at the same time share one computation (and its LLM calls)
+SIMULATE_COALESCING_ENABLED = os.getenv("SIMULATE_COALESCING_ENABLED", "true").lower() in ("1", "true", "yes")
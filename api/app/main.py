@@ -1,18 +1,77 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import sys
+from contextlib import asynccontextmanager
+import numpy as np
+from typing import Annotated, Literal, Optional
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from app.models.models import SimulationRequest, SimulationResponse
-from app.simulator.simulator import run_market_fit_simulation
-from app.utils.gpt_utils import get_chatgpt_marketing_insight, get_simulation_params_from_context
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.config import MAX_SWEEP_SCENARIOS, MAX_SWEEP_IMPRESSION_DRAWS, MAX_BATCH_ITEMS, HF_PRELOAD, HF_WARMUP, OPENAI_API_KEY, SIMULATION_ENGINE, SIMULATION_PROCESSES, SIMULATE_COALESCING_ENABLED
+from app.models.models import (
+    BatchItem, BatchJobResponse, BatchSimulationRequest, HorizonRequest, HorizonResponse, JobStatus, OptimizeRequest, OptimizeResponse,
+    SimulationRequest, SimulationResponse, SweepRequest, SweepResponse
+)
+from app.simulator.funnel import run_funnel_simulation
+from app.simulator.horizon import DAILY_KEYS, run_horizon_simulation
+from app.simulator.optimizer import optimize_allocation
+from app.simulator.pool import pool_stats, shutdown_pool, start_pool
+from app.simulator.simulator import run_adaptive_simulation, run_market_fit_simulation, run_market_fit_simulation_batch, spawn_seeds
+from app.utils import gpt_utils
+from app.utils.backends import LLMBackend, available_backends, get_backend, resolve_backend
+from app.utils.cache import params_cache
+from app.utils.coalescing import SingleFlight, make_request_key
+from app.utils.jobs import get_job_runner, get_running_job_runner
+from app.utils.logging_utils import get_logger
+from app.utils.metrics import MetricsMiddleware, registry, time_stage
+
+log = get_logger(__name__)
+
+# Hugging Face support is optional. Only check that it is installed here: importing
+# hf_utils pulls in transformers and torch, which OpenAI-only deployments never need.
+HF_AVAILABLE = get_backend("huggingface").is_available()
+if not HF_AVAILABLE:
+    log.warning("hf_unavailable", reason="transformers or torch not installed")
+
+# Outcome of the optional startup preload, reported by /ready
+_hf_preload = {"state": "pending" if HF_PRELOAD and HF_AVAILABLE else "disabled", "error": None}
+
+
+def _hf_utils():
+    """Import the Hugging Face backend on first use"""
+    return get_backend("huggingface").module()
 
-# Try to import Hugging Face utilities, but make it optional
-try:
-    from app.utils.hf_utils import get_hf_marketing_insight, get_hf_simulation_params_from_context
-    HF_AVAILABLE = True
-except ImportError:
-    HF_AVAILABLE = False
-    print("⚠️  Hugging Face utilities not available (transformers not installed)")
 
-app = FastAPI(title="AI Marketing Agent")
+async def _preload_hf_backend():
+    # Import, load and warm up off the event loop so the server keeps answering /health meanwhile
+    loop = asyncio.get_running_loop()
+    _hf_preload["state"] = "loading"
+    try:
+        hf_utils = await loop.run_in_executor(None, _hf_utils)
+        await loop.run_in_executor(None, hf_utils.warm_up_hf_model, HF_WARMUP)
+        _hf_preload["state"] = "ready"
+        log.info("hf_preloaded", **hf_utils.get_hf_load_stats())
+    except Exception as e:
+        _hf_preload.update(state="failed", error=str(e))
+        log.error("hf_preload_failed", error=str(e))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    preload_task = asyncio.create_task(_preload_hf_backend()) if _hf_preload["state"] == "pending" else None
+    if SIMULATION_PROCESSES > 0:
+        await run_in_threadpool(start_pool, SIMULATION_PROCESSES)
+        log.info("simulation_pool_started", processes=SIMULATION_PROCESSES)
+    yield
+    if preload_task is not None:
+        preload_task.cancel()
+    if get_running_job_runner() is not None:
+        await get_running_job_runner().cancel_all()
+    await run_in_threadpool(shutdown_pool)
+
+
+app = FastAPI(title="AI Marketing Agent", lifespan=lifespan)
 
 # Add CORS middleware to allow frontend requests
 app.add_middleware(
@@ -27,57 +86,414 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
-@app.post("/simulate", response_model=SimulationResponse)
-def simulate(data: SimulationRequest):
+def _backend_for(data) -> LLMBackend:
+    try:
+        return resolve_backend(data.backend, data.use_hugging_face)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Step 1: Extract campaign performance probabilities and ROI threshold based on the inputs.
-    # Choose between OpenAI (default) or Hugging Face (GPT-OSS-120B) based on request parameter
-    if data.use_hugging_face:
-        if not HF_AVAILABLE:
-            # Fallback to OpenAI if Hugging Face is not available
-            print("⚠️  Hugging Face requested but not available, falling back to OpenAI...")
-            ctr, engagement, conversion, roi_threshold = get_simulation_params_from_context(data.company_description, data.advertisement_goal)
-        else:
-            print("Using Hugging Face GPT-OSS-120B for parameter extraction...")
-            ctr, engagement, conversion, roi_threshold = get_hf_simulation_params_from_context(data.company_description, data.advertisement_goal)
-    else:
-        print("Using OpenAI GPT-3.5-turbo for parameter extraction...")
-        ctr, engagement, conversion, roi_threshold = get_simulation_params_from_context(data.company_description, data.advertisement_goal)
-    
-    print("ROI Threshold", roi_threshold, "CTR: ", ctr, "Engagement: ", engagement, "Conversion: ", conversion)
 
-    # Step 2: Simulate 10,000 impressions using Monte Carlo simulation
-    # It models how users progress through the funnel: Impression -> Click -> Land -> Engage -> Convert
-    sim_result = run_market_fit_simulation(impressions=10000, ctr=ctr, engagement=engagement, conversion=conversion, roi_threshold=roi_threshold)
+async def _extract_simulation_params(company_description: str, advertisement_goal: str, backend: LLMBackend) -> tuple[float, float, float, float]:
+    with time_stage("params", backend.name):
+        params = await backend.extract_params(company_description, advertisement_goal)
+    ctr, engagement, conversion, roi_threshold = params
+    log.info("simulation_params", backend=backend.name, ctr=ctr, engagement=engagement, conversion=conversion, roi_threshold=roi_threshold)
+    return params
 
-    print("Fitness Score", sim_result.roi_fit_score)
 
-    # Step 3: Generate qualitative reasoning/suggestions based on simulation result
-    # Use the same model choice as parameter extraction
-    if data.use_hugging_face:
-        if not HF_AVAILABLE:
-            print("⚠️  Hugging Face requested but not available, falling back to OpenAI...")
-            ai_reasoning = get_chatgpt_marketing_insight(sim_result, data.company_description, data.advertisement_goal)
-        else:
-            print("Using Hugging Face GPT-OSS-120B for insights generation...")
-            ai_reasoning = get_hf_marketing_insight(sim_result, data.company_description, data.advertisement_goal)
+async def _run_simulation(params: tuple, data: SimulationRequest, backend: LLMBackend):
+    ctr, engagement, conversion, roi_threshold = params
+    with time_stage("simulation", backend.name):
+        try:
+            if data.funnel is not None:
+                # One vectorized pass over every segment, sized by the spec's own impression budget
+                sim_result = await run_in_threadpool(
+                    run_funnel_simulation, data.funnel, ctr, engagement, conversion, roi_threshold,
+                    engine=data.simulation_engine, rng=data.seed
+                )
+            elif data.adaptive:
+                # Up to ADAPTIVE_MAX_IMPRESSIONS, possibly sharded across the process pool; keep it off the event loop
+                sim_result = await run_in_threadpool(
+                    run_adaptive_simulation, ctr, engagement, conversion, roi_threshold,
+                    engine=data.simulation_engine, target_half_width=data.target_half_width, rng=data.seed
+                )
+            else:
+                sim_result = run_market_fit_simulation(impressions=10000, ctr=ctr, engagement=engagement, conversion=conversion, roi_threshold=roi_threshold, engine=data.simulation_engine, rng=data.seed)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    log.info(
+        "simulation_result", backend=backend.name, engine=sim_result.engine, impressions=sim_result.total_impressions,
+        roi_fit_score=sim_result.roi_fit_score, roi_fit_tag=sim_result.roi_fit_tag, stopping_reason=sim_result.stopping_reason,
+        segments=len(sim_result.segments) if sim_result.segments else None
+    )
+    return sim_result
+
+
+def _build_response(sim_result, ai_reasoning: str) -> SimulationResponse:
+    if sim_result.stage_counts is not None:
+        # Custom funnels report their own stages; the default stage names give the usual keys
+        stats = {"total_impressions": sim_result.total_impressions, **{f"total_{name}": count for name, count in sim_result.stage_counts.items()}}
     else:
-        print("Using OpenAI GPT-3.5-turbo for insights generation...")
-        ai_reasoning = get_chatgpt_marketing_insight(sim_result, data.company_description, data.advertisement_goal)
-    print("AI Reasoning: ", ai_reasoning)
-    
-    response = SimulationResponse(
-        user_journey_stats={
+        stats = {
             "total_impressions": sim_result.total_impressions,
             "total_clicks": sim_result.total_clicks,
             "total_landings": sim_result.total_landings,
             "total_engagements": sim_result.total_engagements,
             "total_conversions": sim_result.total_conversions
-        },
+        }
+    return SimulationResponse(
+        user_journey_stats=stats,
         roi_fit_score=sim_result.roi_fit_score,
         roi_fit_tag=sim_result.roi_fit_tag,
-        recommendations=[ai_reasoning]
+        recommendations=[ai_reasoning],
+        samples_used=sim_result.total_impressions,
+        confidence_interval=sim_result.confidence_interval,
+        stopping_reason=sim_result.stopping_reason,
+        seed=sim_result.seed,
+        segments=sim_result.segments
+    )
+
+
+async def _simulate_pipelined(data: SimulationRequest, backend: LLMBackend):
+    """Yield (event, payload) pairs: params, simulation, one insight per text chunk, then the full response"""
+
+    # Start the insight prefix alongside parameter extraction instead of after the simulation
+    prepare_task = asyncio.create_task(backend.prepare_insight(data.company_description, data.advertisement_goal))
+    try:
+        params = await _extract_simulation_params(data.company_description, data.advertisement_goal, backend)
+        yield "params", dict(zip(("ctr", "engagement", "conversion", "roi_threshold"), params))
+
+        sim_result = await _run_simulation(params, data, backend)
+        response = _build_response(sim_result, "")
+        yield "simulation", response.model_dump(exclude={"recommendations"})
+
+        try:
+            prepared = await prepare_task
+        except Exception as e:
+            # The stream functions prepare on their own when given nothing
+            log.warning("insight_prepare_failed", backend=backend.name, error=str(e))
+            prepared = None
+
+        chunks = []
+        with time_stage("insight", backend.name):
+            async for chunk in backend.stream_insight(sim_result, data.company_description, data.advertisement_goal, prepared):
+                chunks.append(chunk)
+                yield "insight", chunk
+
+        response.recommendations = ["".join(chunks).strip()]
+        log.info("insight_generated", backend=backend.name, chunks=len(chunks), chars=len(response.recommendations[0]))
+        yield "done", response.model_dump()
+    finally:
+        # A failed simulation or a client that went away must not leave the prefix task running
+        prepare_task.cancel()
+
+
+# Identical /simulate requests in flight together (double clicks, client retries, dashboard refreshes) share one run
+simulate_flights = SingleFlight("/simulate")
+
+
+def _simulate_key(data: SimulationRequest, backend: LLMBackend) -> str:
+    options = data.model_dump(exclude={"company_description", "advertisement_goal", "use_hugging_face", "backend"})
+    return make_request_key(backend.name, options, texts=(data.company_description, data.advertisement_goal))
+
+
+@app.post("/simulate", response_model=SimulationResponse)
+async def simulate(data: SimulationRequest):
+    backend = _backend_for(data)
+
+    if data.pipelined:
+        # One JSON object per line, flushed as each stage completes
+        async def ndjson():
+            try:
+                async for event, payload in _simulate_pipelined(data, backend):
+                    yield json.dumps({"event": event, "data": payload}) + "\n"
+            except Exception as e:
+                # Headers are already sent, so the failure is reported as a final line
+                log.error("stream_failed", backend=backend.name, error=str(e))
+                yield json.dumps({"event": "error", "data": {"detail": str(e)}}) + "\n"
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    if not SIMULATE_COALESCING_ENABLED:
+        return await _simulate_once(data, backend)
+    return await simulate_flights.do(_simulate_key(data, backend), lambda: _simulate_once(data, backend))
+
+
+async def _simulate_once(data: SimulationRequest, backend: LLMBackend) -> SimulationResponse:
+    # Step 1: Extract campaign performance probabilities and ROI threshold based on the inputs.
+    params = await _extract_simulation_params(data.company_description, data.advertisement_goal, backend)
+
+    # Step 2: Simulate 10,000 impressions using Monte Carlo simulation
+    # It models how users progress through the funnel: Impression -> Click -> Land -> Engage -> Convert
+    sim_result = await _run_simulation(params, data, backend)
+
+    # Step 3: Generate qualitative reasoning/suggestions based on simulation result
+    # Use the same model choice as parameter extraction
+    with time_stage("insight", backend.name):
+        ai_reasoning = await backend.generate_insight(sim_result, data.company_description, data.advertisement_goal)
+    log.info("insight_generated", backend=backend.name, chars=len(ai_reasoning))
+    log.debug("insight_text", backend=backend.name, text=ai_reasoning)
+
+    return _build_response(sim_result, ai_reasoning)
+
+
+def _sse(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def _sse_stream(data: SimulationRequest, backend: LLMBackend):
+    try:
+        async for event, payload in _simulate_pipelined(data, backend):
+            yield _sse(event, payload)
+    except Exception as e:
+        log.error("stream_failed", backend=backend.name, error=str(e))
+        yield _sse("error", {"detail": str(e)})
+
+
+# Keep proxies (nginx, Vercel) from buffering the stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@app.get("/simulate/stream")
+async def simulate_stream_get(data: Annotated[SimulationRequest, Query()]):
+    """Server-Sent Events version of /simulate for EventSource clients, with the request as query parameters"""
+    return StreamingResponse(_sse_stream(data, _backend_for(data)), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.post("/simulate/stream")
+async def simulate_stream(data: SimulationRequest):
+    """Server-Sent Events version of /simulate.
+
+    Emits "params" (extracted ctr/engagement/conversion/roi_threshold), "simulation"
+    (user_journey_stats and ROI fit), one "insight" per generated text chunk, then
+    "done" with the full SimulationResponse, or "error" if a stage fails.
+    """
+    return StreamingResponse(_sse_stream(data, _backend_for(data)), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.post("/simulate/sweep", response_model=SweepResponse)
+async def simulate_sweep(data: SweepRequest):
+
+    # Step 1: Resolve base parameters, spending at most one LLM call for the whole grid
+    base = {"ctr": data.ctr, "engagement": data.engagement, "conversion": data.conversion, "roi_threshold": data.roi_threshold}
+    if any(value is None for value in base.values()):
+        if not (data.company_description and data.advertisement_goal):
+            raise HTTPException(status_code=400, detail="Provide ctr, engagement, conversion and roi_threshold, or a company_description and advertisement_goal to estimate them")
+        estimated = await _extract_simulation_params(data.company_description, data.advertisement_goal, _backend_for(data))
+        base = {key: estimated[i] if value is None else value for i, (key, value) in enumerate(base.items())}
+
+    ctr_values = data.ctr_values or [base["ctr"]]
+    engagement_values = data.engagement_values or [base["engagement"]]
+    conversion_values = data.conversion_values or [base["conversion"]]
+
+    scenarios = len(ctr_values) * len(engagement_values) * len(conversion_values)
+    if scenarios > MAX_SWEEP_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"Sweep of {scenarios} scenarios exceeds the limit of {MAX_SWEEP_SCENARIOS}")
+    if (data.simulation_engine or SIMULATION_ENGINE) == "per_impression" and scenarios * data.impressions > MAX_SWEEP_IMPRESSION_DRAWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Per-impression sweep of {scenarios} scenarios x {data.impressions} impressions exceeds {MAX_SWEEP_IMPRESSION_DRAWS} draws; use fewer scenarios or another engine"
+        )
+
+    # Step 2: Simulate the whole grid in one vectorized pass, off the event loop since large grids take a while
+    ctr_grid, engagement_grid, conversion_grid = np.meshgrid(ctr_values, engagement_values, conversion_values, indexing="ij")
+    with time_stage("sweep_simulation"):
+        batch = await run_in_threadpool(
+            run_market_fit_simulation_batch,
+            impressions=data.impressions,
+            ctr=ctr_grid,
+            engagement=engagement_grid,
+            conversion=conversion_grid,
+            roi_threshold=base["roi_threshold"],
+            engine=data.simulation_engine,
+            rng=data.seed
+        )
+    log.info("sweep_simulated", scenarios=scenarios, impressions=data.impressions)
+
+    return SweepResponse(
+        base_params=base,
+        ctr_values=ctr_values,
+        engagement_values=engagement_values,
+        conversion_values=conversion_values,
+        roi_threshold=base["roi_threshold"],
+        roi_fit_score_grid=batch["roi_fit_score"].tolist(),
+        roi_fit_tag_grid=batch["roi_fit_tag"].tolist(),
+        seed=batch["seed"]
+    )
+
+
+async def _evaluate_campaign(item: BatchItem, data: BatchSimulationRequest, backend: LLMBackend, seed: int) -> dict:
+    # The /simulate steps for one portfolio item; the parameter cache spans items and jobs
+    request = SimulationRequest(
+        company_description=item.company_description, advertisement_goal=item.advertisement_goal,
+        backend=backend.name, simulation_engine=data.simulation_engine, seed=seed
+    )
+    params = await _extract_simulation_params(item.company_description, item.advertisement_goal, backend)
+    sim_result = await _run_simulation(params, request, backend)
+    if not data.include_insight:
+        response = _build_response(sim_result, "")
+        response.recommendations = []
+        return response.model_dump()
+    with time_stage("insight", backend.name):
+        ai_reasoning = await backend.generate_insight(sim_result, item.company_description, item.advertisement_goal)
+    return _build_response(sim_result, ai_reasoning).model_dump()
+
+
+@app.post("/simulate/batch", response_model=BatchJobResponse, status_code=202)
+async def simulate_batch(data: BatchSimulationRequest):
+    """Queue a portfolio of campaigns and return a job id right away; poll GET /jobs/{job_id} for results.
+
+    Items run in the background under BATCH_JOB_CONCURRENCY and BATCH_JOB_RATE_PER_SECOND,
+    shared by all jobs. Duplicate campaigns in a job are evaluated once. Each item gets its
+    own seed spawned from the job's seed.
+    """
+    if len(data.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch of {len(data.items)} items exceeds the limit of {MAX_BATCH_ITEMS}")
+    backend = _backend_for(data)
+    seeds = spawn_seeds(data.seed, len(data.items))
+
+    async def run_item(index: int, item: BatchItem) -> dict:
+        return await _evaluate_campaign(item, data, backend, seeds[index])
+
+    job_id = await get_job_runner().submit(data.items, run_item, options={**data.model_dump(exclude={"items"}), "backend": backend.name})
+    log.info("job_queued", job_id=job_id, items=len(data.items), backend=backend.name)
+    return BatchJobResponse(job_id=job_id, status="queued", total=len(data.items))
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+def job_status(
+    job_id: str,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int, Query(ge=1, le=500)] = 100,
+    status: Annotated[Optional[Literal["pending", "done", "failed"]], Query()] = None
+):
+    """Progress of a batch job and one page of its items in submission order, optionally filtered by item status"""
+    job = get_job_runner().store.get(job_id, offset=offset, limit=limit, status=status)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    return job
+
+
+@app.post("/simulate/horizon", response_model=HorizonResponse)
+async def simulate_horizon(data: HorizonRequest):
+    """Forecast a multi-day campaign: daily budgets, ad fatigue, retargeting of non-converters and delayed conversions.
+
+    Parameters missing from the request are estimated from the company and goal with one
+    LLM call. Returns daily user journey stats and the totals with their fit tag.
+    """
+    base = {"ctr": data.ctr, "engagement": data.engagement, "conversion": data.conversion, "roi_threshold": data.roi_threshold}
+    if any(value is None for value in base.values()):
+        if not (data.company_description and data.advertisement_goal):
+            raise HTTPException(status_code=400, detail="Provide ctr, engagement, conversion and roi_threshold, or a company_description and advertisement_goal to estimate them")
+        estimated = await _extract_simulation_params(data.company_description, data.advertisement_goal, _backend_for(data))
+        base = {key: estimated[i] if value is None else value for i, (key, value) in enumerate(base.items())}
+
+    with time_stage("horizon_simulation"):
+        try:
+            result = await run_in_threadpool(
+                run_horizon_simulation,
+                data.days,
+                data.daily_impressions,
+                **base,
+                audience_size=data.audience_size,
+                fatigue=data.fatigue,
+                retarget_share=data.retarget_share,
+                retarget_ctr_lift=data.retarget_ctr_lift,
+                retarget_window_days=data.retarget_window_days,
+                conversion_delay_days=data.conversion_delay_days,
+                conversion_window_days=data.conversion_window_days,
+                rng=data.seed
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    summary = result["summary"]
+    log.info("horizon_simulated", days=data.days, impressions=summary.total_impressions, roi_fit_score=summary.roi_fit_score)
+
+    stats = _build_response(summary, "").user_journey_stats
+    daily = result["daily"]
+    return HorizonResponse(
+        base_params=base,
+        user_journey_stats=stats,
+        roi_fit_score=summary.roi_fit_score,
+        roi_fit_tag=summary.roi_fit_tag,
+        daily=[{"day": day + 1, **{key: int(daily[key][day]) for key in DAILY_KEYS}} for day in range(data.days)],
+        pending_conversions=result["pending_conversions"],
+        seed=summary.seed
     )
 
-    return response
+
+@app.post("/optimize", response_model=OptimizeResponse)
+async def optimize(data: OptimizeRequest):
+    """Split an impression budget across candidate channel/creative parameter sets.
+
+    Maximizes expected conversions, or with objective "roi_fit" the probability of a
+    "High market fit" tag at roi_threshold, using common random numbers from the
+    aggregate engine. Also reports an even split for comparison.
+    """
+    with time_stage("optimize"):
+        try:
+            result = await run_in_threadpool(
+                optimize_allocation,
+                data.arms,
+                data.total_impressions,
+                objective=data.objective,
+                roi_threshold=data.roi_threshold,
+                slices=data.slices,
+                replications=data.replications,
+                rng=data.seed
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    log.info("allocation_optimized", arms=len(data.arms), objective=data.objective, expected_conversions=result["expected_conversions"])
+    return OptimizeResponse(**result)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counters and sizes of the LLM parameter-extraction cache, plus /simulate request coalescing"""
+    return {**params_cache.stats(), "coalescing": {"enabled": SIMULATE_COALESCING_ENABLED, **simulate_flights.stats()}}
+
+
+@app.get("/hf/batching/stats")
+def hf_batching_stats():
+    """Queue depth and batch-size counters of the Hugging Face micro-batcher"""
+    if not HF_AVAILABLE:
+        raise HTTPException(status_code=404, detail="Hugging Face utilities not available")
+    return _hf_utils().get_hf_batching_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Request, stage latency, token and cache counters in the Prometheus text exposition format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/backends")
+def backends():
+    """Registered LLM backends and whether each can serve requests here"""
+    return {"default": resolve_backend().name, "backends": available_backends()}
+
+
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving"""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: which LLM backends are loaded, with model load and warm-up timings"""
+    hf_module = sys.modules.get("app.utils.hf_utils")
+    huggingface = {
+        "available": HF_AVAILABLE,
+        "imported": hf_module is not None,
+        "preload": _hf_preload["state"],
+        "error": _hf_preload["error"],
+        **(hf_module.get_hf_load_stats() if hf_module is not None else {"loaded": False})
+    }
+    backends = {"openai": {"configured": bool(OPENAI_API_KEY), "circuit": gpt_utils.openai_breaker.stats()}, "huggingface": huggingface}
+
+    # Only a requested preload gates readiness; otherwise HF loads on first use
+    is_ready = _hf_preload["state"] in ("disabled", "ready")
+    return JSONResponse(status_code=200 if is_ready else 503, content={"ready": is_ready, "backends": backends, "simulation_pool": pool_stats()})
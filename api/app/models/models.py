@@ -1,10 +1,66 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, List, Dict, Optional, Literal, Union
+
+SimulationEngine = Literal["per_impression", "aggregate", "analytic"]
+Probability = Annotated[float, Field(ge=0, le=1)]
+DailyImpressions = Annotated[int, Field(ge=0, le=1000000000)]
+
+class FunnelStage(BaseModel):
+    name: str
+    rate: Optional[float] = Field(default=None, ge=0, le=1)  # Mean pass probability; None takes the default for the classic stages
+    noise: Optional[float] = Field(default=None, ge=0)  # Std dev of the per-impression rate; None: classic stage noise, else 0
+
+class FunnelChannel(BaseModel):
+    name: str
+    budget_share: float = Field(default=1.0, gt=0)  # Relative share of the impression budget
+    stage_rates: Dict[str, float] = {}  # Platform-specific stage rates, overriding the stage defaults
+
+class FunnelSegment(BaseModel):
+    name: str
+    channel: Optional[str] = None  # Defaults to the first channel
+    weight: float = Field(default=1.0, gt=0)  # Relative share of its channel's impressions
+    stage_rates: Dict[str, float] = {}  # Audience-specific stage rates, overriding the channel's
+
+class FunnelSpec(BaseModel):
+    impressions: int = Field(default=10000, gt=0, le=10000000)  # Total budget, split across channels by budget_share
+    stages: Optional[List[FunnelStage]] = None  # Defaults to clicks, landings, engagements, conversions
+    channels: List[FunnelChannel] = Field(default=[FunnelChannel(name="default")], min_length=1)
+    segments: Optional[List[FunnelSegment]] = None  # Defaults to one segment per channel
+
+class SegmentResult(BaseModel):
+    name: str
+    channel: str
+    impressions: int
+    stage_counts: Dict[str, int]
+    roi_fit_score: float
+    roi_fit_tag: str
+
+class CampaignParams(BaseModel):
+    """Parameters an LLM extracts from a campaign description, each a probability"""
+    ctr: float = Field(ge=0, le=1)
+    engagement: float = Field(ge=0, le=1)
+    conversion: float = Field(ge=0, le=1)
+    roi_threshold: float = Field(ge=0, le=1)
 
 class SimulationRequest(BaseModel):
     company_description: str
     advertisement_goal: str
     use_hugging_face: Optional[bool] = False  # Default to OpenAI, set True for Hugging Face
+    backend: Optional[str] = None  # Registered LLM backend name ("openai", "huggingface", "stub"); overrides use_hugging_face
+    simulation_engine: Optional[SimulationEngine] = None  # Defaults to SIMULATION_ENGINE
+    pipelined: Optional[bool] = False  # Stream NDJSON stage events and insight text as they are produced
+    adaptive: Optional[bool] = False  # Simulate until the conversion-rate confidence interval is tight or the fit tag is settled
+    target_half_width: Optional[float] = Field(default=None, gt=0, lt=1)  # Relative CI half-width for adaptive runs; defaults to ADAPTIVE_TARGET_HALF_WIDTH
+    seed: Optional[int] = Field(default=None, ge=0)  # Simulation RNG seed; a fresh one is picked and echoed when omitted
+    funnel: Optional[FunnelSpec] = None  # Custom stages, channels and segments; unset stage rates come from the extracted parameters
+
+    @model_validator(mode="after")
+    def _adaptive_needs_sampling(self):
+        if self.adaptive and self.simulation_engine == "analytic":
+            raise ValueError("adaptive simulation needs a sampling engine; the analytic engine has no sampling error")
+        if self.adaptive and self.funnel is not None:
+            raise ValueError("adaptive simulation is not supported for custom funnels")
+        return self
 
 class SimulationResult(BaseModel):
     total_impressions: int
@@ -14,9 +70,151 @@ class SimulationResult(BaseModel):
     total_conversions: int
     roi_fit_score: float
     roi_fit_tag: str
+    engine: str = "per_impression"
+    stage_variances: Optional[Dict[str, float]] = None  # Only set by the analytic engine
+    confidence_interval: Optional[List[float]] = None  # Bounds on roi_fit_score, only set by adaptive runs
+    stopping_reason: Optional[str] = None  # Adaptive runs: "precision", "decision" or "max_impressions"
+    seed: Optional[int] = None  # Seed that reproduces this result; None for the analytic engine or a caller-supplied Generator
+    stage_counts: Optional[Dict[str, int]] = None  # Custom funnels: survivors of every named stage
+    segments: Optional[List[SegmentResult]] = None  # Custom funnels: per-segment breakdown
 
 class SimulationResponse(BaseModel):
     user_journey_stats: Dict[str, int]
     roi_fit_score: float
     roi_fit_tag: str
-    recommendations: List[str]
\ No newline at end of file
+    recommendations: List[str]
+    samples_used: Optional[int] = None
+    confidence_interval: Optional[List[float]] = None
+    stopping_reason: Optional[str] = None
+    seed: Optional[int] = None
+    segments: Optional[List[SegmentResult]] = None
+
+class SweepRequest(BaseModel):
+    # With both set, one LLM call estimates the base parameters the grid varies around
+    company_description: Optional[str] = None
+    advertisement_goal: Optional[str] = None
+    use_hugging_face: Optional[bool] = False
+    backend: Optional[str] = None
+    # Explicit base parameters override the LLM estimate
+    ctr: Optional[float] = Field(default=None, ge=0, le=1)
+    engagement: Optional[float] = Field(default=None, ge=0, le=1)
+    conversion: Optional[float] = Field(default=None, ge=0, le=1)
+    roi_threshold: Optional[float] = None
+    # Grid axes; a missing axis holds its base value
+    ctr_values: Optional[List[Probability]] = None
+    engagement_values: Optional[List[Probability]] = None
+    conversion_values: Optional[List[Probability]] = None
+    impressions: int = Field(default=10000, gt=0, le=10000000)
+    simulation_engine: Optional[SimulationEngine] = None
+    seed: Optional[int] = Field(default=None, ge=0)
+
+class SweepResponse(BaseModel):
+    base_params: Dict[str, float]
+    ctr_values: List[float]
+    engagement_values: List[float]
+    conversion_values: List[float]
+    roi_threshold: float
+    roi_fit_score_grid: List[List[List[float]]]  # Indexed [ctr][engagement][conversion]
+    roi_fit_tag_grid: List[List[List[str]]]
+    seed: Optional[int] = None
+
+class OptimizeArm(BaseModel):
+    name: str
+    ctr: float = Field(ge=0, le=1)
+    engagement: float = Field(ge=0, le=1)
+    conversion: float = Field(ge=0, le=1)
+    max_impressions: Optional[int] = Field(default=None, ge=0)  # Inventory or audience cap for this channel/creative
+
+class OptimizeRequest(BaseModel):
+    total_impressions: int = Field(gt=0)
+    arms: List[OptimizeArm] = Field(min_length=1)
+    objective: Literal["conversions", "roi_fit"] = "conversions"  # roi_fit maximizes the probability of a "High market fit" tag
+    roi_threshold: float = 0.5
+    slices: int = Field(default=20, ge=1, le=1000)  # Budget granularity: allocations are whole multiples of total_impressions / slices
+    replications: int = Field(default=200, ge=10, le=10000)  # Simulated outcomes per arm and slice
+    seed: Optional[int] = Field(default=None, ge=0)
+
+class ArmAllocation(BaseModel):
+    name: str
+    impressions: int
+    share: float
+    expected_conversions: float
+
+class OptimizeResponse(BaseModel):
+    objective: str
+    allocation: List[ArmAllocation]
+    expected_conversions: float
+    conversions_std_error: float
+    high_fit_probability: float
+    roi_fit_score: float
+    even_split: Dict[str, float]  # The same metrics for an even split, for comparison
+    slices: int
+    replications: int
+    seed: Optional[int] = None
+
+class HorizonRequest(BaseModel):
+    # Either give all four parameters, or a company and goal to estimate the missing ones
+    company_description: Optional[str] = None
+    advertisement_goal: Optional[str] = None
+    use_hugging_face: Optional[bool] = False
+    backend: Optional[str] = None
+    ctr: Optional[float] = Field(default=None, ge=0, le=1)
+    engagement: Optional[float] = Field(default=None, ge=0, le=1)
+    conversion: Optional[float] = Field(default=None, ge=0, le=1)
+    roi_threshold: Optional[float] = None
+    days: int = Field(default=30, ge=1, le=365)
+    daily_impressions: Union[DailyImpressions, List[DailyImpressions]] = 100000  # One budget for every day, or one per day
+    audience_size: int = Field(default=1000000, gt=0)  # Reachable users; ad fatigue grows with impressions per user
+    fatigue: float = Field(default=0.1, ge=0)  # CTR is scaled by exp(-fatigue * impressions served per user so far)
+    retarget_share: float = Field(default=0.2, ge=0, le=1)  # Largest fraction of a day's impressions spent on retargeting
+    retarget_ctr_lift: float = Field(default=2.0, ge=0)  # CTR multiplier for retargeted visitors
+    retarget_window_days: int = Field(default=14, ge=1, le=365)  # How long a non-converting visitor stays retargetable
+    conversion_delay_days: float = Field(default=2.0, ge=0)  # Mean days from engagement to conversion
+    conversion_window_days: int = Field(default=7, ge=1, le=365)  # Conversions land within this many days of engagement
+    seed: Optional[int] = Field(default=None, ge=0)
+
+class HorizonResponse(BaseModel):
+    base_params: Dict[str, float]
+    user_journey_stats: Dict[str, int]  # Totals over the horizon
+    roi_fit_score: float
+    roi_fit_tag: str
+    daily: List[Dict[str, int]]  # One entry per day: day, impressions by source, stage counts and retargeting pool size
+    pending_conversions: int  # Conversions of engaged users still due after the last day
+    seed: Optional[int] = None
+
+class BatchItem(BaseModel):
+    company_description: str
+    advertisement_goal: str
+
+class BatchSimulationRequest(BaseModel):
+    items: List[BatchItem] = Field(min_length=1)  # At most MAX_BATCH_ITEMS
+    use_hugging_face: Optional[bool] = False
+    backend: Optional[str] = None
+    simulation_engine: Optional[SimulationEngine] = None
+    seed: Optional[int] = Field(default=None, ge=0)  # Job seed; each item gets its own seed spawned from it
+    include_insight: bool = True  # Set False to skip the insight LLM call and only estimate and simulate
+
+class BatchJobResponse(BaseModel):
+    job_id: str
+    status: str
+    total: int
+
+class JobItemResult(BaseModel):
+    index: int
+    company_description: str
+    advertisement_goal: str
+    status: str  # "pending", "done" or "failed"
+    result: Optional[SimulationResponse] = None
+    error: Optional[str] = None
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str  # "queued", "running", "done" or "failed"
+    total: int
+    completed: int
+    failed: int
+    created_at: float
+    updated_at: float
+    offset: int
+    limit: int
+    items: List[JobItemResult]
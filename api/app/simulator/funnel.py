@@ -0,0 +1,192 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from app.config import SIMULATION_ENGINE
+from app.models.models import FunnelSpec, FunnelStage, SegmentResult, SimulationResult
+from app.simulator.simulator import (
+    BATCH_CHUNK_ELEMENTS, CONVERT_SCALE, CTR_SCALE, ENGAGE_SCALE, LAND_RATE, LAND_SCALE, SIMULATION_ENGINES,
+    RandomSource, clipped_normal_mean, resolve_rng, tag_roi_fit
+)
+
+# The classic funnel as named stages: the default when a spec lists none, and the source of
+# rate and noise defaults for any spec stage that reuses one of these names
+CLASSIC_STAGE_NOISE = {"clicks": CTR_SCALE, "landings": LAND_SCALE, "engagements": ENGAGE_SCALE, "conversions": CONVERT_SCALE}
+
+# Stage counts are reported as total_<stage name> next to total_impressions, so no stage may take these names
+RESERVED_STAGE_NAMES = ("impressions",)
+
+
+def classic_stage_rates(ctr: float, engagement: float, conversion: float) -> Dict[str, float]:
+    return {"clicks": ctr, "landings": LAND_RATE, "engagements": engagement, "conversions": conversion}
+
+
+class ResolvedFunnel:
+    """A FunnelSpec flattened into arrays: rates[segment, stage], noise[stage] and impressions[segment]"""
+
+    def __init__(self, stage_names: List[str], rates: np.ndarray, noise: np.ndarray, impressions: np.ndarray, segments: List[Tuple[str, str]]):
+        self.stage_names = stage_names
+        self.rates = rates
+        self.noise = noise
+        self.impressions = impressions
+        self.segments = segments
+
+
+def resolve_funnel(spec: FunnelSpec, ctr: float, engagement: float, conversion: float) -> ResolvedFunnel:
+    """Apply stage defaults, then channel overrides, then segment overrides, and split the impression budget.
+
+    Raises ValueError for duplicate or reserved names, references to unknown stages or
+    channels, rates outside [0, 1], and custom stages without a rate.
+    """
+    classic_rates = classic_stage_rates(ctr, engagement, conversion)
+    stages = spec.stages or [FunnelStage(name=name) for name in classic_rates]
+    stage_names = [stage.name for stage in stages]
+    _check_unique("stage", stage_names)
+    reserved = sorted(set(stage_names) & set(RESERVED_STAGE_NAMES))
+    if reserved:
+        raise ValueError(f"Reserved stage names: {reserved}")
+
+    base_rates, noise = [], []
+    for stage in stages:
+        rate = stage.rate if stage.rate is not None else classic_rates.get(stage.name)
+        if rate is None:
+            raise ValueError(f"Stage '{stage.name}' needs a rate; only {sorted(classic_rates)} have defaults")
+        base_rates.append(rate)
+        noise.append(stage.noise if stage.noise is not None else CLASSIC_STAGE_NOISE.get(stage.name, 0.0))
+
+    channels = {channel.name: channel for channel in spec.channels}
+    _check_unique("channel", [channel.name for channel in spec.channels])
+    if spec.segments:
+        segments = [segment.model_dump() for segment in spec.segments]
+    else:
+        segments = [{"name": name, "channel": name, "weight": 1.0, "stage_rates": {}} for name in channels]
+    _check_unique("segment", [segment["name"] for segment in segments])
+
+    rates = np.empty((len(segments), len(stages)))
+    shares = np.empty(len(segments))
+    channel_weights = {}
+    for segment in segments:
+        channel_name = segment["channel"] or spec.channels[0].name
+        if channel_name not in channels:
+            raise ValueError(f"Segment '{segment['name']}' refers to unknown channel '{channel_name}'")
+        segment["channel"] = channel_name
+        channel_weights[channel_name] = channel_weights.get(channel_name, 0.0) + segment["weight"]
+
+    # Only channels with at least one segment receive budget
+    total_share = sum(channels[name].budget_share for name in channel_weights)
+    for i, segment in enumerate(segments):
+        channel = channels[segment["channel"]]
+        shares[i] = channel.budget_share / total_share * segment["weight"] / channel_weights[channel.name]
+        row = dict(zip(stage_names, base_rates))
+        for overrides, owner in ((channel.stage_rates, f"channel '{channel.name}'"), (segment["stage_rates"], f"segment '{segment['name']}'")):
+            for stage_name, rate in overrides.items():
+                if stage_name not in row:
+                    raise ValueError(f"{owner} sets a rate for unknown stage '{stage_name}'")
+                row[stage_name] = rate
+        rates[i] = [row[name] for name in stage_names]
+
+    if np.any((rates < 0) | (rates > 1)):
+        raise ValueError("Stage rates must be between 0 and 1")
+
+    return ResolvedFunnel(
+        stage_names,
+        rates,
+        np.asarray(noise, dtype=float),
+        allocate_impressions(spec.impressions, shares),
+        [(segment["name"], segment["channel"]) for segment in segments]
+    )
+
+
+def allocate_impressions(total: int, shares: np.ndarray) -> np.ndarray:
+    """Split total into integers proportional to shares, largest remainders first, summing exactly to total"""
+    exact = total * shares / shares.sum()
+    allocation = np.floor(exact).astype(np.int64)
+    leftover = total - allocation.sum()
+    allocation[np.argsort(allocation - exact, kind="stable")[:leftover]] += 1
+    return allocation
+
+
+def run_funnel_simulation(spec: FunnelSpec, ctr: float, engagement: float, conversion: float, roi_threshold: float, engine: Optional[str] = None, rng: RandomSource = None) -> SimulationResult:
+    """Simulate every segment of a custom funnel at once.
+
+    Stage counts are computed as one (segments x stages) array per engine, with the same
+    engines and semantics as run_market_fit_simulation. The legacy total_* fields report the
+    first three stages and the final one; stage_counts has every stage by name.
+    """
+    engine = engine or SIMULATION_ENGINE
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"Unknown simulation engine '{engine}', expected one of {SIMULATION_ENGINES}")
+    funnel = resolve_funnel(spec, ctr, engagement, conversion)
+
+    seed = None
+    if engine == "analytic":
+        reach = np.cumprod(clipped_normal_mean(funnel.rates, funnel.noise), axis=1)
+        counts = np.rint(funnel.impressions[:, None] * reach).astype(np.int64)
+    else:
+        generator, seed = resolve_rng(rng)
+        if engine == "aggregate":
+            counts = _aggregate_counts(generator, funnel)
+        else:
+            counts = _per_impression_counts(generator, funnel)
+
+    totals = counts.sum(axis=0)
+    impressions = int(funnel.impressions.sum())
+    final = totals[-1] / impressions * 100
+
+    segments = []
+    for (name, channel), segment_impressions, segment_counts in zip(funnel.segments, funnel.impressions, counts):
+        score = segment_counts[-1] / segment_impressions * 100 if segment_impressions else 0.0
+        segments.append(SegmentResult(
+            name=name,
+            channel=channel,
+            impressions=int(segment_impressions),
+            stage_counts=dict(zip(funnel.stage_names, segment_counts.tolist())),
+            roi_fit_score=round(score, 2),
+            roi_fit_tag=tag_roi_fit(score, roi_threshold)
+        ))
+
+    legacy = [int(totals[min(i, len(totals) - 1)]) for i in range(3)]
+    return SimulationResult(
+        total_impressions=impressions,
+        total_clicks=legacy[0],
+        total_landings=legacy[1],
+        total_engagements=legacy[2],
+        total_conversions=int(totals[-1]),
+        roi_fit_score=round(final, 2),
+        roi_fit_tag=tag_roi_fit(final, roi_threshold),
+        engine=engine,
+        seed=seed,
+        stage_counts=dict(zip(funnel.stage_names, totals.tolist())),
+        segments=segments
+    )
+
+
+def _aggregate_counts(rng: np.random.Generator, funnel: ResolvedFunnel) -> np.ndarray:
+    # Binomial thinning, as in the aggregate engine, over every segment in one draw per stage
+    probabilities = clipped_normal_mean(funnel.rates, funnel.noise)
+    counts = np.empty(funnel.rates.shape, dtype=np.int64)
+    survivors = funnel.impressions
+    for stage in range(funnel.rates.shape[1]):
+        survivors = rng.binomial(n=survivors, p=probabilities[:, stage])
+        counts[:, stage] = survivors
+    return counts
+
+
+def _per_impression_counts(rng: np.random.Generator, funnel: ResolvedFunnel) -> np.ndarray:
+    # One noisy rate and Bernoulli trial per impression and stage. The impressions of every segment
+    # are laid end to end and streamed in bounded chunks, so one draw per stage covers all segments.
+    segment_count, stage_count = funnel.rates.shape
+    counts = np.zeros(funnel.rates.shape, dtype=np.int64)
+    ends = np.cumsum(funnel.impressions)
+    for start in range(0, int(ends[-1]), BATCH_CHUNK_ELEMENTS):
+        segment = np.searchsorted(ends, np.arange(start, min(start + BATCH_CHUNK_ELEMENTS, int(ends[-1]))), side="right")
+        alive = np.ones(segment.size, dtype=np.int64)
+        for stage in range(stage_count):
+            rate = np.clip(rng.normal(funnel.rates[segment, stage], funnel.noise[stage]), 0, 1)
+            alive = alive * rng.binomial(n=1, p=rate)
+            counts[:, stage] += np.bincount(segment, weights=alive, minlength=segment_count).astype(np.int64)
+    return counts
+
+
+def _check_unique(kind: str, names: List[str]):
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate {kind} names: {duplicates}")
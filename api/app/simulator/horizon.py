@@ -0,0 +1,109 @@
+import numpy as np
+from typing import List, Union
+from app.models.models import SimulationResult
+from app.simulator.simulator import CTR_SCALE, RandomSource, clipped_normal_mean, resolve_rng, stage_probabilities, tag_roi_fit
+
+DAILY_KEYS = (
+    "total_impressions", "prospecting_impressions", "retargeting_impressions",
+    "total_clicks", "total_landings", "total_engagements", "total_conversions", "retargeting_pool"
+)
+
+
+def conversion_delay_pmf(mean_delay_days: float, window_days: int) -> np.ndarray:
+    """P(a conversion lands k days after engagement), k < window_days: geometric with the given mean, truncated and renormalized"""
+    q = 1.0 / (1.0 + mean_delay_days)
+    pmf = q * (1.0 - q) ** np.arange(window_days)
+    return pmf / pmf.sum()
+
+
+def run_horizon_simulation(
+    days: int,
+    daily_impressions: Union[int, List[int]],
+    ctr: float,
+    engagement: float,
+    conversion: float,
+    roi_threshold: float,
+    audience_size: int = 1_000_000,
+    fatigue: float = 0.1,
+    retarget_share: float = 0.2,
+    retarget_ctr_lift: float = 2.0,
+    retarget_window_days: int = 14,
+    conversion_delay_days: float = 2.0,
+    conversion_window_days: int = 7,
+    rng: RandomSource = None
+) -> dict:
+    """Multi-day campaign forecast over cohorts, advanced one day at a time with array operations.
+
+    Each day's impressions are split between retargeting and prospecting. Prospecting CTR
+    decays with ad fatigue: it is scaled by exp(-fatigue * frequency), where frequency is the
+    impressions served so far per member of the audience. Site visitors who do not convert
+    join a retargeting pool, one cohort per day, for retarget_window_days. Up to
+    retarget_share of each day's impressions is served to the pool, spread across cohorts,
+    with CTR lifted by retarget_ctr_lift; clickers leave the pool and go through the funnel
+    again. Engaged users who convert do so after a geometric delay (mean
+    conversion_delay_days, within conversion_window_days), so conversions trail clicks.
+
+    Stage totals are binomial draws as in the aggregate engine; the cost grows with days and
+    window lengths, never with impressions. Returns the summary as a SimulationResult
+    (engine "cohort"), per-day arrays for DAILY_KEYS, and the conversions still due after the
+    last day.
+    """
+    schedule = np.full(days, daily_impressions, dtype=np.int64) if np.ndim(daily_impressions) == 0 else np.asarray(daily_impressions, dtype=np.int64)
+    if schedule.shape != (days,):
+        raise ValueError(f"daily_impressions lists {schedule.size} days, expected {days}")
+    if np.any(schedule < 0):
+        raise ValueError("daily_impressions must not be negative")
+    if schedule.sum() == 0:
+        raise ValueError("The campaign serves no impressions")
+
+    generator, seed = resolve_rng(rng)
+
+    # Fatigue depends only on the impressions served before each day, all known up front
+    frequency = np.concatenate([[0], np.cumsum(schedule)[:-1]]) / audience_size
+    decay = np.exp(-fatigue * frequency)
+    prospect_click = np.asarray(clipped_normal_mean(ctr * decay, CTR_SCALE), dtype=float)
+    retarget_click = np.asarray(clipped_normal_mean(np.minimum(ctr * retarget_ctr_lift * decay, 1.0), CTR_SCALE), dtype=float)
+    _, land, engage, convert = stage_probabilities(ctr, engagement, conversion)
+    delay = conversion_delay_pmf(conversion_delay_days, conversion_window_days)
+
+    # pool[age]: non-converting visitors of the cohort that visited age days ago
+    pool = np.zeros(retarget_window_days, dtype=np.int64)
+    # due[day]: conversions scheduled to land on that day, including after the horizon
+    due = np.zeros(days + conversion_window_days, dtype=np.int64)
+    daily = {key: np.zeros(days, dtype=np.int64) for key in DAILY_KEYS}
+
+    for day in range(days):
+        retargeted = min(int(pool.sum()), int(retarget_share * schedule[day]))
+        served = generator.multivariate_hypergeometric(pool, retargeted) if retargeted else np.zeros_like(pool)
+        returning = generator.binomial(served, retarget_click[day])
+        pool -= returning
+
+        prospecting = schedule[day] - retargeted
+        clicks = int(generator.binomial(prospecting, prospect_click[day])) + int(returning.sum())
+        landings = int(generator.binomial(clicks, land))
+        engagements = int(generator.binomial(landings, engage))
+        converters = int(generator.binomial(engagements, convert))
+        due[day:day + conversion_window_days] += generator.multinomial(converters, delay)
+
+        # Age every cohort by a day; the oldest leaves the pool and today's non-converting visitors join it
+        pool = np.concatenate([[landings - converters], pool[:-1]])
+
+        for key, value in (
+            ("total_impressions", schedule[day]), ("prospecting_impressions", prospecting), ("retargeting_impressions", retargeted),
+            ("total_clicks", clicks), ("total_landings", landings), ("total_engagements", engagements),
+            ("total_conversions", due[day]), ("retargeting_pool", pool.sum())
+        ):
+            daily[key][day] = value
+
+    impressions = int(schedule.sum())
+    totals = {key: int(daily[key].sum()) for key in ("total_clicks", "total_landings", "total_engagements", "total_conversions")}
+    journey_probability = totals["total_conversions"] / impressions
+    summary = SimulationResult(
+        total_impressions=impressions,
+        **totals,
+        roi_fit_score=round(journey_probability * 100, 2),
+        roi_fit_tag=tag_roi_fit(journey_probability * 100, roi_threshold),
+        engine="cohort",
+        seed=seed
+    )
+    return {"summary": summary, "daily": daily, "pending_conversions": int(due[days:].sum())}
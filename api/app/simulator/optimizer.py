@@ -0,0 +1,158 @@
+import numpy as np
+from typing import List, Optional
+from app.models.models import OptimizeArm
+from app.simulator.simulator import RandomSource, resolve_rng, stage_probabilities
+
+OBJECTIVES = ("conversions", "roi_fit")
+
+# Bound on the draw table and the pairwise-move tensor (replications x arms x max(slices, arms))
+MAX_TABLE_ELEMENTS = 20_000_000
+
+
+def optimize_allocation(
+    arms: List[OptimizeArm],
+    total_impressions: int,
+    objective: str = "conversions",
+    roi_threshold: float = 0.5,
+    slices: int = 20,
+    replications: int = 200,
+    rng: RandomSource = None
+) -> dict:
+    """Split an impression budget across candidate arms to maximize expected conversions or P(high market fit).
+
+    The budget is cut into equal slices. For every replication, arm and slice, the
+    conversions that slice would bring are drawn once from the aggregate engine (a binomial
+    over the arm's journey probability). Every candidate allocation is then scored on those
+    same draws (common random numbers), so comparisons between allocations carry no
+    independent sampling noise and each evaluation is only a table lookup.
+
+    The search hands out slices greedily to the arm with the best objective, then moves
+    single slices between arms while that improves it. The roi_fit objective is
+    non-linear, so the local moves matter there.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {OBJECTIVES}")
+    # Allocations are reported by arm name, so two arms with one name could not be told apart
+    names = [arm.name for arm in arms]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate arm names: {duplicates}")
+    if total_impressions < slices:
+        raise ValueError(f"total_impressions ({total_impressions}) must be at least slices ({slices})")
+    if replications * len(arms) * max(slices, len(arms)) > MAX_TABLE_ELEMENTS:
+        raise ValueError(f"replications x arms x max(slices, arms) exceeds {MAX_TABLE_ELEMENTS}; lower replications or slices")
+
+    generator, seed = resolve_rng(rng)
+    slice_size = total_impressions // slices
+    budget = slice_size * slices
+    journey = np.array([np.prod(stage_probabilities(arm.ctr, arm.engagement, arm.conversion)) for arm in arms])
+    caps = np.array([slices if arm.max_impressions is None else min(slices, arm.max_impressions // slice_size) for arm in arms])
+
+    # table[r, k, a]: conversions in replication r when arm k gets a slices
+    draws = generator.binomial(n=slice_size, p=journey[None, :, None], size=(replications, len(arms), slices))
+    table = np.concatenate([np.zeros((replications, len(arms), 1), dtype=np.int64), np.cumsum(draws, axis=2)], axis=2)
+
+    def score(totals: np.ndarray) -> np.ndarray:
+        # totals[r, ...] -> one objective value per candidate
+        if objective == "conversions":
+            return totals.mean(axis=0)
+        high_fit = (totals / budget * 100 >= roi_threshold).mean(axis=0)
+        # Mean conversions break ties between allocations with equal fit probability
+        return high_fit + 1e-6 * totals.mean(axis=0) / budget
+
+    def outcome(allocation: np.ndarray) -> np.ndarray:
+        return table[:, np.arange(len(arms)), allocation].sum(axis=1)
+
+    allocation = _greedy(table, caps, slices, outcome, score)
+    allocation = _improve(table, caps, allocation, outcome, score)
+
+    totals = outcome(allocation)
+    per_arm = table[:, np.arange(len(arms)), allocation].mean(axis=0)
+    even = _even_split(caps, slices)
+    even_totals = outcome(even)
+
+    # Slices cannot divide every budget exactly; the remainder (fewer than slices impressions) goes to the largest arm if it has room
+    impressions = allocation * slice_size
+    largest = int(np.argmax(allocation))
+    cap = arms[largest].max_impressions
+    if impressions.sum() == budget and (cap is None or impressions[largest] + total_impressions - budget <= cap):
+        impressions[largest] += total_impressions - budget
+
+    return {
+        "objective": objective,
+        "allocation": [
+            {
+                "name": arm.name,
+                "impressions": int(impressions[k]),
+                "share": round(float(impressions[k]) / total_impressions, 4),
+                "expected_conversions": round(float(per_arm[k]), 2)
+            }
+            for k, arm in enumerate(arms)
+        ],
+        **_summary(totals, budget, roi_threshold),
+        "even_split": _summary(even_totals, budget, roi_threshold),
+        "slices": slices,
+        "replications": replications,
+        "seed": seed
+    }
+
+
+def _greedy(table: np.ndarray, caps: np.ndarray, slices: int, outcome, score) -> np.ndarray:
+    allocation = np.zeros(len(caps), dtype=np.int64)
+    arms = np.arange(len(caps))
+    for _ in range(slices):
+        open_arms = arms[allocation < caps]
+        if open_arms.size == 0:
+            break
+        current = outcome(allocation)
+        # Outcome of giving the next slice to each open arm, all candidates at once
+        gains = table[:, open_arms, allocation[open_arms] + 1] - table[:, open_arms, allocation[open_arms]]
+        best = open_arms[np.argmax(score(current[:, None] + gains))]
+        allocation[best] += 1
+    return allocation
+
+
+def _improve(table: np.ndarray, caps: np.ndarray, allocation: np.ndarray, outcome, score, max_moves: Optional[int] = None) -> np.ndarray:
+    arms = np.arange(len(caps))
+    max_moves = max_moves if max_moves is not None else 4 * int(allocation.sum()) + 1
+    for _ in range(max_moves):
+        current = outcome(allocation)
+        best_value = score(current[:, None])[0]
+        givers = arms[allocation > 0]
+        takers = arms[allocation < caps]
+        if givers.size == 0 or takers.size == 0:
+            break
+        loss = table[:, givers, allocation[givers]] - table[:, givers, allocation[givers] - 1]
+        gain = table[:, takers, allocation[takers] + 1] - table[:, takers, allocation[takers]]
+        # moved[r, i, j]: outcome after moving one slice from givers[i] to takers[j]
+        moved = current[:, None, None] - loss[:, :, None] + gain[:, None, :]
+        values = score(moved)
+        values[givers[:, None] == takers[None, :]] = -np.inf
+        i, j = np.unravel_index(np.argmax(values), values.shape)
+        if values[i, j] <= best_value + 1e-12:
+            break
+        allocation[givers[i]] -= 1
+        allocation[takers[j]] += 1
+    return allocation
+
+
+def _even_split(caps: np.ndarray, slices: int) -> np.ndarray:
+    # Round-robin over arms that still have room
+    allocation = np.zeros(len(caps), dtype=np.int64)
+    remaining = slices
+    while remaining > 0 and np.any(allocation < caps):
+        for k in range(len(caps)):
+            if remaining > 0 and allocation[k] < caps[k]:
+                allocation[k] += 1
+                remaining -= 1
+    return allocation
+
+
+def _summary(totals: np.ndarray, budget: int, roi_threshold: float) -> dict:
+    mean = float(totals.mean())
+    return {
+        "expected_conversions": round(mean, 2),
+        "conversions_std_error": round(float(totals.std(ddof=1) / np.sqrt(totals.size)), 2),
+        "high_fit_probability": round(float((totals / budget * 100 >= roi_threshold).mean()), 4),
+        "roi_fit_score": round(mean / budget * 100, 2)
+    }
@@ -0,0 +1,48 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from app.config import SIMULATION_PROCESSES
+
+# One pool for the life of the app, so requests never pay for starting processes.
+# Workers are spawned rather than forked: the parent runs server and inference threads,
+# and forking a threaded process can copy locks in a held state.
+_pool: Optional[ProcessPoolExecutor] = None
+_processes = 0
+_lock = threading.Lock()
+
+
+def _ping() -> bool:
+    # Importing the simulator here is what makes a worker ready for real work
+    import app.simulator.simulator  # noqa: F401
+    return True
+
+
+def start_pool(processes: int = SIMULATION_PROCESSES) -> Optional[ProcessPoolExecutor]:
+    """Start the shared simulation pool with processes workers (0 leaves it disabled) and wait until they are up"""
+    global _pool, _processes
+    with _lock:
+        if _pool is None and processes > 0:
+            _pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+            _processes = processes
+            # Workers start on demand; one task each brings them all up now instead of on the first request
+            for future in [_pool.submit(_ping) for _ in range(processes)]:
+                future.result()
+    return _pool
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    return _pool
+
+
+def shutdown_pool():
+    global _pool, _processes
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+            _processes = 0
+
+
+def pool_stats() -> dict:
+    return {"running": _pool is not None, "processes": _processes}
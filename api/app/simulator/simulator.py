@@ -1,48 +1,473 @@
+import math
+import secrets
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from statistics import NormalDist
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from app.config import SIMULATION_ENGINE, SIMULATION_WORKERS, SIMULATION_SHARD_IMPRESSIONS, ADAPTIVE_MIN_IMPRESSIONS, ADAPTIVE_MAX_IMPRESSIONS, ADAPTIVE_TARGET_HALF_WIDTH, ADAPTIVE_CONFIDENCE
 from app.models.models import SimulationResult
+from app.simulator.pool import get_pool
 
-def run_market_fit_simulation(impressions: int, ctr: float, engagement: float, conversion: float, roi_threshold:float) -> SimulationResult:
+SIMULATION_ENGINES = ("per_impression", "aggregate", "analytic")
 
+# Landing success is fixed around 70%; each stage rate gets its own Gaussian noise
+LAND_RATE = 0.7
+CTR_SCALE = 0.01
+LAND_SCALE = 0.05
+ENGAGE_SCALE = 0.1
+CONVERT_SCALE = 0.02
+
+STAGE_KEYS = ("total_clicks", "total_landings", "total_engagements", "total_conversions")
+
+# Upper bound on per-impression array elements held at once by the batch path
+BATCH_CHUNK_ELEMENTS = 1_000_000
+
+# Randomness source for a simulation: an int seed or SeedSequence starts a fresh stream, a Generator
+# is drawn from as is, and None picks a new seed that is reported back with the result
+RandomSource = Union[None, int, np.random.SeedSequence, np.random.Generator]
+
+
+def new_seed() -> int:
+    """Fresh random seed; 53 bits so it survives a round trip through JavaScript numbers"""
+    return secrets.randbits(53)
+
+
+def resolve_rng(rng: RandomSource = None) -> Tuple[np.random.Generator, Optional[int]]:
+    """Generator for rng plus the integer seed that reproduces it, when there is one"""
+    if rng is None:
+        rng = new_seed()
+    seed = int(rng) if isinstance(rng, (int, np.integer)) else None
+    return np.random.default_rng(rng), seed
+
+
+def spawn_rngs(rng: RandomSource, count: int) -> List[np.random.Generator]:
+    """Independent child generators, one per chunk of work, derived via SeedSequence.spawn.
+
+    Children depend only on rng and their index, so results do not change with how
+    chunks are spread over threads or processes, and no two workers share a generator.
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng.spawn(count)
+    sequence = rng if isinstance(rng, np.random.SeedSequence) else np.random.SeedSequence(rng)
+    return [np.random.default_rng(child) for child in sequence.spawn(count)]
+
+
+def spawn_seeds(seed: Optional[int], count: int) -> List[int]:
+    """Independent integer seeds for count separate runs, derived from seed (a fresh one when None) like spawn_rngs"""
+    sequence = np.random.SeedSequence(new_seed() if seed is None else seed)
+    return [int(child.generate_state(1, np.uint64)[0] >> 11) for child in sequence.spawn(count)]
+
+
+def run_market_fit_simulation(impressions: int, ctr: float, engagement: float, conversion: float, roi_threshold:float, engine: Optional[str] = None, rng: RandomSource = None) -> SimulationResult:
+    """Simulate the Impression -> Click -> Land -> Engage -> Convert funnel.
+
+    engine selects how the funnel is evaluated (defaults to SIMULATION_ENGINE):
+        - "per_impression": one noisy probability and Bernoulli trial per impression and stage
+        - "aggregate": stage totals drawn as binomials over the survivors of the previous stage
+        - "analytic": expected stage counts and their variances, no sampling
+    All three describe the same distribution of stage totals. The same integer seed as rng
+    always gives the same result; that seed is echoed in SimulationResult.seed.
+
+    Per-impression runs are streamed in bounded chunks, and runs above
+    SIMULATION_SHARD_IMPRESSIONS are sharded across the simulation process pool when
+    one is running (see app.simulator.pool).
+    """
+    engine = engine or SIMULATION_ENGINE
+
+    if engine == "analytic":
+        return _analytic_result(impressions, ctr, engagement, conversion, roi_threshold)
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"Unknown simulation engine '{engine}', expected one of {SIMULATION_ENGINES}")
+
+    generator, seed = resolve_rng(rng)
+    counts = _simulate_counts(generator, engine, impressions, ctr, engagement, conversion)
+
+    # Compute the final conversion rate across all impressions
+    journey_probability = counts["total_conversions"] / impressions
+
+    return SimulationResult(
+        total_impressions=impressions,
+        **counts,
+        roi_fit_score=round(journey_probability * 100, 2),
+        roi_fit_tag=tag_roi_fit(journey_probability * 100, roi_threshold),
+        engine=engine,
+        seed=seed
+    )
+
+
+def run_adaptive_simulation(
+    ctr: float,
+    engagement: float,
+    conversion: float,
+    roi_threshold: float,
+    engine: Optional[str] = None,
+    target_half_width: Optional[float] = None,
+    confidence: float = ADAPTIVE_CONFIDENCE,
+    min_impressions: int = ADAPTIVE_MIN_IMPRESSIONS,
+    max_impressions: int = ADAPTIVE_MAX_IMPRESSIONS,
+    rng: RandomSource = None
+) -> SimulationResult:
+    """Simulate in growing chunks until the conversion rate is known well enough.
+
+    Each round doubles the impressions simulated so far and recomputes a Wilson interval
+    on the conversion rate. The run stops once the interval's half-width is within
+    target_half_width of the rate ("precision"), the interval lies entirely on one side of
+    roi_threshold so the fit tag cannot change ("decision"), or max_impressions is reached.
+    Doubling keeps the number of looks logarithmic, and the confidence level is split
+    across them (Bonferroni) so repeated checking does not overstate certainty.
+    """
+    engine = engine or SIMULATION_ENGINE
+    if engine not in ("per_impression", "aggregate"):
+        raise ValueError(f"Adaptive simulation needs a sampling engine ('per_impression' or 'aggregate'), got '{engine}'")
+    target_half_width = target_half_width or ADAPTIVE_TARGET_HALF_WIDTH
+    min_impressions = max(1, min(min_impressions, max_impressions))
+    generator, seed = resolve_rng(rng)
+
+    looks = math.ceil(math.log2(max_impressions / min_impressions)) + 1
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / (2 * looks))
+
+    counts = dict.fromkeys(STAGE_KEYS, 0)
+    simulated = 0
+    chunk = min_impressions
+    while True:
+        chunk = min(chunk, max_impressions - simulated)
+        for key, value in _simulate_counts(generator, engine, chunk, ctr, engagement, conversion).items():
+            counts[key] += value
+        simulated += chunk
+
+        rate = counts["total_conversions"] / simulated
+        low, high = wilson_interval(counts["total_conversions"], simulated, z)
+        if rate > 0 and (high - low) / 2 <= target_half_width * rate:
+            reason = "precision"
+        elif low * 100 >= roi_threshold or high * 100 < roi_threshold:
+            reason = "decision"
+        elif simulated >= max_impressions:
+            reason = "max_impressions"
+        else:
+            chunk = simulated
+            continue
+        break
+
+    return SimulationResult(
+        total_impressions=simulated,
+        **counts,
+        roi_fit_score=round(rate * 100, 2),
+        roi_fit_tag=tag_roi_fit(rate * 100, roi_threshold),
+        engine=engine,
+        confidence_interval=[round(low * 100, 4), round(high * 100, 4)],
+        stopping_reason=reason,
+        seed=seed
+    )
+
+
+def wilson_interval(successes: int, trials: int, z: float) -> Tuple[float, float]:
+    """Wilson score interval for a binomial proportion; stays inside [0, 1] and is sensible at zero successes"""
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+def _simulate_counts(rng: np.random.Generator, engine: str, impressions: int, ctr: float, engagement: float, conversion: float) -> Dict[str, int]:
+    if engine == "aggregate":
+        return _simulate_aggregate(rng, impressions, ctr, engagement, conversion)
+    if impressions > SIMULATION_SHARD_IMPRESSIONS:
+        return _simulate_sharded(rng, impressions, ctr, engagement, conversion)
+    # Split large per-impression chunks so each pass allocates at most BATCH_CHUNK_ELEMENTS per array
+    counts = dict.fromkeys(STAGE_KEYS, 0)
+    for start in range(0, impressions, BATCH_CHUNK_ELEMENTS):
+        for key, value in _simulate_per_impression(rng, min(BATCH_CHUNK_ELEMENTS, impressions - start), ctr, engagement, conversion).items():
+            counts[key] += value
+    return counts
+
+
+def _simulate_sharded(rng: np.random.Generator, impressions: int, ctr: float, engagement: float, conversion: float) -> Dict[str, int]:
+    # Shards get spawned generators, so the totals are the same whether they run in the pool or here
+    sizes = [SIMULATION_SHARD_IMPRESSIONS] * (impressions // SIMULATION_SHARD_IMPRESSIONS)
+    if impressions % SIMULATION_SHARD_IMPRESSIONS:
+        sizes.append(impressions % SIMULATION_SHARD_IMPRESSIONS)
+    generators = spawn_rngs(rng, len(sizes))
+
+    pool = get_pool()
+    shard_args = (generators, repeat("per_impression"), sizes, repeat(ctr), repeat(engagement), repeat(conversion))
+    results = pool.map(_simulate_counts, *shard_args) if pool is not None else map(_simulate_counts, *shard_args)
+
+    counts = dict.fromkeys(STAGE_KEYS, 0)
+    for shard in results:
+        for key, value in shard.items():
+            counts[key] += value
+    return counts
+
+
+def run_market_fit_simulation_batch(impressions: int, ctr, engagement, conversion, roi_threshold, engine: Optional[str] = None, rng: RandomSource = None, workers: int = SIMULATION_WORKERS) -> Dict[str, np.ndarray]:
+    """Simulate many scenarios in one NumPy pass.
+
+    ctr, engagement, conversion and roi_threshold are broadcast against each other, so
+    passing np.meshgrid axes yields results shaped like the grid. Returns a dict of arrays
+    with the SimulationResult fields (plus "stage_variances" for the analytic engine).
+
+    Sampling engines split the scenarios into fixed chunks, each with its own child generator
+    from spawn_rngs, and run them on the simulation process pool when it is running, otherwise
+    on up to workers threads; a given seed gives the same arrays either way.
+    """
+    engine = engine or SIMULATION_ENGINE
+    ctr, engagement, conversion, roi_threshold = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (ctr, engagement, conversion, roi_threshold))
+    )
+
+    variances = None
+    seed = None
+    if engine in ("per_impression", "aggregate"):
+        if rng is None:
+            rng = new_seed()
+        seed = int(rng) if isinstance(rng, (int, np.integer)) else None
+        if engine == "per_impression":
+            rows = max(1, BATCH_CHUNK_ELEMENTS // max(impressions, 1))
+            counts = _run_batch_chunks(_simulate_per_impression_chunk, impressions, (ctr, engagement, conversion), rows, rng, workers)
+        else:
+            counts = _run_batch_chunks(_simulate_aggregate_chunk, impressions, (ctr, engagement, conversion), BATCH_CHUNK_ELEMENTS, rng, workers)
+        journey_probability = counts["total_conversions"] / impressions
+    elif engine == "analytic":
+        counts, variances = {}, {}
+        reach = np.ones(ctr.shape)
+        for key, p in zip(STAGE_KEYS, stage_probabilities(ctr, engagement, conversion)):
+            reach = reach * p
+            counts[key] = np.rint(impressions * reach).astype(np.int64)
+            variances[key] = impressions * reach * (1 - reach)
+        journey_probability = reach
+    else:
+        raise ValueError(f"Unknown simulation engine '{engine}', expected one of {SIMULATION_ENGINES}")
+
+    score = journey_probability * 100
+    result = {
+        "total_impressions": np.full(ctr.shape, impressions, dtype=np.int64),
+        **counts,
+        "roi_fit_score": np.round(score, 2),
+        "roi_fit_tag": np.where(score >= roi_threshold, "High market fit", "Low market fit"),
+        "engine": engine,
+        "seed": seed
+    }
+    if variances is not None:
+        result["stage_variances"] = variances
+    return result
+
+
+def _run_batch_chunks(simulate_chunk: Callable, impressions: int, arrays: tuple, rows: int, rng: RandomSource, workers: int) -> Dict[str, np.ndarray]:
+    # Chunk boundaries and child generators depend only on the inputs, never on workers
+    flat = [value.ravel() for value in arrays]
+    size = flat[0].size
+    totals = {key: np.zeros(size, dtype=np.int64) for key in STAGE_KEYS}
+    starts = range(0, size, rows)
+    generators = spawn_rngs(rng, len(starts))
+
+    def run(index: int):
+        start = starts[index]
+        counts = simulate_chunk(generators[index], impressions, *(value[start:start + rows] for value in flat))
+        for key, value in counts.items():
+            totals[key][start:start + rows] = value
+
+    pool = get_pool()
+    if pool is not None and len(starts) > 1:
+        futures = [
+            pool.submit(simulate_chunk, generators[index], impressions, *(value[start:start + rows] for value in flat))
+            for index, start in enumerate(starts)
+        ]
+        for start, future in zip(starts, futures):
+            for key, value in future.result().items():
+                totals[key][start:start + rows] = value
+    elif workers > 1 and len(starts) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(starts)), thread_name_prefix="simulation") as threads:
+            list(threads.map(run, range(len(starts))))
+    else:
+        for index in range(len(starts)):
+            run(index)
+
+    return {key: value.reshape(arrays[0].shape) for key, value in totals.items()}
+
+
+def _simulate_per_impression_chunk(rng: np.random.Generator, impressions: int, ctr: np.ndarray, engagement: np.ndarray, conversion: np.ndarray) -> Dict[str, np.ndarray]:
+    # 2-D (scenario x impression) version of _simulate_per_impression
+    ctr, engagement, conversion = ctr[:, None], engagement[:, None], conversion[:, None]
+    rows = ctr.shape[0]
+    counts = dict.fromkeys(STAGE_KEYS, np.zeros(rows, dtype=np.int64))
+
+    # Past BATCH_CHUNK_ELEMENTS impressions a single scenario row is split too, as in _simulate_counts
+    width = max(1, BATCH_CHUNK_ELEMENTS // rows)
+    for start in range(0, impressions, width):
+        size = (rows, min(width, impressions - start))
+        alive = rng.binomial(n=1, p=np.clip(rng.normal(ctr, CTR_SCALE, size), 0, 1))
+        counts["total_clicks"] = counts["total_clicks"] + alive.sum(axis=1)
+        for key, loc, scale in (
+            ("total_landings", LAND_RATE, LAND_SCALE),
+            ("total_engagements", engagement, ENGAGE_SCALE),
+            ("total_conversions", conversion, CONVERT_SCALE),
+        ):
+            alive = alive * rng.binomial(n=1, p=np.clip(rng.normal(loc, scale, size), 0, 1))
+            counts[key] = counts[key] + alive.sum(axis=1)
+    return counts
+
+
+def _simulate_aggregate_chunk(rng: np.random.Generator, impressions: int, ctr: np.ndarray, engagement: np.ndarray, conversion: np.ndarray) -> Dict[str, np.ndarray]:
+    survivors = np.full(ctr.shape, impressions, dtype=np.int64)
+    counts = {}
+    for key, p in zip(STAGE_KEYS, stage_probabilities(ctr, engagement, conversion)):
+        survivors = rng.binomial(n=survivors, p=p)
+        counts[key] = survivors
+    return counts
+
+
+def _simulate_per_impression(rng: np.random.Generator, impressions: int, ctr: float, engagement: float, conversion: float) -> Dict[str, int]:
     # Simulate individual click probabilities per impression using normal distribution
-    ctr_array = np.clip(np.random.normal(loc=ctr, scale=0.01, size=impressions), 0, 1)
+    ctr_array = np.clip(rng.normal(loc=ctr, scale=CTR_SCALE, size=impressions), 0, 1)
 
     # Simulate landing success probability (after click), fixed around 70%
-    land_rate = np.clip(np.random.normal(loc=0.7, scale=0.05, size=impressions), 0, 1)
+    land_rate = np.clip(rng.normal(loc=LAND_RATE, scale=LAND_SCALE, size=impressions), 0, 1)
 
     # Simulate probability of engaging with the landing content
-    engage_rate = np.clip(np.random.normal(loc=engagement, scale=0.1, size=impressions), 0, 1)
-    
+    engage_rate = np.clip(rng.normal(loc=engagement, scale=ENGAGE_SCALE, size=impressions), 0, 1)
+
     # Simulate probability of converting (final action: signup/purchase)
-    convert_rate = np.clip(np.random.normal(loc=conversion, scale=0.02, size=impressions), 0, 1)
+    convert_rate = np.clip(rng.normal(loc=conversion, scale=CONVERT_SCALE, size=impressions), 0, 1)
 
     # Run Bernoulli trial for each impression: 1 = click, 0 = no click
-    clicks = np.random.binomial(n=1, p=ctr_array)
+    clicks = rng.binomial(n=1, p=ctr_array)
 
     # Only clicked users can proceed to landing stage -> multiply by clicks
-    landings = clicks * np.random.binomial(n=1, p=land_rate)
+    landings = clicks * rng.binomial(n=1, p=land_rate)
 
     # Only landed users can engage -> multiply by landings
-    engagements = landings * np.random.binomial(n=1, p=engage_rate)
+    engagements = landings * rng.binomial(n=1, p=engage_rate)
 
     # Only engaged users can convert -> multiply by engagements
-    conversions = engagements * np.random.binomial(n=1, p=convert_rate)
+    conversions = engagements * rng.binomial(n=1, p=convert_rate)
+
+    return {
+        "total_clicks": int(clicks.sum()),
+        "total_landings": int(landings.sum()),
+        "total_engagements": int(engagements.sum()),
+        "total_conversions": int(conversions.sum())
+    }
+
+
+def _simulate_aggregate(rng: np.random.Generator, impressions: int, ctr: float, engagement: float, conversion: float) -> Dict[str, int]:
+    # Each impression draws its stage probability independently of every other impression and stage,
+    # so a single Bernoulli over a clipped-normal probability is Bernoulli(E[clipped normal]).
+    # The survivors of a stage are therefore Binomial(previous survivors, mean stage rate).
+    survivors = impressions
+    counts = {}
+    for key, p in zip(STAGE_KEYS, stage_probabilities(ctr, engagement, conversion)):
+        survivors = int(rng.binomial(n=survivors, p=p))
+        counts[key] = survivors
+    return counts
 
-    # Compute the final conversion rate across all impressions
-    journey_probability = conversions.sum() / impressions
 
+def _analytic_result(impressions: int, ctr: float, engagement: float, conversion: float, roi_threshold: float) -> SimulationResult:
+    # Thinning a binomial keeps it binomial: stage k is Binomial(impressions, p_1 * ... * p_k)
+    expected = {}
+    variances = {}
+    reach = 1.0
+    for key, p in zip(STAGE_KEYS, stage_probabilities(ctr, engagement, conversion)):
+        reach *= p
+        expected[key] = impressions * reach
+        variances[key] = impressions * reach * (1 - reach)
+
+    journey_probability = reach
 
     return SimulationResult(
-    total_impressions=impressions,
-    total_clicks=int(clicks.sum()),
-    total_landings=int(landings.sum()),
-    total_engagements=int(engagements.sum()),
-    total_conversions=int(conversions.sum()),
-    roi_fit_score=round(journey_probability * 100, 2),
-    roi_fit_tag=tag_roi_fit(journey_probability * 100, roi_threshold)
+        total_impressions=impressions,
+        **{key: int(round(value)) for key, value in expected.items()},
+        roi_fit_score=round(journey_probability * 100, 2),
+        roi_fit_tag=tag_roi_fit(journey_probability * 100, roi_threshold),
+        engine="analytic",
+        stage_variances=variances
+    )
+
+
+def stage_probabilities(ctr, engagement, conversion) -> tuple:
+    """Mean per-impression probability of passing each funnel stage (click, land, engage, convert)"""
+    return (
+        clipped_normal_mean(ctr, CTR_SCALE),
+        clipped_normal_mean(LAND_RATE, LAND_SCALE),
+        clipped_normal_mean(engagement, ENGAGE_SCALE),
+        clipped_normal_mean(conversion, CONVERT_SCALE)
+    )
+
+
+def clipped_normal_mean(loc, scale):
+    """Closed-form E[clip(X, 0, 1)] for X ~ N(loc, scale); loc and scale may be floats or broadcastable arrays"""
+    if np.ndim(scale) == 0 and scale <= 0:
+        return _as_float(np.clip(loc, 0.0, 1.0))
+    if np.ndim(loc) == 0 and np.ndim(scale) == 0:
+        # Every /simulate request lands here; plain floats skip the NumPy per-call overhead
+        return _clipped_normal_mean_scalar(float(loc), float(scale))
+
+    loc = np.asarray(loc, dtype=float)
+    scale = np.asarray(scale, dtype=float)
+    # Zero-noise entries are just the clipped location; compute the rest with a placeholder scale
+    noisy = scale > 0
+    safe_scale = np.where(noisy, scale, 1.0)
+    alpha = (0.0 - loc) / safe_scale
+    beta = (1.0 - loc) / safe_scale
+    cdf_alpha, cdf_beta = _normal_cdf(alpha), _normal_cdf(beta)
+
+    # Mass inside [0, 1] contributes X itself, mass above 1 is clipped to 1, mass below 0 to 0
+    inside = loc * (cdf_beta - cdf_alpha) + safe_scale * (_normal_pdf(alpha) - _normal_pdf(beta))
+    mean = np.where(noisy, inside + (1.0 - cdf_beta), loc)
+    return _as_float(np.clip(mean, 0.0, 1.0))
+
+
+def _clipped_normal_mean_scalar(loc: float, scale: float) -> float:
+    # clipped_normal_mean for one positive scale, with the same terms in math instead of NumPy
+    alpha, beta = -loc / scale, (1.0 - loc) / scale
+    cdf_alpha, cdf_beta = [0.5 * (1.0 + math.erf(x / math.sqrt(2.0))) for x in (alpha, beta)]
+    pdf_alpha, pdf_beta = [math.exp(-0.5 * x * x) / math.sqrt(2.0 * math.pi) for x in (alpha, beta)]
+    mean = loc * (cdf_beta - cdf_alpha) + scale * (pdf_alpha - pdf_beta) + (1.0 - cdf_beta)
+    return min(max(mean, 0.0), 1.0)
+
+
+# Cephes rational approximations (ndtr.c), highest power first for np.polyval: erf on |x| <= 1, erfc on 1 < |x| < 8.
+# Both agree with math.erf to double precision; past 8, erfc is below 1e-29 and erf rounds to +-1.
+_ERF_T = (9.60497373987051638749e0, 9.00260197203842689217e1, 2.23200534594684319226e3, 7.00332514112805075473e3, 5.55923013010394962768e4)
+_ERF_U = (1.0, 3.35617141647503099647e1, 5.21357949780152679795e2, 4.59432382970980127987e3, 2.26290000613890934246e4, 4.92673942608635921086e4)
+_ERFC_P = (
+    2.46196981473530512524e-10, 5.64189564831068821977e-1, 7.46321056442269912687e0, 4.86371970985681366614e1, 1.96520832956077098242e2,
+    5.26445194995477358631e2, 9.34528527171957607540e2, 1.02755188689515710272e3, 5.57535335369399327526e2
 )
+_ERFC_Q = (
+    1.0, 1.32281951154744992508e1, 8.67072140885989742329e1, 3.54937778887819891062e2, 9.75708501743205489753e2,
+    1.82390916687909736289e3, 2.24633760818710981792e3, 1.65666309194161350182e3, 5.57535340817727675546e2
+)
+
+
+def _erf(x):
+    """Element-wise erf over whole arrays, without a Python call per element"""
+    x = np.asarray(x, dtype=float)
+    magnitude = np.abs(x)
+    small = magnitude <= 1.0
+    z = np.where(small, x, 0.0) ** 2
+    near = x * np.polyval(_ERF_T, z) / np.polyval(_ERF_U, z)
+    far_x = np.clip(magnitude, 1.0, 8.0)
+    far = np.sign(x) * (1.0 - np.exp(-far_x * far_x) * np.polyval(_ERFC_P, far_x) / np.polyval(_ERFC_Q, far_x))
+    return np.where(small, near, far)
+
+
+def _normal_cdf(x):
+    return 0.5 * (1.0 + _erf(x / math.sqrt(2.0)))
+
+
+def _normal_pdf(x):
+    return np.exp(-0.5 * x * x) / math.sqrt(2.0 * math.pi)
+
+
+def _as_float(value):
+    # Keep scalar inputs scalar so SimulationResult fields stay plain floats
+    return float(value) if np.ndim(value) == 0 else value
+
 
 def tag_roi_fit(roi_score: float, roi_threshold: float) -> str:
     if roi_score >= roi_threshold:
         return "High market fit"
     else:
-        return "Low market fit"
\ No newline at end of file
+        return "Low market fit"
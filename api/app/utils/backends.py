@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import importlib.util
+from typing import AsyncIterator, Dict, List, Optional
+from app.config import LLM_BACKEND, STUB_LLM_LATENCY_MS, STUB_LLM_TOKEN_LATENCY_MS
+from app.models.models import SimulationResult
+from app.utils import gpt_utils
+from app.utils.cache import normalize_text
+from app.utils.logging_utils import get_logger
+from app.utils.metrics import count_tokens
+
+log = get_logger(__name__)
+
+
+class LLMBackend:
+    """An LLM that can estimate simulation parameters and explain a simulation result.
+
+    Subclasses implement extract_params and generate_insight; prepare_insight and
+    stream_insight default to no preparation and a single chunk.
+    """
+
+    name = ""
+    label = ""
+
+    def is_available(self) -> bool:
+        return True
+
+    async def extract_params(self, company_description: str, advertisement_goal: str) -> tuple[float, float, float, float]:
+        raise NotImplementedError
+
+    async def generate_insight(self, simulation_data: SimulationResult, company_description: str, advertisement_goal: str) -> str:
+        raise NotImplementedError
+
+    async def prepare_insight(self, company_description: str, advertisement_goal: str):
+        """Insight work that depends only on company and goal, run while parameters are extracted"""
+        return None
+
+    async def stream_insight(self, simulation_data: SimulationResult, company_description: str, advertisement_goal: str, prepared=None) -> AsyncIterator[str]:
+        yield await self.generate_insight(simulation_data, company_description, advertisement_goal)
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+    label = "OpenAI GPT-3.5-turbo"
+
+    async def extract_params(self, company_description, advertisement_goal):
+        return await gpt_utils.aget_simulation_params_from_context(company_description, advertisement_goal)
+
+    async def generate_insight(self, simulation_data, company_description, advertisement_goal):
+        return await gpt_utils.aget_chatgpt_marketing_insight(simulation_data, company_description, advertisement_goal)
+
+    async def prepare_insight(self, company_description, advertisement_goal):
+        return await gpt_utils.aprepare_chatgpt_insight(company_description, advertisement_goal)
+
+    async def stream_insight(self, simulation_data, company_description, advertisement_goal, prepared=None):
+        async for chunk in gpt_utils.astream_chatgpt_marketing_insight(simulation_data, company_description, advertisement_goal, prepared):
+            yield chunk
+
+
+class HuggingFaceBackend(LLMBackend):
+    name = "huggingface"
+    label = "Hugging Face GPT-OSS-120B"
+
+    def is_available(self) -> bool:
+        # Checked without importing: transformers and torch dominate cold-start time
+        return all(importlib.util.find_spec(name) is not None for name in ("transformers", "torch"))
+
+    def module(self):
+        """Import hf_utils on first use"""
+        from app.utils import hf_utils
+        return hf_utils
+
+    async def extract_params(self, company_description, advertisement_goal):
+        return await self.module().aget_hf_simulation_params_from_context(company_description, advertisement_goal)
+
+    async def generate_insight(self, simulation_data, company_description, advertisement_goal):
+        return await self.module().aget_hf_marketing_insight(simulation_data, company_description, advertisement_goal)
+
+    async def prepare_insight(self, company_description, advertisement_goal):
+        return await self.module().aprepare_hf_insight(company_description, advertisement_goal)
+
+    async def stream_insight(self, simulation_data, company_description, advertisement_goal, prepared=None):
+        async for chunk in self.module().astream_hf_marketing_insight(simulation_data, company_description, advertisement_goal, prepared):
+            yield chunk
+
+
+class StubBackend(LLMBackend):
+    """Deterministic offline backend for load tests and benchmarks.
+
+    Parameters are derived from a hash of the normalized inputs, the insight is a fixed
+    template over the simulation stats, and every call sleeps for a configurable
+    artificial latency so the rest of the pipeline can be measured without a network or GPU.
+    """
+
+    name = "stub"
+    label = "offline stub"
+
+    def __init__(self, latency_ms: float = STUB_LLM_LATENCY_MS, token_latency_ms: float = STUB_LLM_TOKEN_LATENCY_MS):
+        self.latency = latency_ms / 1000
+        self.token_latency = token_latency_ms / 1000
+
+    async def extract_params(self, company_description, advertisement_goal):
+        await self._sleep(self.latency)
+        digest = hashlib.sha256(f"{normalize_text(company_description)}|{normalize_text(advertisement_goal)}".encode("utf-8")).digest()
+        # Four bytes of the digest, each mapped onto a plausible range for its parameter
+        ctr = 0.005 + digest[0] / 255 * 0.045
+        engagement = 0.2 + digest[1] / 255 * 0.6
+        conversion = 0.02 + digest[2] / 255 * 0.18
+        roi_threshold = 0.1 + digest[3] / 255 * 0.5
+        return round(ctr, 4), round(engagement, 4), round(conversion, 4), round(roi_threshold, 4)
+
+    async def generate_insight(self, simulation_data, company_description, advertisement_goal):
+        chunks = self._insight_chunks(simulation_data)
+        await self._sleep(self.latency + self.token_latency * len(chunks))
+        count_tokens(self.name, completion=len(chunks))
+        return "".join(chunks).strip()
+
+    async def prepare_insight(self, company_description, advertisement_goal):
+        # Stands in for prefilling the prompt prefix, the part of latency that does not scale with output length
+        await self._sleep(self.latency)
+        return {"company_description": company_description, "advertisement_goal": advertisement_goal}
+
+    async def stream_insight(self, simulation_data, company_description, advertisement_goal, prepared=None):
+        if prepared is None:
+            await self._sleep(self.latency)
+        for chunk in self._insight_chunks(simulation_data):
+            await self._sleep(self.token_latency)
+            count_tokens(self.name, completion=1)
+            yield chunk
+
+    def _insight_chunks(self, simulation_data: SimulationResult) -> List[str]:
+        impressions = max(simulation_data.total_impressions, 1)
+        clicks = max(simulation_data.total_clicks, 1)
+        ctr = simulation_data.total_clicks / impressions * 100
+        click_to_conversion = simulation_data.total_conversions / clicks * 100
+        if ctr < 1.0:
+            bottleneck = "Low click-through rate"
+        elif click_to_conversion < 5.0:
+            bottleneck = "Weak post-click conversion"
+        else:
+            bottleneck = "Campaign scale"
+        text = (
+            f"**Bottleneck:** {bottleneck} "
+            f"(CTR {ctr:.2f}%, click-to-conversion {click_to_conversion:.2f}%, "
+            f"fit score {simulation_data.roi_fit_score}%, {simulation_data.roi_fit_tag.lower()}). "
+            "*Generated by the offline stub backend*"
+        )
+        return [word + " " for word in text.split(" ")]
+
+    async def _sleep(self, seconds: float):
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+
+_BACKENDS: Dict[str, LLMBackend] = {}
+
+
+def register_backend(backend: LLMBackend):
+    """Make a backend selectable by name, replacing any backend registered under the same name"""
+    _BACKENDS[backend.name] = backend
+
+
+def get_backend(name: str) -> LLMBackend:
+    try:
+        return _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend '{name}', expected one of {sorted(_BACKENDS)}")
+
+
+def available_backends() -> Dict[str, bool]:
+    return {name: backend.is_available() for name, backend in _BACKENDS.items()}
+
+
+def resolve_backend(backend: Optional[str] = None, use_hugging_face: Optional[bool] = False) -> LLMBackend:
+    """Pick the backend for a request: explicit name, then the legacy use_hugging_face flag, then LLM_BACKEND"""
+    name = backend or ("huggingface" if use_hugging_face else LLM_BACKEND)
+    selected = get_backend(name)
+    if not selected.is_available():
+        # Fallback to OpenAI if the requested backend is not installed
+        log.warning("backend_unavailable", requested=selected.name, fallback="openai")
+        return get_backend("openai")
+    return selected
+
+
+register_backend(OpenAIBackend())
+register_backend(HuggingFaceBackend())
+register_backend(StubBackend())
@@ -0,0 +1,95 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+
+class MicroBatcher:
+    """Collects concurrently submitted items and runs them through run_batch together.
+
+    A background thread waits for the first queued item, then keeps collecting until
+    max_batch_size items are gathered or max_wait_ms has passed, and resolves each
+    caller's future with the matching entry of run_batch's result list.
+    """
+
+    def __init__(self, run_batch: Callable[[List[Any]], List[Any]], max_batch_size: int, max_wait_ms: float, name: str = "micro-batcher"):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches_run = 0
+        self.items_processed = 0
+        self.max_batch_seen = 0
+        self.max_queue_depth = 0
+        self.failed_batches = 0
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item; the returned future resolves once its batch has run"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        with self._stats_lock:
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.run_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}: run_batch returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                with self._stats_lock:
+                    self.failed_batches += 1
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self.batches_run += 1
+                self.items_processed += len(items)
+                self.max_batch_seen = max(self.max_batch_seen, len(items))
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "batches_run": self.batches_run,
+                "items_processed": self.items_processed,
+                "failed_batches": self.failed_batches,
+                "mean_batch_size": round(self.items_processed / self.batches_run, 2) if self.batches_run else 0.0,
+                "max_batch_size_seen": self.max_batch_seen,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from app.config import LLM_CACHE_ENABLED, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS, LLM_CACHE_DB_PATH, LLM_CACHE_MAX_DISK_ENTRIES
+from app.utils.metrics import cache_lookups, time_stage
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different submissions share a cache entry"""
+    return " ".join((text or "").split()).casefold()
+
+
+def make_cache_key(kind: str, backend: str, model: str, *texts: str) -> str:
+    """Content address for an LLM call: what is asked, of which backend and model, about which inputs"""
+    payload = json.dumps([kind, backend, model, *(normalize_text(text) for text in texts)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryLRUCache:
+    """In-process LRU tier with per-entry TTL"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, expires_at: Optional[float] = None):
+        """Store value until expires_at (a time.time() timestamp), by default ttl_seconds from now"""
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl_seconds if expires_at is None else expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """On-disk tier shared across restarts and worker processes; values must be JSON-serializable.
+
+    Reads only write when an entry's accessed_at is more than touch_seconds old, so the
+    LRU order is kept to that resolution without a commit per hit. The row count is kept
+    in memory and checked against the table only when it passes max_entries, since other
+    processes may have added or evicted rows (so with several writers the table can run
+    over the limit until one of them recounts); eviction then goes down to evict_to of the
+    limit so that the next few inserts need no recount.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float, touch_seconds: float = 60.0, evict_to: float = 0.9):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.touch_seconds = touch_seconds
+        self.evict_to = evict_to
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+        self._rows = self._count()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[tuple]:
+        """(value, expires_at) for a live entry, None otherwise"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at, accessed_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at, accessed_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._rows = max(0, self._rows - 1)
+                self.expirations += 1
+                return None
+            if now - accessed_at >= self.touch_seconds:
+                self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            return json.loads(value), expires_at
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl_seconds, now)
+            )
+            # Replacing an existing key over-counts; the recount below corrects it
+            self._rows += 1
+            if self._rows > self.max_entries:
+                self._rows = self._count()
+                if self._rows > self.max_entries:
+                    overflow = self._rows - int(self.max_entries * self.evict_to)
+                    self._conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)", (overflow,)
+                    )
+                    self._rows -= overflow
+                    self.evictions += overflow
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._rows = 0
+
+    def __len__(self):
+        with self._lock:
+            self._rows = self._count()
+            return self._rows
+
+
+class LLMCache:
+    """Two-tier cache for LLM results: memory LRU in front of an optional on-disk store"""
+
+    def __init__(self, memory: MemoryLRUCache, disk: Optional[SQLiteCache] = None, enabled: bool = True):
+        self.memory = memory
+        self.disk = disk
+        self.enabled = enabled
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with time_stage("cache_lookup"):
+            value, result = self._memory_lookup(key)
+            if result is None:
+                value, result = self._disk_lookup(key)
+        cache_lookups.inc(result=result)
+        return value
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """get for the event loop: memory hits are answered inline, the disk tier is read on a worker thread"""
+        if not self.enabled:
+            return None
+        with time_stage("cache_lookup"):
+            value, result = self._memory_lookup(key)
+            if result is None:
+                if self.disk is not None:
+                    value, result = await asyncio.to_thread(self._disk_lookup, key)
+                else:
+                    value, result = self._disk_lookup(key)
+        cache_lookups.inc(result=result)
+        return value
+
+    def _memory_lookup(self, key: str) -> tuple:
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value, "memory_hit"
+        return None, None
+
+    def _disk_lookup(self, key: str) -> tuple:
+        if self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                # Promote disk hits so repeats are served from memory, keeping the disk entry's expiry
+                value, expires_at = entry
+                self.memory.set(key, value, expires_at=expires_at)
+                self.disk_hits += 1
+                return value, "disk_hit"
+        self.misses += 1
+        return None, "miss"
+
+    def set(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def aset(self, key: str, value: Any):
+        """set for the event loop, writing the disk tier on a worker thread"""
+        if not self.enabled:
+            return
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.memory_hits + self.disk_hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_evictions": self.memory.evictions,
+            "memory_expirations": self.memory.expirations,
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "disk_evictions": self.disk.evictions if self.disk is not None else 0,
+        }
+
+
+def build_llm_cache() -> LLMCache:
+    """Build the cache described by the LLM_CACHE_* settings"""
+    memory = MemoryLRUCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS)
+    disk = SQLiteCache(LLM_CACHE_DB_PATH, LLM_CACHE_MAX_DISK_ENTRIES, LLM_CACHE_TTL_SECONDS) if LLM_CACHE_DB_PATH else None
+    return LLMCache(memory, disk, enabled=LLM_CACHE_ENABLED)
+
+
+# Shared by the OpenAI and Hugging Face parameter extractors
+params_cache = build_llm_cache()
@@ -0,0 +1,57 @@
+import asyncio
+import hashlib
+import json
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+from app.utils.cache import normalize_text
+from app.utils.metrics import coalesced_requests
+
+
+def make_request_key(*parts: Any, texts: tuple = ()) -> str:
+    """Key for a request: free text normalized like cache keys, every other part compared as JSON"""
+    payload = json.dumps([[normalize_text(text) for text in texts], *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Lets concurrent callers with the same key await one shared computation.
+
+    The first caller for a key starts the computation as a task; callers arriving while it
+    runs await the same task and are counted in coalesced_requests_total. Nothing is kept
+    once it finishes, so this is not a cache: the next request computes afresh. Waiters are
+    shielded from each other, so one client disconnecting does not cancel the others' result.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # Tasks belong to one event loop; keep in-flight work per loop (tests and benchmarks start several)
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        inflight = self._inflight.setdefault(asyncio.get_running_loop(), {})
+        task = inflight.get(key)
+        if task is None:
+            task = inflight[key] = asyncio.create_task(compute())
+            task.add_done_callback(lambda done: self._forget(inflight, key, done))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            coalesced_requests.inc(route=self.name)
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _forget(inflight: Dict[str, asyncio.Task], key: str, task: asyncio.Task):
+        if inflight.get(key) is task:
+            del inflight[key]
+        # Retrieve the outcome so a failure every waiter abandoned is not reported as never retrieved
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "in_flight": sum(len(tasks) for tasks in self._inflight.values())
+        }
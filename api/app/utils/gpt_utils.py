@@ -1,12 +1,89 @@
-from openai import OpenAI
-import json
-from app.config import OPENAI_API_KEY, MODEL_NAME
+import asyncio
+import threading
+import weakref
+from app.config import OPENAI_API_KEY, MODEL_NAME, LLM_TIMEOUT_SECONDS, LLM_MAX_CONCURRENCY, LLM_MAX_CONNECTIONS, LLM_STRUCTURED_OUTPUT, LLM_STREAM_IDLE_TIMEOUT_SECONDS
 from app.models.models import SimulationResult
+from app.utils.cache import params_cache, make_cache_key
+from app.utils.logging_utils import get_logger
+from app.utils.metrics import count_tokens, llm_resilience_events
+from app.utils.resilience import CircuitBreaker, ResilientCall
+from app.utils.structured import params_json_schema, parse_params
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+log = get_logger(__name__)
 
-def get_simulation_params_from_context(company_description, advertisement_goal) -> tuple[float, float, float, float]:
-    prompt = f"""
+# Clients are built on first use: importing openai is a large share of cold-start time,
+# and deployments that only use Hugging Face may not configure an API key at all
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            # Retries are ResilientCall's job, within its deadline; the SDK's own would stack on top
+            _client = OpenAI(api_key=OPENAI_API_KEY, timeout=LLM_TIMEOUT_SECONDS, max_retries=0)
+    return _client
+
+
+def get_async_client():
+    """Async client for the event-loop request path; one pooled HTTP client shared by every request"""
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            import httpx
+            from openai import AsyncOpenAI
+            _async_client = AsyncOpenAI(
+                api_key=OPENAI_API_KEY,
+                timeout=LLM_TIMEOUT_SECONDS,
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+                    timeout=LLM_TIMEOUT_SECONDS
+                )
+            )
+    return _async_client
+
+# Caps in-flight OpenAI calls across all concurrent requests. asyncio primitives bind to the
+# loop they first wait on, so keep one per event loop (tests and benchmarks start several).
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return semaphore
+
+DEFAULT_PARAMS = (0.015, 0.5, 0.1, 0.5)
+
+# Every OpenAI call shares one breaker: when the API is degraded, all of them fall back until it recovers
+openai_breaker = CircuitBreaker("openai")
+params_call = ResilientCall("params", openai_breaker)
+insight_call = ResilientCall("insight", openai_breaker)
+insight_stream_call = ResilientCall("insight_stream", openai_breaker)
+
+
+def _fell_back(call: ResilientCall, error: Exception):
+    llm_resilience_events.inc(backend="openai", call=call.name, event="fallback")
+    log.warning(f"openai_{call.name}_failed", error=str(error) or type(error).__name__, circuit=openai_breaker.state)
+
+
+def _record_usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        count_tokens("openai", prompt=getattr(usage, "prompt_tokens", 0) or 0, completion=getattr(usage, "completion_tokens", 0) or 0)
+
+
+def _params_cache_key(company_description, advertisement_goal) -> str:
+    return make_cache_key("simulation_params", "openai", MODEL_NAME, company_description, advertisement_goal)
+
+
+def _build_params_prompt(company_description, advertisement_goal) -> str:
+    return f"""
     # You are a marketing analytics assistant specializing in performance forecasting for ad campaigns. 
 
     # Your task is to:
@@ -40,27 +117,19 @@ def get_simulation_params_from_context(company_description, advertisement_goal)
 
 """
 
-    response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-    )
 
-    content = response.choices[0].message.content
-    try:
-        parsed = json.loads(content)
-        ctr = float(parsed.get("ctr", 0.015))
-        engagement = float(parsed.get("engagement", 0.5))
-        conversion = float(parsed.get("conversion", 0.1))
-        roi_threshold = float(parsed.get("roi_threshold", 0.5))
-    except Exception as e:
-        ctr, engagement, conversion, roi_threshold = 0.015, 0.5, 0.1, 0.5
-
-    return ctr, engagement, conversion, roi_threshold
+def _params_response_format() -> dict:
+    """Extra create() arguments that make the API itself return the parameter object"""
+    if LLM_STRUCTURED_OUTPUT == "json_schema":
+        return {"response_format": {"type": "json_schema", "json_schema": {"name": "campaign_params", "strict": True, "schema": params_json_schema()}}}
+    if LLM_STRUCTURED_OUTPUT == "json_object":
+        return {"response_format": {"type": "json_object"}}
+    return {}
 
 
-def get_chatgpt_marketing_insight(simulation_data: SimulationResult, company_description, advertisement_goal) -> str:
-    prompt = f"""
+def _build_insight_prefix(company_description, advertisement_goal) -> str:
+    # Everything before the simulation result; it is known before the simulation runs
+    return f"""
     # You are a digital marketing analyst for AI-driven campaign optimization systems.
     
     Your task is to analyze simulated user journey data alongside structured campaign context and identify one key bottleneck affecting conversion performance.
@@ -82,19 +151,196 @@ def get_chatgpt_marketing_insight(simulation_data: SimulationResult, company_des
     {advertisement_goal}
     s
     ## Simulation result:
-    {simulation_data.model_dump()}
+    """
+
+
+def _build_insight_prompt(simulation_data: SimulationResult, company_description, advertisement_goal) -> str:
+    return _build_insight_prefix(company_description, advertisement_goal) + f"""{simulation_data.model_dump()}
 """
+
+
+def get_simulation_params_from_context(company_description, advertisement_goal) -> tuple[float, float, float, float]:
+    cache_key = _params_cache_key(company_description, advertisement_goal)
+    cached = params_cache.get(cache_key)
+    if cached is not None:
+        return tuple(cached)
+
+    try:
+        response = params_call.run_sync(lambda timeout: get_client().chat.completions.create(
+            model=MODEL_NAME,
+            messages=[{"role": "user", "content": _build_params_prompt(company_description, advertisement_goal)}],
+            temperature=0.3,
+            timeout=timeout,
+            **_params_response_format(),
+        ))
+    except Exception as e:
+        # Defaults are not cached so the next request asks the model again
+        _fell_back(params_call, e)
+        return DEFAULT_PARAMS
+    _record_usage(response)
+
+    try:
+        params = parse_params(response.choices[0].message.content, "openai")
+    except ValueError as e:
+        log.warning("openai_params_unparseable", error=str(e))
+        return DEFAULT_PARAMS
+
+    params_cache.set(cache_key, list(params))
+    return params
+
+
+async def aget_simulation_params_from_context(company_description, advertisement_goal) -> tuple[float, float, float, float]:
+    """Non-blocking get_simulation_params_from_context for the async request path"""
+    cache_key = _params_cache_key(company_description, advertisement_goal)
+    cached = await params_cache.aget(cache_key)
+    if cached is not None:
+        return tuple(cached)
+
+    async def create(timeout):
+        async with _llm_semaphore():
+            return await get_async_client().chat.completions.create(
+                model=MODEL_NAME,
+                messages=[{"role": "user", "content": _build_params_prompt(company_description, advertisement_goal)}],
+                temperature=0.3,
+                timeout=timeout,
+                **_params_response_format(),
+            )
+
+    try:
+        response = await params_call.run(create)
+    except Exception as e:
+        _fell_back(params_call, e)
+        return DEFAULT_PARAMS
+    _record_usage(response)
+
+    try:
+        params = parse_params(response.choices[0].message.content, "openai")
+    except ValueError as e:
+        log.warning("openai_params_unparseable", error=str(e))
+        return DEFAULT_PARAMS
+
+    await params_cache.aset(cache_key, list(params))
+    return params
+
+
+def get_chatgpt_marketing_insight(simulation_data: SimulationResult, company_description, advertisement_goal) -> str:
     try:
-        response = client.chat.completions.create(
+        response = insight_call.run_sync(lambda timeout: get_client().chat.completions.create(
             model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}],
+            messages=[{"role": "user", "content": _build_insight_prompt(simulation_data, company_description, advertisement_goal)}],
             temperature=0.3,
-        )
+            timeout=timeout,
+        ))
+    except Exception as e:
+        _fell_back(insight_call, e)
+        return _fallback_insight(simulation_data)
+    _record_usage(response)
+    return response.choices[0].message.content.strip()
+
+
+async def aget_chatgpt_marketing_insight(simulation_data: SimulationResult, company_description, advertisement_goal) -> str:
+    """Non-blocking get_chatgpt_marketing_insight for the async request path"""
+    async def create(timeout):
+        async with _llm_semaphore():
+            return await get_async_client().chat.completions.create(
+                model=MODEL_NAME,
+                messages=[{"role": "user", "content": _build_insight_prompt(simulation_data, company_description, advertisement_goal)}],
+                temperature=0.3,
+                timeout=timeout,
+            )
+
+    try:
+        response = await insight_call.run(create)
     except Exception as e:
-        return _generate_gpt_fallback_insight(simulation_data, ctr, conversion_rate)
+        _fell_back(insight_call, e)
+        return _fallback_insight(simulation_data)
+    _record_usage(response)
     return response.choices[0].message.content.strip()
 
 
+async def aprepare_chatgpt_insight(company_description, advertisement_goal) -> str:
+    """Build the insight prompt prefix ahead of the simulation.
+
+    OpenAI exposes no explicit prefill, but a byte-identical prefix is what its automatic
+    prompt caching keys on, so the prefix is built once here and reused verbatim.
+    """
+    return _build_insight_prefix(company_description, advertisement_goal)
+
+
+async def astream_chatgpt_marketing_insight(simulation_data: SimulationResult, company_description, advertisement_goal, prefix: str = None):
+    """Yield the insight as it is generated; falls back to the structured insight if the call fails before any text.
+
+    The deadline, retries and hedges cover opening the stream and waiting for its first text, and
+    only that part holds an LLM concurrency slot. Every later chunk gets LLM_STREAM_IDLE_TIMEOUT_SECONDS,
+    so a long but steady insight is not cut off and a slow consumer does not keep other calls waiting.
+    """
+    prefix = prefix or _build_insight_prefix(company_description, advertisement_goal)
+    prompt = prefix + f"""{simulation_data.model_dump()}
+"""
+
+    async def open_stream(timeout):
+        async with _llm_semaphore():
+            stream = await get_async_client().chat.completions.create(
+                model=MODEL_NAME,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                stream=True,
+                timeout=timeout,
+            )
+            try:
+                chunks = stream.__aiter__()
+                return stream, chunks, await _next_text(chunks)
+            except BaseException:
+                # A retry or hedge opens a new stream; this one must not keep its connection
+                await _close_stream(stream)
+                raise
+
+    streamed = False
+    stream = None
+    try:
+        stream, chunks, text = await insight_stream_call.run(open_stream)
+        while text is not None:
+            streamed = True
+            # Streamed responses carry no usage block; each content delta is one token
+            count_tokens("openai", completion=1)
+            yield text
+            text = await asyncio.wait_for(_next_text(chunks), LLM_STREAM_IDLE_TIMEOUT_SECONDS)
+    except Exception as e:
+        # Once text has been sent it cannot be taken back
+        if streamed:
+            raise
+        _fell_back(insight_stream_call, e)
+        yield _fallback_insight(simulation_data)
+    finally:
+        if stream is not None:
+            await _close_stream(stream)
+
+
+async def _next_text(chunks):
+    """The next non-empty content delta of a chat completion stream, None once it ends"""
+    while True:
+        try:
+            chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+        if chunk.choices and chunk.choices[0].delta.content:
+            return chunk.choices[0].delta.content
+
+
+async def _close_stream(stream):
+    close = getattr(stream, "close", None)
+    if close is not None:
+        await close()
+
+
+def _fallback_insight(simulation_data: SimulationResult) -> str:
+    # Rates in percent, matching the thresholds used by _generate_gpt_fallback_insight
+    impressions = max(simulation_data.total_impressions, 1)
+    ctr = simulation_data.total_clicks / impressions * 100
+    conversion_rate = simulation_data.total_conversions / impressions * 100
+    return _generate_gpt_fallback_insight(simulation_data, ctr, conversion_rate)
+
+
 def _generate_gpt_fallback_insight(simulation_data: SimulationResult, ctr: float, conversion_rate: float) -> str:
     """Generate a structured fallback insight when the OpenAI model fails"""
     if ctr < 1.0:
@@ -118,4 +364,4 @@ def _generate_gpt_fallback_insight(simulation_data: SimulationResult, ctr: float
 
 **ROI Assessment:** Your campaign achieved a {simulation_data.roi_fit_score}% fit score, indicating {simulation_data.roi_fit_tag.lower()} potential.
 
-*Generated using OpenAI API*"""
\ No newline at end of file
+*Generated from the simulation statistics; the OpenAI API was unavailable*"""
\ No newline at end of file
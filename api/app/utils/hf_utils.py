@@ -1,20 +1,90 @@
-import json
-import re
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-from app.config import MODEL_NAME, HUGGING_FACE_TOKEN, DEVICE, MAX_LENGTH
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from transformers.pytorch_utils import Conv1D
+from transformers import AutoTokenizer, AutoModelForCausalLM, DynamicCache, LogitsProcessor, LogitsProcessorList, StoppingCriteria, StoppingCriteriaList, TextStreamer, pipeline
+from app.config import MODEL_NAME, HUGGING_FACE_TOKEN, DEVICE, MAX_LENGTH, HF_EXECUTOR_WORKERS, LLM_TIMEOUT_SECONDS, HF_BATCHING_ENABLED, HF_BATCH_MAX_SIZE, HF_BATCH_MAX_WAIT_MS, LLM_STRUCTURED_OUTPUT, HF_PARAMS_MAX_NEW_TOKENS, HF_PREFIX_CACHE_ENABLED, HF_PREFIX_CACHE_MAX_MB, HF_CPU_QUANTIZATION, HF_CPU_THREADS, HF_MODEL_SERVER_SOCKET, HF_MODEL_SERVER_WAIT_SECONDS
 from app.models.models import SimulationResult
+from app.utils.batching import MicroBatcher
+from app.utils.cache import params_cache, make_cache_key
+from app.utils.logging_utils import get_logger
+from app.utils.metrics import count_tokens, stage_duration
+from app.utils.model_server import ModelServerClient
+from app.utils.prefix_cache import PrefixKVCache
+from app.utils.structured import ParamsGrammar, parse_params
 import torch
 
+log = get_logger(__name__)
+
 _model = None
 _tokenizer = None
 _generator = None
 
+# Model load and warm-up timings, reported by the /ready endpoint
+_load_stats = {"loaded": False, "model": None, "quantization": None, "load_seconds": None, "warmup_seconds": None}
+
+CPU_QUANTIZATION_MODES = ("none", "int8")
+
+# Mode for the next model load; switch_hf_model can change it
+_cpu_quantization = HF_CPU_QUANTIZATION
+
+# Set when a shared model server owns the model: generations are forwarded to it and this process never loads one
+_model_server = ModelServerClient(HF_MODEL_SERVER_SOCKET) if HF_MODEL_SERVER_SOCKET else None
+
+def use_model_server(path):
+    """Forward generations to the model server at path, or run them in this process when path is None"""
+    global _model_server
+    _model_server = ModelServerClient(path) if path else None
+
+# Blocking pipeline calls run here so the async request path never stalls the event loop.
+# With batching, workers mostly wait on the batcher, so allow enough of them to fill a batch.
+_hf_executor = ThreadPoolExecutor(
+    max_workers=max(HF_EXECUTOR_WORKERS, HF_BATCH_MAX_SIZE if HF_BATCHING_ENABLED else 1),
+    thread_name_prefix="hf-inference"
+)
+
+def _quantization_in_effect() -> str:
+    # CUDA loads run in float16; the CPU modes only apply without it
+    return "none" if torch.cuda.is_available() else _cpu_quantization
+
+def _model_label() -> str:
+    """MODEL_NAME plus the quantization mode, so cached outputs of different modes never mix"""
+    mode = _quantization_in_effect()
+    return MODEL_NAME if mode == "none" else f"{MODEL_NAME}+{mode}"
+
+def _quantize_int8(model):
+    """Dynamic int8 quantization of every linear layer except the output head"""
+    # GPT-2 style checkpoints use transformers' Conv1D, a Linear with transposed weights; convert them so they are quantized too
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                linear = torch.nn.Linear(*child.weight.shape, device="meta")
+                linear.weight = torch.nn.Parameter(child.weight.detach().t().contiguous())
+                linear.bias = child.bias
+                setattr(parent, name, linear)
+    # The output head scores the whole vocabulary, and is often tied to the input embeddings; it stays in float32
+    head = model.get_output_embeddings()
+    layers = {name: torch.ao.quantization.default_dynamic_qconfig for name, module in model.named_modules() if isinstance(module, torch.nn.Linear) and module is not head}
+    return torch.ao.quantization.quantize_dynamic(model, layers, dtype=torch.qint8, inplace=True)
+
+def _optimize_for_cpu(generator, mode: str):
+    if HF_CPU_THREADS > 0:
+        torch.set_num_threads(HF_CPU_THREADS)
+    if mode == "int8":
+        started = time.perf_counter()
+        generator.model = _quantize_int8(generator.model.eval())
+        log.info("hf_model_quantized", mode=mode, seconds=round(time.perf_counter() - started, 3))
+
 def _initialize_hf_model():
     """Initialize the Hugging Face model and tokenizer (lazy loading)"""
     global _model, _tokenizer, _generator
     
     if _generator is None:
-        print(f"Loading Hugging Face model: {MODEL_NAME}...")
+        if _cpu_quantization not in CPU_QUANTIZATION_MODES:
+            raise ValueError(f"Unknown HF_CPU_QUANTIZATION '{_cpu_quantization}', expected one of {CPU_QUANTIZATION_MODES}")
+        log.info("hf_model_loading", model=MODEL_NAME, quantization=_quantization_in_effect())
+        load_started = time.perf_counter()
+        loaded_model = MODEL_NAME
         try:
             _generator = pipeline(
                 "text-generation",
@@ -30,10 +100,10 @@ def _initialize_hf_model():
                 top_p=0.9,
                 pad_token_id=50256
             )
-            print(f"Hugging Face model {MODEL_NAME} loaded successfully!")
+            log.info("hf_model_loaded", model=MODEL_NAME)
         except Exception as e:
-            print(f"Error loading model {MODEL_NAME}: {e}")
-            print("Falling back to GPT-2...")
+            log.warning("hf_model_load_failed", model=MODEL_NAME, error=str(e), fallback="gpt2")
+            loaded_model = "gpt2"
             _generator = pipeline(
                 "text-generation",
                 model="gpt2",
@@ -43,32 +113,71 @@ def _initialize_hf_model():
                 temperature=0.3,
                 top_p=0.9
             )
+
+        if not torch.cuda.is_available():
+            _optimize_for_cpu(_generator, _cpu_quantization)
+
+        # Batched generation pads on the left so every prompt ends right where decoding starts
+        if _generator.tokenizer.pad_token is None:
+            _generator.tokenizer.pad_token = _generator.tokenizer.eos_token
+        _generator.tokenizer.padding_side = "left"
+        load_seconds = time.perf_counter() - load_started
+        _load_stats.update(loaded=True, model=loaded_model, quantization=_quantization_in_effect(), load_seconds=round(load_seconds, 3))
+        stage_duration.observe(load_seconds, stage="model_load", backend="huggingface")
     
     return _generator
 
-def _extract_json_from_response(text: str) -> dict:
-    """Extract JSON from model response, handling various formats"""
-    json_pattern = r'\{[^{}]*\}'
-    matches = re.findall(json_pattern, text)
-    
-    for match in matches:
-        try:
-            return json.loads(match)
-        except json.JSONDecodeError:
-            continue
-    
-    return {
-        "ctr": 0.015,
-        "engagement": 0.5,
-        "conversion": 0.1,
-        "roi_threshold": 0.5
-    }
+# Grammars depend only on the tokenizer's vocabulary; building one decodes every token once
+_grammars = {}
 
-def get_hf_simulation_params_from_context(company_description, advertisement_goal) -> tuple[float, float, float, float]:
-    """Extract marketing campaign parameters using Hugging Face model (GPT-OSS-120B)"""
-    generator = _initialize_hf_model()
-    
-    prompt = f"""
+def _params_grammar(tokenizer) -> ParamsGrammar:
+    key = tokenizer.name_or_path
+    if key not in _grammars:
+        # Decode each token after a fixed anchor so leading-space markers come out as real spaces
+        anchor = tokenizer.encode("a", add_special_tokens=False)
+        base = tokenizer.decode(anchor)
+        strings = [tokenizer.decode(anchor + [i])[len(base):] for i in range(len(tokenizer))]
+        _grammars[key] = ParamsGrammar(strings, [tokenizer.eos_token_id])
+    return _grammars[key]
+
+class _GrammarConstraint(LogitsProcessor):
+    """Masks every token that would take a row's generated text outside the grammar"""
+
+    def __init__(self, grammar: ParamsGrammar, tokenizer):
+        self.grammar = grammar
+        self.tokenizer = tokenizer
+        self.prompt_length = None
+        self._masks = {}
+
+    def texts(self, input_ids) -> list:
+        # The batch is one generate call over left-padded prompts, so every row's prompt has the first call's length
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1]
+        return self.tokenizer.batch_decode(input_ids[:, self.prompt_length:], skip_special_tokens=True)
+
+    def __call__(self, input_ids, scores):
+        mask = torch.full_like(scores, float("-inf"))
+        for row, text in enumerate(self.texts(input_ids)):
+            state, allowed = self.grammar.allowed(text)
+            if state not in self._masks:
+                # Off the grammar (never expected) the row may only end
+                ids = list(allowed) or [self.tokenizer.eos_token_id]
+                self._masks[state] = torch.tensor(ids, device=scores.device)
+            mask[row, self._masks[state]] = 0
+        return scores + mask
+
+class _GrammarDone(StoppingCriteria):
+    """Stops each row as soon as its closing brace is out instead of running to max_new_tokens"""
+
+    def __init__(self, constraint: _GrammarConstraint):
+        self.constraint = constraint
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = [self.constraint.grammar.done(text) for text in self.constraint.texts(input_ids)]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+# Fixed instruction blocks that open the prompts; everything after them depends on the request
+PARAMS_PROMPT_HEAD = """
     # You are a marketing analytics assistant specializing in performance forecasting for ad campaigns. 
 
     # Your task is to:
@@ -86,41 +195,194 @@ def get_hf_simulation_params_from_context(company_description, advertisement_goa
         - Use marketing and product sense to deduce fields not directly mentioned.
         - Keep keys lowercase and values concise.
 
-    Company: {company_description}  
-    Advertisement Goal: {advertisement_goal}
+"""
 
-    Return only the following in strict JSON format:
+INSIGHT_PROMPT_HEAD = """
+    # You are a digital marketing analyst for AI-driven campaign optimization systems.
+    
+    Your task is to analyze simulated user journey data alongside structured campaign context and identify one key bottleneck affecting conversion performance.
+    Then, propose one smart, evidence-based change to improve the outcome.
 
-    {{
-    "ctr": float,
-    "engagement": float,
-    "conversion": float,
-    "roi_threshold": float
-    }}
+    ## Use clear, structured reasoning in three parts:
+        - Bottleneck
+        - Root cause
+        - Optimization suggestion
 
-    Do not include explanations, reasoning, intermediate steps, or contextual metadata in the output.
+    ## Keep language concise, marketing-specific, and actionable.
+
+    ## Do not repeat the input data or simulate outputs—focus only on diagnosing the problem and offering a recommendation.
 
 """
-    
-    try:
-        response = generator(
-            prompt,
-            max_length=len(prompt.split()) + 100,
+
+PROMPT_HEADS = {"params": PARAMS_PROMPT_HEAD, "insight": INSIGHT_PROMPT_HEAD}
+
+# Keyed by (loaded model, template), so a model switch or a new template gets its own entry
+_prefix_cache = PrefixKVCache(int(HF_PREFIX_CACHE_MAX_MB * 1024 * 1024))
+
+def _past_nbytes(layers) -> int:
+    return sum(tensor.numel() * tensor.element_size() for layer in layers for tensor in layer)
+
+def _static_prefix(template: str) -> dict:
+    """Token ids and past key values of a template's fixed head, prefilled once per model"""
+    generator = _initialize_hf_model()
+
+    def build():
+        tokenizer, model = generator.tokenizer, generator.model
+        started = time.perf_counter()
+        input_ids = tokenizer(PROMPT_HEADS[template], return_tensors="pt").input_ids.to(model.device)
+        with torch.no_grad():
+            past = model(input_ids=input_ids, use_cache=True).past_key_values
+        # Stored as plain (key, value) tensors per layer; every use gets its own copy to extend
+        layers = past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past
+        log.info("hf_prefix_prefilled", template=template, tokens=input_ids.shape[-1], bytes=_past_nbytes(layers), seconds=round(time.perf_counter() - started, 3))
+        return {"input_ids": input_ids, "past_key_values": layers}, _past_nbytes(layers)
+
+    return _prefix_cache.get_or_build((_load_stats["model"], _load_stats["quantization"], template), build)
+
+def _expand_past(layers, batch_size: int) -> DynamicCache:
+    # repeat() copies, and generation appends to the cache it is given: the stored prefix stays untouched
+    return DynamicCache.from_legacy_cache(tuple((key.repeat(batch_size, 1, 1, 1), value.repeat(batch_size, 1, 1, 1)) for key, value in layers))
+
+def _generate_after_prefix(generator, template: str, tails: list, kwargs: dict) -> list:
+    """Continue the cached head of template with each tail as one batch, prefilling only the tails"""
+    tokenizer, model = generator.tokenizer, generator.model
+    static = _static_prefix(template)
+    # Tails are left-padded, so the padding sits between the shared head and each tail and is masked out
+    tail = tokenizer(tails, return_tensors="pt", padding=True, add_special_tokens=False).to(model.device)
+    head_ids = static["input_ids"].repeat(len(tails), 1)
+    input_ids = torch.cat([head_ids, tail.input_ids], dim=-1)
+    attention_mask = torch.cat([torch.ones_like(head_ids), tail.attention_mask], dim=-1)
+    with torch.no_grad():
+        output = model.generate(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            past_key_values=_expand_past(static["past_key_values"], len(tails)),
+            do_sample=True,
+            top_p=0.9,
+            pad_token_id=tokenizer.pad_token_id,
+            **kwargs
+        )
+    texts = tokenizer.batch_decode(output[:, input_ids.shape[1]:], skip_special_tokens=True)
+    count_tokens(
+        "huggingface",
+        prompt=head_ids.numel() + int(tail.attention_mask.sum()),
+        completion=sum(len(ids) for ids in tokenizer(texts).input_ids)
+    )
+    return texts
+
+def _run_generation_batch(items: list) -> list:
+    """Generate continuations for (prompt, generation kwargs) items as padded batches.
+
+    Items with a "prefix" kwarg carry only the request-specific tail of that template's prompt.
+    """
+    generator = _initialize_hf_model()
+    results = [None] * len(items)
+
+    # Prompts can only share a forward pass when they share generation settings
+    groups = {}
+    for index, (prompt, kwargs) in enumerate(items):
+        groups.setdefault(kwargs, []).append(index)
+
+    for kwargs, indices in groups.items():
+        kwargs = dict(kwargs)
+        if kwargs.pop("structured", None) == "params":
+            constraint = _GrammarConstraint(_params_grammar(generator.tokenizer), generator.tokenizer)
+            kwargs.update(logits_processor=LogitsProcessorList([constraint]), stopping_criteria=StoppingCriteriaList([_GrammarDone(constraint)]))
+        template = kwargs.pop("prefix", None)
+        if template is not None:
+            for i, text in zip(indices, _generate_after_prefix(generator, template, [items[i][0] for i in indices], kwargs)):
+                results[i] = text
+            continue
+        outputs = generator(
+            [items[i][0] for i in indices],
+            batch_size=len(indices),
             num_return_sequences=1,
-            temperature=0.3,
             do_sample=True,
-            pad_token_id=generator.tokenizer.eos_token_id
+            return_full_text=False,
+            pad_token_id=generator.tokenizer.pad_token_id,
+            **kwargs
         )
-        
-        generated_text = response[0]['generated_text']
-        new_content = generated_text[len(prompt):].strip()
-        
-        parsed = _extract_json_from_response(new_content)
-        
-        ctr = float(parsed.get("ctr", 0.015))
-        engagement = float(parsed.get("engagement", 0.5))
-        conversion = float(parsed.get("conversion", 0.1))
-        roi_threshold = float(parsed.get("roi_threshold", 0.5))
+        for i, output in zip(indices, outputs):
+            results[i] = output[0]["generated_text"]
+        prompts = [items[i][0] for i in indices]
+        count_tokens(
+            "huggingface",
+            prompt=sum(len(ids) for ids in generator.tokenizer(prompts).input_ids),
+            completion=sum(len(ids) for ids in generator.tokenizer([results[i] for i in indices]).input_ids)
+        )
+    return results
+
+_batcher = MicroBatcher(_run_generation_batch, HF_BATCH_MAX_SIZE, HF_BATCH_MAX_WAIT_MS, name="hf-batcher")
+
+def _generate(prompt: str, **kwargs) -> str:
+    """Return the model's continuation of prompt, batched with concurrent callers when enabled"""
+    if _model_server is not None:
+        return _model_server.generate(prompt, kwargs)
+    item = (prompt, tuple(sorted(kwargs.items())))
+    if HF_BATCHING_ENABLED:
+        return _batcher.submit(item).result()
+    return _run_generation_batch([item])[0]
+
+async def agenerate(prompt: str, kwargs: dict) -> str:
+    """_generate for the model server's event loop: waits on the batcher without holding a thread"""
+    item = (prompt, tuple(sorted(kwargs.items())))
+    if HF_BATCHING_ENABLED:
+        return await asyncio.wrap_future(_batcher.submit(item))
+    loop = asyncio.get_running_loop()
+    return (await loop.run_in_executor(_hf_executor, _run_generation_batch, [item]))[0]
+
+def _generate_from_template(template: str, tail: str, **kwargs) -> str:
+    """Continuation of PROMPT_HEADS[template] + tail, reusing the head's cached past key values when enabled"""
+    if HF_PREFIX_CACHE_ENABLED:
+        return _generate(tail, prefix=template, **kwargs)
+    return _generate(PROMPT_HEADS[template] + tail, **kwargs)
+
+def warm_up_hf_model(run_generation: bool = True) -> dict:
+    """Load the model now and optionally run one tiny generation so first requests skip lazy init costs"""
+    if _model_server is not None:
+        # The model server loads and warms up the model; wait until it answers
+        _model_server.wait_ready(HF_MODEL_SERVER_WAIT_SECONDS)
+        return get_hf_load_stats()
+    generator = _initialize_hf_model()
+    if LLM_STRUCTURED_OUTPUT != "off":
+        _params_grammar(generator.tokenizer)
+    if HF_PREFIX_CACHE_ENABLED:
+        for template in PROMPT_HEADS:
+            _static_prefix(template)
+    if run_generation:
+        started = time.perf_counter()
+        _run_generation_batch([("Hello", (("max_new_tokens", 1),))])
+        _load_stats["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    return get_hf_load_stats()
+
+def _model_server_stats() -> dict:
+    try:
+        return {"reachable": True, **_model_server.stats()}
+    except Exception as e:
+        return {"reachable": False, "error": str(e)}
+
+def get_hf_load_stats() -> dict:
+    if _model_server is not None:
+        stats = _model_server_stats()
+        return {**stats.pop("load", {"loaded": False}), "model_server": {"socket": _model_server.path, **stats}}
+    return {**_load_stats, "prefix_cache": {"enabled": HF_PREFIX_CACHE_ENABLED, **_prefix_cache.stats()}}
+
+def get_hf_batching_stats() -> dict:
+    """Queue depth and batch-size counters of the generation batcher"""
+    if _model_server is not None:
+        stats = _model_server_stats()
+        return {**stats.pop("batching", {"enabled": HF_BATCHING_ENABLED}), "model_server": {"socket": _model_server.path, **stats}}
+    return {"enabled": HF_BATCHING_ENABLED, **_batcher.stats()}
+
+def get_hf_simulation_params_from_context(company_description, advertisement_goal) -> tuple[float, float, float, float]:
+    """Extract marketing campaign parameters using Hugging Face model (GPT-OSS-120B)"""
+    cache_key = make_cache_key("simulation_params", "huggingface", _model_label(), company_description, advertisement_goal)
+    cached = params_cache.get(cache_key)
+    if cached is not None:
+        return tuple(cached)
+
+    try:
+        ctr, engagement, conversion, roi_threshold = extract_hf_params(company_description, advertisement_goal)
         
         ctr = max(0.001, min(0.2, ctr))
         engagement = max(0.1, min(1.0, engagement))
@@ -128,58 +390,224 @@ def get_hf_simulation_params_from_context(company_description, advertisement_goa
         roi_threshold = max(0.01, min(1.0, roi_threshold))
         
     except Exception as e:
-        print(f"Error generating parameters with Hugging Face: {e}")
-        ctr, engagement, conversion, roi_threshold = 0.015, 0.5, 0.1, 0.5
+        log.warning("hf_params_failed", error=str(e))
+        return 0.015, 0.5, 0.1, 0.5
 
+    params_cache.set(cache_key, [ctr, engagement, conversion, roi_threshold])
     return ctr, engagement, conversion, roi_threshold
 
-def get_hf_marketing_insight(simulation_data: SimulationResult, company_description, advertisement_goal) -> str:
-    f"""
-    # You are a digital marketing analyst for AI-driven campaign optimization systems.
-    
-    Your task is to analyze simulated user journey data alongside structured campaign context and identify one key bottleneck affecting conversion performance.
-    Then, propose one smart, evidence-based change to improve the outcome.
+def extract_hf_params(company_description, advertisement_goal) -> tuple[float, float, float, float]:
+    """One uncached, unclamped parameter extraction; raises ParamsParseError on unusable output"""
+    tail = f"""    Company: {company_description}  
+    Advertisement Goal: {advertisement_goal}
 
-    ## Use clear, structured reasoning in three parts:
-        - Bottleneck
-        - Root cause
-        - Optimization suggestion
+    Return only the following in strict JSON format:
 
-    ## Keep language concise, marketing-specific, and actionable.
+    {{
+    "ctr": float,
+    "engagement": float,
+    "conversion": float,
+    "roi_threshold": float
+    }}
 
-    ## Do not repeat the input data or simulate outputs—focus only on diagnosing the problem and offering a recommendation.
+    Do not include explanations, reasoning, intermediate steps, or contextual metadata in the output.
 
-    ## Company: 
+"""
+
+    # Grammar-constrained decoding emits exactly the parameter object and stops at its closing brace
+    structured = {} if LLM_STRUCTURED_OUTPUT == "off" else {"structured": "params"}
+    new_content = _generate_from_template("params", tail, max_new_tokens=HF_PARAMS_MAX_NEW_TOKENS, temperature=0.3, **structured).strip()
+    return parse_params(new_content, "huggingface")
+
+def _build_insight_context(company_description, advertisement_goal) -> str:
+    # The request-specific part of the insight prefix: known before the simulation runs
+    return f"""    ## Company: 
     {company_description}  
 
     ## Advertisement Goal: 
     {advertisement_goal}
     s
     ## Simulation result:
-    {simulation_data.model_dump()}
+    """
+
+def _build_insight_prefix(company_description, advertisement_goal) -> str:
+    # Everything before the simulation result
+    return INSIGHT_PROMPT_HEAD + _build_insight_context(company_description, advertisement_goal)
+
+def _build_insight_tail(simulation_data: SimulationResult, company_description, advertisement_goal) -> str:
+    return _build_insight_context(company_description, advertisement_goal) + f"""{simulation_data.model_dump()}
 """
+
+def get_hf_marketing_insight(simulation_data: SimulationResult, company_description, advertisement_goal) -> str:
+    """Generate marketing insights using Hugging Face model (GPT-OSS-120B)"""
+    tail = _build_insight_tail(simulation_data, company_description, advertisement_goal)
     
     try:
-        response = generator(
-            prompt,
-            max_length=len(prompt.split()) + 150,
-            num_return_sequences=1,
-            temperature=0.4,
-            do_sample=True,
-            pad_token_id=generator.tokenizer.eos_token_id
-        )
-        
-        generated_text = response[0]['generated_text']
-        insight = generated_text[len(prompt):].strip()
+        insight = _generate_from_template("insight", tail, max_new_tokens=150, temperature=0.4).strip()
         
         if len(insight) < 50:
-            insight = _generate_hf_fallback_insight(simulation_data, ctr, conversion_rate)
+            insight = _fallback_insight(simulation_data)
             
         return insight
         
     except Exception as e:
-        print(f"Error generating insights with Hugging Face: {e}")
-        return _generate_hf_fallback_insight(simulation_data, ctr, conversion_rate)
+        log.warning("hf_insight_failed", error=str(e))
+        return _fallback_insight(simulation_data)
+
+async def aget_hf_simulation_params_from_context(company_description, advertisement_goal) -> tuple[float, float, float, float]:
+    """Run get_hf_simulation_params_from_context on the dedicated inference executor"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(_hf_executor, get_hf_simulation_params_from_context, company_description, advertisement_goal),
+            LLM_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        log.warning("hf_params_timeout", timeout_seconds=LLM_TIMEOUT_SECONDS)
+        return 0.015, 0.5, 0.1, 0.5
+
+async def aget_hf_marketing_insight(simulation_data: SimulationResult, company_description, advertisement_goal) -> str:
+    """Run get_hf_marketing_insight on the dedicated inference executor"""
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(_hf_executor, get_hf_marketing_insight, simulation_data, company_description, advertisement_goal),
+            LLM_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        log.warning("hf_insight_timeout", timeout_seconds=LLM_TIMEOUT_SECONDS)
+        return _fallback_insight(simulation_data)
+
+class _AsyncTokenStreamer(TextStreamer):
+    """TextStreamer that hands decoded text from the inference thread to an asyncio queue"""
+
+    def __init__(self, tokenizer, loop, queue):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self._loop = loop
+        self._queue = queue
+
+    def put(self, value):
+        # Called with the prompt first (skipped by TextStreamer), then once per generated token
+        if not (self.skip_prompt and self.next_tokens_are_prompt):
+            count_tokens("huggingface", completion=value.numel())
+        super().put(value)
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, text)
+
+def _prefill_insight_prefix(company_description, advertisement_goal) -> dict:
+    """Run the forward pass over the insight prefix and keep its past key values.
+
+    With the prefix cache, only the company and goal are prefilled, on top of a copy of
+    the cached instruction block.
+    """
+    generator = _initialize_hf_model()
+    tokenizer, model = generator.tokenizer, generator.model
+    prefix = _build_insight_prefix(company_description, advertisement_goal)
+    if not HF_PREFIX_CACHE_ENABLED:
+        prefix_ids = tokenizer(prefix, return_tensors="pt").input_ids.to(model.device)
+        count_tokens("huggingface", prompt=prefix_ids.shape[-1])
+        with torch.no_grad():
+            outputs = model(input_ids=prefix_ids, use_cache=True)
+        return {"prefix": prefix, "input_ids": prefix_ids, "past_key_values": outputs.past_key_values}
+
+    static = _static_prefix("insight")
+    context_ids = tokenizer(_build_insight_context(company_description, advertisement_goal), return_tensors="pt", add_special_tokens=False).input_ids.to(model.device)
+    prefix_ids = torch.cat([static["input_ids"], context_ids], dim=-1)
+    count_tokens("huggingface", prompt=prefix_ids.shape[-1])
+    with torch.no_grad():
+        outputs = model(input_ids=context_ids, attention_mask=torch.ones_like(prefix_ids), past_key_values=_expand_past(static["past_key_values"], 1), use_cache=True)
+    return {"prefix": prefix, "input_ids": prefix_ids, "past_key_values": outputs.past_key_values}
+
+def _generate_insight_streaming(simulation_data: SimulationResult, prepared: dict, streamer: TextStreamer):
+    generator = _initialize_hf_model()
+    tokenizer, model = generator.tokenizer, generator.model
+    # Tokenize the suffix on its own so the sequence starts with exactly the prefilled prefix tokens
+    suffix_ids = tokenizer(f"""{simulation_data.model_dump()}
+""", return_tensors="pt", add_special_tokens=False).input_ids.to(model.device)
+    count_tokens("huggingface", prompt=suffix_ids.shape[-1])
+    input_ids = torch.cat([prepared["input_ids"], suffix_ids], dim=-1)
+    with torch.no_grad():
+        model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=prepared["past_key_values"],
+            max_new_tokens=150,
+            do_sample=True,
+            temperature=0.4,
+            streamer=streamer,
+            pad_token_id=tokenizer.eos_token_id
+        )
+
+async def aprepare_hf_insight(company_description, advertisement_goal) -> dict:
+    """Prefill the insight prefix on the inference executor, typically while parameters are being extracted"""
+    if _model_server is not None:
+        # The past key values would live in the server process; it prefills when the stream starts
+        return None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hf_executor, _prefill_insight_prefix, company_description, advertisement_goal)
+
+async def astream_hf_marketing_insight(simulation_data: SimulationResult, company_description, advertisement_goal, prepared: dict = None):
+    """Yield insight text as the model decodes it, continuing from a prefilled prefix when given"""
+    if _model_server is not None:
+        async for text in _astream_from_model_server(simulation_data, company_description, advertisement_goal):
+            yield text
+        return
+    loop = asyncio.get_running_loop()
+    try:
+        if prepared is None:
+            prepared = await aprepare_hf_insight(company_description, advertisement_goal)
+        queue = asyncio.Queue()
+        streamer = _AsyncTokenStreamer(_initialize_hf_model().tokenizer, loop, queue)
+        generation = loop.run_in_executor(_hf_executor, _generate_insight_streaming, simulation_data, prepared, streamer)
+        # Queued after every streamed chunk, so None marks the end of the text
+        generation.add_done_callback(lambda _: queue.put_nowait(None))
+    except Exception as e:
+        log.warning("hf_insight_stream_prepare_failed", error=str(e))
+        yield _fallback_insight(simulation_data)
+        return
+
+    streamed = False
+    deadline = loop.time() + LLM_TIMEOUT_SECONDS
+    while True:
+        try:
+            text = await asyncio.wait_for(queue.get(), timeout=max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            log.warning("hf_insight_stream_timeout", timeout_seconds=LLM_TIMEOUT_SECONDS)
+            break
+        if text is None:
+            break
+        streamed = True
+        yield text
+
+    if generation.done() and generation.exception() is not None:
+        log.warning("hf_insight_stream_failed", error=str(generation.exception()))
+    if not streamed:
+        yield _fallback_insight(simulation_data)
+
+async def _astream_from_model_server(simulation_data: SimulationResult, company_description, advertisement_goal):
+    streamed = False
+    try:
+        async for text in _model_server.astream({
+            "op": "stream",
+            "simulation_data": simulation_data.model_dump(),
+            "company_description": company_description,
+            "advertisement_goal": advertisement_goal
+        }):
+            streamed = True
+            yield text
+    except Exception as e:
+        log.warning("hf_insight_stream_failed", error=str(e))
+    if not streamed:
+        yield _fallback_insight(simulation_data)
+
+def _fallback_insight(simulation_data: SimulationResult) -> str:
+    # Rates in percent, matching the thresholds used by _generate_hf_fallback_insight
+    impressions = max(simulation_data.total_impressions, 1)
+    ctr = simulation_data.total_clicks / impressions * 100
+    conversion_rate = simulation_data.total_conversions / impressions * 100
+    return _generate_hf_fallback_insight(simulation_data, ctr, conversion_rate)
 
 def _generate_hf_fallback_insight(simulation_data: SimulationResult, ctr: float, conversion_rate: float) -> str:
     """Generate a structured fallback insight when the Hugging Face model fails"""
@@ -217,10 +645,15 @@ def get_available_hf_models():
         "gpt-oss-120b"
     ]
 
-def switch_hf_model(model_name: str):
-    """Switch to a different Hugging Face model"""
-    global _generator, MODEL_NAME
+def switch_hf_model(model_name: str, quantization: str = None):
+    """Switch to a different Hugging Face model, optionally with another CPU quantization mode"""
+    global _generator, MODEL_NAME, _cpu_quantization
+    # The old model's cached prefixes can never be used again
+    _prefix_cache.drop(lambda key: key[:2] == (_load_stats["model"], _load_stats["quantization"]))
     _generator = None
+    _load_stats.update(loaded=False, model=None, quantization=None, load_seconds=None, warmup_seconds=None)
     MODEL_NAME = model_name
-    print(f"Switched to Hugging Face model: {model_name}")
+    if quantization is not None:
+        _cpu_quantization = quantization
+    log.info("hf_model_switched", model=model_name, quantization=_cpu_quantization)
     return _initialize_hf_model()
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.config import JOBS_DB_PATH, BATCH_JOB_CONCURRENCY, BATCH_JOB_RATE_PER_SECOND
+from app.utils.cache import normalize_text
+from app.utils.logging_utils import get_logger
+
+log = get_logger(__name__)
+
+# Evaluates one item of a job: (index, item) -> JSON-serializable result
+ItemRunner = Callable[[int, Any], Awaitable[dict]]
+
+# Identifies this server process in the store; unlike the PID it is never reused, not even by a restarted container
+INSTANCE_ID = uuid.uuid4().hex
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """SQLite store of batch jobs and their per-item results, shared by every server process using the same path"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, total INTEGER NOT NULL, completed INTEGER NOT NULL,"
+            " failed INTEGER NOT NULL, options TEXT NOT NULL, pid INTEGER NOT NULL, instance TEXT NOT NULL DEFAULT '',"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        # Stores created before the instance column get it with an empty id, which never matches a live process
+        if "instance" not in [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN instance TEXT NOT NULL DEFAULT ''")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_items (job_id TEXT NOT NULL, idx INTEGER NOT NULL, company_description TEXT NOT NULL,"
+            " advertisement_goal TEXT NOT NULL, status TEXT NOT NULL, result TEXT, error TEXT, PRIMARY KEY (job_id, idx))"
+        )
+        self._conn.commit()
+        self.fail_interrupted()
+
+    def create(self, items: List[Any], options: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, total, completed, failed, options, pid, instance, created_at, updated_at)"
+                " VALUES (?, 'queued', ?, 0, 0, ?, ?, ?, ?, ?)",
+                (job_id, len(items), json.dumps(options), os.getpid(), INSTANCE_ID, now, now)
+            )
+            self._conn.executemany(
+                "INSERT INTO job_items (job_id, idx, company_description, advertisement_goal, status) VALUES (?, ?, ?, ?, 'pending')",
+                [(job_id, i, item.company_description, item.advertisement_goal) for i, item in enumerate(items)]
+            )
+            self._conn.commit()
+        return job_id
+
+    def set_status(self, job_id: str, status: str):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+            self._conn.commit()
+
+    def record(self, job_id: str, indices: List[int], result: Optional[dict] = None, error: Optional[str] = None):
+        """Store one outcome for every index in indices (duplicates of one campaign share it)"""
+        status = "failed" if error is not None else "done"
+        payload = json.dumps(result) if result is not None else None
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE job_items SET status = ?, result = ?, error = ? WHERE job_id = ? AND idx = ?",
+                [(status, payload, error, job_id, i) for i in indices]
+            )
+            column = "failed" if error is not None else "completed"
+            self._conn.execute(f"UPDATE jobs SET {column} = {column} + ?, updated_at = ? WHERE id = ?", (len(indices), time.time(), job_id))
+            self._conn.commit()
+
+    def get(self, job_id: str, offset: int = 0, limit: int = 100, status: Optional[str] = None) -> Optional[dict]:
+        """Job summary plus one page of items in index order, optionally only items with the given status"""
+        with self._lock:
+            job = self._conn.execute(
+                "SELECT id, status, total, completed, failed, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if job is None:
+                return None
+            query = "SELECT idx, company_description, advertisement_goal, status, result, error FROM job_items WHERE job_id = ?"
+            args = [job_id]
+            if status is not None:
+                query += " AND status = ?"
+                args.append(status)
+            rows = self._conn.execute(query + " ORDER BY idx LIMIT ? OFFSET ?", (*args, limit, offset)).fetchall()
+        return {
+            **dict(zip(("job_id", "status", "total", "completed", "failed", "created_at", "updated_at"), job)),
+            "offset": offset,
+            "limit": limit,
+            "items": [
+                {
+                    "index": idx,
+                    "company_description": description,
+                    "advertisement_goal": goal,
+                    "status": item_status,
+                    "result": json.loads(result) if result is not None else None,
+                    "error": error
+                }
+                for idx, description, goal, item_status, result, error in rows
+            ]
+        }
+
+    def fail_interrupted(self) -> int:
+        """Mark unfinished jobs whose server process is gone as failed; their pending items can never complete.
+
+        A job belongs to a live process only if it was created by this instance or by another
+        one whose PID is still running. A job of another instance with this process's own PID
+        was left by a previous process that had the same PID, as after a container restart.
+        """
+        with self._lock:
+            stale = [
+                job_id
+                for job_id, pid, instance in self._conn.execute(
+                    "SELECT id, pid, instance FROM jobs WHERE status IN ('queued', 'running')"
+                ).fetchall()
+                if instance != INSTANCE_ID and (pid == os.getpid() or not _pid_alive(pid))
+            ]
+            for job_id in stale:
+                self._conn.execute(
+                    "UPDATE job_items SET status = 'failed', error = 'interrupted by server restart' WHERE job_id = ? AND status = 'pending'", (job_id,)
+                )
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', failed = total - completed, updated_at = ? WHERE id = ?", (time.time(), job_id)
+                )
+            self._conn.commit()
+        if stale:
+            log.warning("jobs_interrupted", jobs=len(stale))
+        return len(stale)
+
+
+class RateLimiter:
+    """Spaces acquisitions at least 1 / rate seconds apart across every caller on the loop; rate <= 0 disables it"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next = 0.0
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        # Claim the slot before awaiting, so concurrent callers queue up behind each other
+        slot = max(now, self._next)
+        self._next = slot + 1 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class JobRunner:
+    """Runs submitted batch jobs as background tasks on the event loop.
+
+    Items of every job share one concurrency limit and one rate limiter, so a large
+    portfolio queues behind the limit instead of flooding the LLM backend. Items with the
+    same normalized company description and goal are evaluated once per job and the
+    result is stored for each of them.
+    """
+
+    def __init__(self, store: JobStore, concurrency: int = BATCH_JOB_CONCURRENCY, rate_per_second: float = BATCH_JOB_RATE_PER_SECOND):
+        self.store = store
+        self.concurrency = max(1, concurrency)
+        self.limiter = RateLimiter(rate_per_second)
+        self._tasks = set()
+        # asyncio primitives bind to the loop they first wait on; keep one per event loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def submit(self, items: List[Any], run_item: ItemRunner, options: Optional[dict] = None) -> str:
+        """Persist a job and start it in the background; returns the job id right away"""
+        # SQLite writes block, and the store lock may be held by another job's write: keep both off the event loop
+        job_id = await asyncio.to_thread(self.store.create, items, options or {})
+        task = asyncio.create_task(self._run(job_id, items, run_item))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    async def _run(self, job_id: str, items: List[Any], run_item: ItemRunner):
+        groups: Dict[tuple, List[int]] = {}
+        for i, item in enumerate(items):
+            groups.setdefault((normalize_text(item.company_description), normalize_text(item.advertisement_goal)), []).append(i)
+
+        started = time.perf_counter()
+        await asyncio.to_thread(self.store.set_status, job_id, "running")
+        log.info("job_started", job_id=job_id, items=len(items), unique=len(groups))
+        try:
+            await asyncio.gather(*(self._run_group(job_id, items, indices, run_item) for indices in groups.values()))
+        except Exception as e:
+            await asyncio.to_thread(self.store.set_status, job_id, "failed")
+            log.error("job_failed", job_id=job_id, error=str(e))
+            return
+        await asyncio.to_thread(self.store.set_status, job_id, "done")
+        log.info("job_finished", job_id=job_id, items=len(items), seconds=round(time.perf_counter() - started, 3))
+
+    async def _run_group(self, job_id: str, items: List[Any], indices: List[int], run_item: ItemRunner):
+        async with self._semaphore():
+            await self.limiter.acquire()
+            try:
+                result = await run_item(indices[0], items[indices[0]])
+            except Exception as e:
+                error = str(getattr(e, "detail", None) or e)
+                log.warning("job_item_failed", job_id=job_id, index=indices[0], error=error)
+                await asyncio.to_thread(self.store.record, job_id, indices, error=error)
+                return
+        await asyncio.to_thread(self.store.record, job_id, indices, result=result)
+
+    async def cancel_all(self):
+        """Cancel running jobs, e.g. on shutdown; the next store opened by another process marks them failed"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"running_jobs": len(self._tasks), "concurrency": self.concurrency, "rate_per_second": self.limiter.rate}
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Shared job runner over the JOBS_DB_PATH store, opened on first use"""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = JobRunner(JobStore(JOBS_DB_PATH))
+    return _runner
+
+
+def get_running_job_runner() -> Optional[JobRunner]:
+    return _runner
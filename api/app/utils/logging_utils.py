@@ -0,0 +1,61 @@
+import json
+import logging
+import random
+from app.config import LOG_LEVEL, LOG_SAMPLE_RATE
+
+# Keyword arguments logging itself understands; everything else becomes a structured field
+_LOGGING_KWARGS = ("exc_info", "stack_info", "stacklevel", "extra")
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, event name and the call's fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            **getattr(record, "fields", {})
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random fraction of records below WARNING so hot request paths cannot flood the log"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """log.info("event_name", key=value, ...) with the keyword arguments emitted as JSON fields"""
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _LOGGING_KWARGS}
+        kwargs["extra"] = {**kwargs.get("extra", {}), "fields": fields}
+        return msg, kwargs
+
+
+def _configure_app_logger():
+    logger = logging.getLogger("app")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JSONFormatter())
+        handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        # Uvicorn configures the root logger; keep our lines from being printed twice
+        logger.propagate = False
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Structured logger under the "app" hierarchy, which writes JSON lines to stderr"""
+    _configure_app_logger()
+    return StructuredLogger(logging.getLogger(name if name.startswith("app") else f"app.{name}"), {})
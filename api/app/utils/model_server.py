@@ -0,0 +1,325 @@
+"""Shared Hugging Face model server for multi-worker deployments.
+
+One process owns the model and listens on a Unix socket; every API worker forwards its
+generations there instead of loading its own copy. Run it next to the API:
+
+    HF_MODEL_SERVER_SOCKET=/tmp/hf.sock python -m app.utils.model_server
+    HF_MODEL_SERVER_SOCKET=/tmp/hf.sock gunicorn -k uvicorn.workers.UvicornWorker -w 4 app.main:app
+
+Messages are length-prefixed JSON. A connection carries one request at a time, so a worker
+keeps one connection per inference thread and the server sees as many concurrent requests
+as the workers have threads. Those requests go through the server's micro-batcher
+together, so generations from different workers share batches.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from app.config import HF_MODEL_SERVER_SOCKET, HF_MODEL_SERVER_MAX_PENDING, HF_WARMUP, LLM_TIMEOUT_SECONDS
+from app.utils.logging_utils import get_logger
+
+log = get_logger(__name__)
+
+_HEADER = struct.Struct(">I")
+
+
+class ModelServerError(RuntimeError):
+    """The model server could not be reached or failed the request"""
+
+
+class ModelServerBusy(ModelServerError):
+    """The model server refused the request because too many generations are in flight"""
+
+
+def _encode(message: dict) -> bytes:
+    body = json.dumps(message).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("model server closed the connection")
+        data += chunk
+    return data
+
+
+def _recv(sock: socket.socket) -> dict:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+async def _aread(reader: asyncio.StreamReader) -> dict:
+    (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return json.loads(await reader.readexactly(size))
+
+
+def _raise_for(reply: dict):
+    if "error" in reply:
+        raise (ModelServerBusy if reply.get("busy") else ModelServerError)(reply["error"])
+
+
+class ModelServerClient:
+    """Worker side: forwards generations to the model server, one persistent connection per thread"""
+
+    def __init__(self, path: str, timeout: float = LLM_TIMEOUT_SECONDS):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self, timeout: float) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise ModelServerError(f"model server at {self.path} unreachable: {e}")
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def _call(self, message: dict, timeout: Optional[float] = None) -> dict:
+        timeout = self.timeout if timeout is None else timeout
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            reused = sock is not None
+            if sock is None:
+                sock = self._local.sock = self._connect(timeout)
+            sock.settimeout(timeout)
+            try:
+                sock.sendall(_encode(message))
+                reply = _recv(sock)
+            except (OSError, ConnectionError) as e:
+                self._close()
+                # A kept connection may have been closed by a server restart; retry once on a fresh one
+                if reused and attempt == 0 and not isinstance(e, socket.timeout):
+                    continue
+                raise ModelServerError(f"model server request failed: {e}")
+            _raise_for(reply)
+            return reply
+        raise ModelServerError("model server request failed")
+
+    def generate(self, prompt: str, kwargs: dict) -> str:
+        return self._call({"op": "generate", "prompt": prompt, "kwargs": kwargs})["result"]
+
+    def stats(self, timeout: float = 1.0) -> dict:
+        return self._call({"op": "stats"}, timeout=timeout)["result"]
+
+    def wait_ready(self, max_wait: float, interval: float = 1.0) -> dict:
+        """Server stats once it answers, polling for up to max_wait seconds"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            try:
+                return self.stats()
+            except ModelServerError:
+                if time.monotonic() + interval > deadline:
+                    raise
+                time.sleep(interval)
+
+    async def astream(self, message: dict, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield the chunks of a streaming request; its own connection, so the event loop never blocks"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.timeout if timeout is None else timeout)
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(self.path), max(deadline - loop.time(), 0))
+        except (OSError, asyncio.TimeoutError) as e:
+            raise ModelServerError(f"model server at {self.path} unreachable: {e}")
+        try:
+            writer.write(_encode(message))
+            await writer.drain()
+            while True:
+                try:
+                    reply = await asyncio.wait_for(_aread(reader), max(deadline - loop.time(), 0))
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                    raise ModelServerError(f"model server stream failed: {e!r}")
+                _raise_for(reply)
+                if reply.get("done"):
+                    return
+                yield reply["chunk"]
+        finally:
+            writer.close()
+
+
+class ModelServer:
+    """Server side: answers generate, stream and stats requests from any number of worker connections.
+
+    generate(prompt, kwargs) and stream(message) do the inference; at most max_pending
+    requests are in flight across all connections, and the rest are refused with a busy
+    error right away so that workers fall back instead of piling up behind the model.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        generate: Callable[[str, dict], Awaitable[str]],
+        stream: Callable[[dict], AsyncIterator[str]],
+        stats: Callable[[], dict],
+        max_pending: int = HF_MODEL_SERVER_MAX_PENDING
+    ):
+        self.path = path
+        self.generate = generate
+        self.stream = stream
+        self.stats_fn = stats
+        self.max_pending = max(1, max_pending)
+        self.in_flight = 0
+        self.connections = 0
+        self.served = 0
+        self.rejected = 0
+        self.failed = 0
+        self._server = None
+        self._writers = set()
+
+    async def start(self):
+        _remove_stale_socket(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        log.info("model_server_listening", socket=self.path, max_pending=self.max_pending)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # Workers keep their connections open; close them so wait_closed does not wait on them
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def stats(self) -> dict:
+        return {
+            "connections": self.connections,
+            "in_flight": self.in_flight,
+            "max_pending": self.max_pending,
+            "served": self.served,
+            "rejected": self.rejected,
+            "failed": self.failed
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    message = await _aread(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                try:
+                    if message.get("op") == "stats":
+                        writer.write(_encode({"result": {**self.stats_fn(), "server": self.stats()}}))
+                    elif self.in_flight >= self.max_pending:
+                        self.rejected += 1
+                        writer.write(_encode({"error": f"model server busy ({self.in_flight} generations in flight)", "busy": True}))
+                    else:
+                        await self._run(message, writer)
+                    await writer.drain()
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    # The worker went away before its reply was written; nothing is left to answer
+                    log.info("model_server_client_gone", op=message.get("op"))
+                    return
+        finally:
+            self.connections -= 1
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _run(self, message: dict, writer: asyncio.StreamWriter):
+        self.in_flight += 1
+        try:
+            if message.get("op") == "generate":
+                reply = {"result": await self.generate(message["prompt"], message.get("kwargs", {}))}
+            elif message.get("op") == "stream":
+                chunks = self.stream(message)
+                try:
+                    async for chunk in chunks:
+                        writer.write(_encode({"chunk": chunk}))
+                        await writer.drain()
+                finally:
+                    # Stop generating as soon as the worker is gone, not when the generator is collected
+                    if hasattr(chunks, "aclose"):
+                        await chunks.aclose()
+                reply = {"done": True}
+            else:
+                reply = {"error": f"unknown op {message.get('op')!r}"}
+            self.served += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # A lost connection is not a failed generation; _handle drops it
+            raise
+        except Exception as e:
+            self.failed += 1
+            log.warning("model_server_request_failed", op=message.get("op"), error=str(e))
+            reply = {"error": str(e) or type(e).__name__}
+        finally:
+            self.in_flight -= 1
+        writer.write(_encode(reply))
+
+
+def _remove_stale_socket(path: str):
+    # A socket file left by a crashed server refuses connections; a live one means another server owns the path
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"a model server is already listening on {path}")
+
+
+async def _serve(path: str, warm_up: bool):
+    from app.models.models import SimulationResult
+    from app.utils import hf_utils
+
+    # This process owns the model: its own generations must run locally, not loop back to the socket
+    hf_utils.use_model_server(None)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, hf_utils.warm_up_hf_model, warm_up)
+
+    def stream(message: dict) -> AsyncIterator[str]:
+        return hf_utils.astream_hf_marketing_insight(
+            SimulationResult.model_validate(message["simulation_data"]), message["company_description"], message["advertisement_goal"]
+        )
+
+    server = ModelServer(
+        path,
+        generate=hf_utils.agenerate,
+        stream=stream,
+        stats=lambda: {"load": hf_utils.get_hf_load_stats(), "batching": hf_utils.get_hf_batching_stats()}
+    )
+    await server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Hugging Face model to API workers over a Unix socket")
+    parser.add_argument("--socket", default=HF_MODEL_SERVER_SOCKET, help="socket path (default HF_MODEL_SERVER_SOCKET)")
+    parser.add_argument("--no-warmup", action="store_true", help="load the model without a warm-up generation")
+    args = parser.parse_args(argv)
+    if not args.socket:
+        parser.error("no socket path: pass --socket or set HF_MODEL_SERVER_SOCKET")
+    try:
+        asyncio.run(_serve(args.socket, warm_up=HF_WARMUP and not args.no_warmup))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+class PrefixKVCache:
+    """LRU of precomputed prompt-prefix states (past key values) under a byte budget.
+
+    Keys are (model, template) pairs, so several models or templates can be resident at
+    once; the least recently used entries are evicted when a new one would exceed
+    max_bytes, and an entry larger than the whole budget is built but never kept.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Builds run a forward pass; one at a time, so concurrent first requests do not all prefill
+        self._build_lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, nbytes: int) -> bool:
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return False
+            while self._entries and self.bytes + nbytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.bytes -= evicted_bytes
+                self.evictions += 1
+            self._entries[key] = (value, nbytes)
+            self.bytes += nbytes
+            return True
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Tuple[Any, int]]) -> Any:
+        """Cached value for key, or build() -> (value, nbytes), cached when it fits"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._build_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry[0]
+            value, nbytes = build()
+            self.put(key, value, nbytes)
+            return value
+
+    def drop(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose key matches, e.g. those of a model being unloaded"""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                self.bytes -= self._entries.pop(key)[1]
+        return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": [list(key) if isinstance(key, tuple) else key for key in self._entries],
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,247 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+from app.config import (
+    LLM_DEADLINE_SECONDS, LLM_MAX_RETRIES, LLM_RETRY_BACKOFF_MS, LLM_HEDGE_ENABLED, LLM_HEDGE_QUANTILE,
+    LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_SECONDS
+)
+from app.utils.logging_utils import get_logger
+from app.utils.metrics import llm_resilience_events
+
+log = get_logger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a backend whose circuit breaker is open"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection errors, rate limits and 5xx responses are worth another attempt; anything else is not"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    # Imported here: openai is already loaded once one of its calls has failed
+    import openai
+    if isinstance(error, openai.APIConnectionError):  # APITimeoutError included
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status in (408, 409, 429) or status >= 500)
+
+
+class CircuitBreaker:
+    """Stops calling a degraded backend for a while.
+
+    After failure_threshold consecutive failed calls the circuit opens and calls are
+    refused for reset_seconds. Then a single probe call is let through (half open): its
+    success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = LLM_CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = LLM_CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probing:
+                    return False
+                self._probing = True
+                return True
+            return self.state == "closed"
+
+    def record_success(self):
+        """The backend answered, even if with a non-retryable error"""
+        with self._lock:
+            if self.state != "closed":
+                log.info("circuit_closed", backend=self.name)
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                log.warning("circuit_opened", backend=self.name, failures=self.failures)
+
+    def release(self):
+        """The call was abandoned (cancelled) without an answer: free the half-open probe slot for the next caller"""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "times_opened": self.times_opened}
+
+
+class LatencyWindow:
+    """Recent successful call latencies, for the hedging delay"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self._samples = deque(maxlen=size)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientCall:
+    """One kind of LLM call (say, OpenAI parameter extraction) run under a deadline, retries, hedging and a breaker.
+
+    make_call receives the seconds left in the deadline, to pass on as the client's
+    own timeout. Every attempt, hedges and backoff sleeps included, fits in deadline
+    seconds, so a slow upstream bounds latency instead of hanging the request. A hedge
+    starts a duplicate call when the first has run longer than the quantile of recent
+    latencies, and whichever answers first wins. Callers catch the final exception
+    (CircuitOpenError when the breaker refuses the call) and fall back.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        breaker: CircuitBreaker,
+        deadline: float = LLM_DEADLINE_SECONDS,
+        retries: int = LLM_MAX_RETRIES,
+        backoff_ms: float = LLM_RETRY_BACKOFF_MS,
+        hedge: bool = LLM_HEDGE_ENABLED,
+        hedge_quantile: float = LLM_HEDGE_QUANTILE
+    ):
+        self.name = name
+        self.breaker = breaker
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff_ms / 1000
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.latencies = LatencyWindow()
+
+    def _event(self, event: str):
+        llm_resilience_events.inc(backend=self.breaker.name, call=self.name, event=event)
+
+    def _check_circuit(self):
+        if not self.breaker.allow():
+            self._event("circuit_open")
+            raise CircuitOpenError(f"{self.breaker.name} circuit is open")
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # Full jitter: spreads out the retries of requests that failed together
+        return random.uniform(0, self.backoff * 2 ** (attempt - 1))
+
+    def _give_up(self, error: BaseException, attempt: int, delay: float, remaining: float) -> bool:
+        if not is_retryable(error):
+            self.breaker.record_success()
+            self._event("rejected")
+            return True
+        if attempt > self.retries or delay >= remaining:
+            self.breaker.record_failure()
+            self._event("timeout" if isinstance(error, TimeoutError) else "failure")
+            return True
+        self._event("retry")
+        log.warning("llm_call_retry", call=self.name, attempt=attempt, error=str(error) or type(error).__name__)
+        return False
+
+    async def run(self, make_call: Callable[[float], Awaitable[Any]]) -> Any:
+        self._check_circuit()
+        try:
+            return await self._run(make_call)
+        except BaseException as e:
+            if not isinstance(e, Exception):
+                self.breaker.release()
+            raise
+
+    async def _run(self, make_call: Callable[[float], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        attempt = 0
+        while True:
+            started = loop.time()
+            try:
+                result = await asyncio.wait_for(self._hedged(make_call, deadline - started), deadline - started)
+            except Exception as e:
+                attempt += 1
+                delay = self._backoff_delay(attempt)
+                if self._give_up(e, attempt, delay, deadline - loop.time()):
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.latencies.add(loop.time() - started)
+            self.breaker.record_success()
+            return result
+
+    async def _hedged(self, make_call: Callable[[float], Awaitable[Any]], remaining: float) -> Any:
+        delay = self.latencies.quantile(self.hedge_quantile) if self.hedge else None
+        if delay is None or delay >= remaining:
+            # No hedge to race against: skip the extra task and its trip through the event loop queue
+            return await make_call(remaining)
+        first = asyncio.ensure_future(make_call(remaining))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return first.result()
+            self._event("hedge")
+            second = asyncio.ensure_future(make_call(remaining - delay))
+            tasks.add(second)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._event("hedge_won")
+                        return task.result()
+            return first.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def run_sync(self, make_call: Callable[[float], Any]) -> Any:
+        """Blocking variant for the synchronous client: deadline, retries and breaker, without hedging"""
+        self._check_circuit()
+        try:
+            return self._run_sync(make_call)
+        except BaseException as e:
+            if not isinstance(e, Exception):
+                self.breaker.release()
+            raise
+
+    def _run_sync(self, make_call: Callable[[float], Any]) -> Any:
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                result = make_call(deadline - started)
+            except Exception as e:
+                attempt += 1
+                delay = self._backoff_delay(attempt)
+                if self._give_up(e, attempt, delay, deadline - time.monotonic()):
+                    raise
+                time.sleep(delay)
+                continue
+            self.latencies.add(time.monotonic() - started)
+            self.breaker.record_success()
+            return result
@@ -0,0 +1,164 @@
+import functools
+import json
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+from pydantic import ValidationError
+from app.models.models import CampaignParams
+from app.utils.metrics import llm_parse_failures
+
+PARAMS_FIELDS = tuple(CampaignParams.model_fields)
+
+# Digits allowed after the decimal point of a constrained value
+MAX_FRACTION_DIGITS = 4
+
+
+class ParamsParseError(ValueError):
+    def __init__(self, reason: str, detail: str):
+        super().__init__(f"{reason}: {detail}")
+        self.reason = reason
+
+
+@functools.lru_cache(maxsize=None)
+def params_json_schema() -> dict:
+    """CampaignParams as a strict JSON schema: every field required and nothing else allowed.
+
+    Built once and shared: generating it costs about half a millisecond, which every
+    parameter request would pay otherwise. Callers must not modify it.
+    """
+    schema = CampaignParams.model_json_schema()
+    schema.pop("description", None)
+    schema.pop("title", None)
+    schema["additionalProperties"] = False
+    schema["required"] = list(PARAMS_FIELDS)
+    return schema
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """The first balanced {...} in text, ignoring braces inside strings; None when there is none"""
+    start = text.find("{")
+    if start < 0:
+        return None
+    depth, in_string, escaped = 0, False, False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+def parse_params(text: str, backend: str) -> Tuple[float, float, float, float]:
+    """Validate an LLM's parameter output against CampaignParams.
+
+    Raises ParamsParseError, after counting it in llm_parse_failures_total, when the text
+    holds no JSON object, the object is malformed, or a field is missing or out of range.
+    """
+    raw = extract_json_object(text or "")
+    try:
+        if raw is None:
+            raise ParamsParseError("no_json", "no JSON object in the output")
+        try:
+            params = CampaignParams.model_validate(json.loads(raw))
+        except json.JSONDecodeError as e:
+            raise ParamsParseError("invalid_json", str(e))
+        except ValidationError as e:
+            raise ParamsParseError("invalid_params", "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()))
+    except ParamsParseError as e:
+        llm_parse_failures.inc(backend=backend, reason=e.reason)
+        raise
+    return params.ctr, params.engagement, params.conversion, params.roi_threshold
+
+
+class ParamsGrammar:
+    """Token-level grammar for exactly {"ctr": N, "engagement": N, "conversion": N, "roi_threshold": N}.
+
+    Built from the decoded string of every vocabulary token. allowed(text) takes the text
+    generated so far and returns a key for the grammar state plus the token ids that keep
+    the output a prefix of the grammar: the next piece of a key literal, or digits and at
+    most one point inside a value (N is a probability: 0 or 1, optionally followed by up to
+    MAX_FRACTION_DIGITS decimals, which must be zeros after a 1). Once the closing brace is out only end-of-sequence is
+    allowed, and done(text) reports it so generation can stop there.
+    """
+
+    def __init__(self, token_strings: Sequence[str], eos_token_ids: Sequence[int] = ()):
+        self.token_strings = list(token_strings)
+        self.eos_token_ids = tuple(eos_token_ids)
+        keys = [f'"{field}": ' for field in PARAMS_FIELDS]
+        self.literals = ["{" + keys[0]] + [", " + key for key in keys[1:]] + ["}"]
+        self._number = re.compile(r"[01](\.\d*)?")
+        # Only tokens made of grammar characters can ever be allowed; vocabularies run to 200k entries
+        alphabet = set("".join(self.literals)) | set("0123456789.")
+        self._candidates = [(i, s) for i, s in enumerate(self.token_strings) if s and set(s) <= alphabet]
+        self._cache: Dict[tuple, Tuple[int, ...]] = {}
+
+    def _state(self, text: str) -> Optional[tuple]:
+        # Walk literal, number, literal, ... consuming text; stop where the text ends
+        pos = 0
+        for i, literal in enumerate(self.literals):
+            matched = 0
+            while matched < len(literal) and pos + matched < len(text) and text[pos + matched] == literal[matched]:
+                matched += 1
+            if pos + matched == len(text) and matched < len(literal):
+                return ("literal", literal[matched:])
+            if matched < len(literal):
+                return None
+            pos += matched
+            if i == len(self.literals) - 1:
+                return ("done",) if pos == len(text) else None
+            number = self._number.match(text, pos)
+            value = number.group() if number else ""
+            if pos + len(value) == len(text):
+                return ("number", value, self.literals[i + 1])
+            if not value or value.endswith(".") or len(value.partition(".")[2]) > MAX_FRACTION_DIGITS:
+                return None
+            pos += len(value)
+        return None
+
+    def allowed(self, text: str) -> Tuple[Optional[tuple], Tuple[int, ...]]:
+        state = self._state(text)
+        if state is None:
+            return None, ()
+        if state not in self._cache:
+            self._cache[state] = tuple(self._compute(state))
+        return state, self._cache[state]
+
+    def done(self, text: str) -> bool:
+        return self._state(text) == ("done",)
+
+    def _compute(self, state: tuple) -> List[int]:
+        if state[0] == "done":
+            return list(self.eos_token_ids)
+        if state[0] == "literal":
+            return self._prefixes(state[1])
+        value, next_literal = state[1], state[2]
+        whole, point, fraction = value.partition(".")
+        # Above 1 is out of range, so a leading 1 only takes zero decimals
+        decimal = "0" if whole == "1" else r"\d"
+        if not whole:
+            # The leading digit, optionally with the point and decimals in the same token
+            pattern = re.compile(rf"0(\.\d{{0,{MAX_FRACTION_DIGITS}}})?|1(\.0{{0,{MAX_FRACTION_DIGITS}}})?")
+        elif not point:
+            pattern = re.compile(rf"\.{decimal}{{0,{MAX_FRACTION_DIGITS}}}")
+        else:
+            room = MAX_FRACTION_DIGITS - len(fraction)
+            pattern = re.compile(rf"{decimal}{{1,{room}}}") if room > 0 else None
+        allowed = [i for i, s in self._candidates if pattern is not None and pattern.fullmatch(s)]
+        if whole and not (point and not fraction):
+            # A complete value may be followed by the next literal
+            allowed += self._prefixes(next_literal)
+        return allowed
+
+    def _prefixes(self, remainder: str) -> List[int]:
+        return [i for i, s in self._candidates if remainder.startswith(s)]
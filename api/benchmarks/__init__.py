@@ -0,0 +1 @@
+# Benchmark harness for the Marketing Strategist Backend
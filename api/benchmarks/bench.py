@@ -0,0 +1,288 @@
+"""Marketing Strategist Backend benchmarks.
+
+Covers the simulator across impression counts, multi-day cohort forecasts, the full FastAPI app in-process under
+concurrent load with the offline stub backend, and LLM cache hit/miss behaviour.
+Each scenario reports p50/p95/p99 latency, requests per second and peak RSS (process-wide,
+so it only grows across scenarios; simulator scenarios also record their own allocation
+peak), and the run is compared against a stored baseline so regressions fail with a
+non-zero exit code. The suite runs several rounds and keeps the median of every metric:
+the tail percentiles of a single concurrent load run are mostly scheduler noise.
+
+Run from the api directory:
+    python -m benchmarks.bench                      # full run, compared to benchmarks/baseline.json
+    python -m benchmarks.bench --quick              # smaller counts for CI
+    python -m benchmarks.bench --update-baseline    # record the current numbers as the baseline
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+
+from app import main
+from app.simulator.horizon import run_horizon_simulation
+from app.simulator.simulator import run_market_fit_simulation
+from app.utils import backends, gpt_utils
+from app.utils.backends import StubBackend
+from app.utils.cache import LLMCache, MemoryLRUCache
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+PARAMS = {"ctr": 0.03, "engagement": 0.5, "conversion": 0.1, "roi_threshold": 0.5}
+# Fixed simulator seed so every run draws exactly the same samples
+SEED = 0
+
+# Metrics where higher is worse, with the absolute change that must also be exceeded so that
+# jitter on sub-millisecond timings does not count as a regression
+HIGHER_IS_WORSE = {"p50_ms": 1.0, "p95_ms": 1.0, "p99_ms": 1.0, "peak_alloc_mb": 1.0}
+LOWER_IS_WORSE = ("rps",)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _summarize(latencies: list, elapsed: float) -> dict:
+    ms = np.array(latencies) * 1000
+    return {
+        "count": len(latencies),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def bench_simulator(impression_counts, engines, repeats: int) -> dict:
+    results = {}
+    for engine in engines:
+        for impressions in impression_counts:
+            # Per-impression arrays grow with impressions; keep that engine within a sane memory budget
+            if engine == "per_impression" and impressions > 10**6:
+                continue
+            rng = np.random.default_rng(SEED)
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(repeats):
+                call_start = time.perf_counter()
+                run_market_fit_simulation(impressions=impressions, engine=engine, rng=rng, **PARAMS)
+                latencies.append(time.perf_counter() - call_start)
+            elapsed = time.perf_counter() - start
+            summary = _summarize(latencies, elapsed)
+
+            # Allocation peak from one extra, separately traced call; tracing skews timings
+            tracemalloc.start()
+            run_market_fit_simulation(impressions=impressions, engine=engine, rng=rng, **PARAMS)
+            _, peak_alloc = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            summary["peak_alloc_mb"] = round(peak_alloc / 2**20, 2)
+            results[f"simulator/{engine}/1e{int(np.log10(impressions))}"] = summary
+    return results
+
+
+def bench_horizon(days: int, daily_impressions, repeats: int) -> dict:
+    """Cohort forecasts over days at each daily budget; the cost should not grow with the budget"""
+    results = {}
+    for impressions in daily_impressions:
+        latencies = []
+        start = time.perf_counter()
+        for i in range(repeats):
+            call_start = time.perf_counter()
+            run_horizon_simulation(days, impressions, rng=SEED + i, **PARAMS)
+            latencies.append(time.perf_counter() - call_start)
+        results[f"horizon/{days}d/1e{int(np.log10(impressions))}"] = _summarize(latencies, time.perf_counter() - start)
+    return results
+
+
+async def _load(payloads, concurrency: int) -> tuple[list, float]:
+    transport = httpx.ASGITransport(app=main.app)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def one(payload):
+            async with semaphore:
+                call_start = time.perf_counter()
+                response = await client.post("/simulate", json=payload)
+                latencies.append(time.perf_counter() - call_start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        # The request path logs every stage at INFO; keep it out of the report
+        app_logger = logging.getLogger("app")
+        level = app_logger.level
+        app_logger.setLevel(logging.WARNING)
+        try:
+            await asyncio.gather(*(one(payload) for payload in payloads))
+        finally:
+            app_logger.setLevel(level)
+        return latencies, time.perf_counter() - start
+
+
+def bench_api(requests: int, concurrency: int, latency_ms: float, token_latency_ms: float) -> dict:
+    """Full /simulate pipeline in-process on the stub backend, so only our own overhead is measured"""
+    original = backends.get_backend("stub")
+    backends.register_backend(StubBackend(latency_ms=latency_ms, token_latency_ms=token_latency_ms))
+    results = {}
+    try:
+        for pipelined in (False, True):
+            payloads = [
+                {"company_description": f"Company {i}", "advertisement_goal": "Signups", "backend": "stub", "pipelined": pipelined}
+                for i in range(requests)
+            ]
+            latencies, elapsed = asyncio.run(_load(payloads, concurrency))
+            results[f"api/stub/{'pipelined' if pipelined else 'json'}/c{concurrency}"] = _summarize(latencies, elapsed)
+    finally:
+        backends.register_backend(original)
+    return results
+
+
+class _FakeCompletions:
+    """Stands in for the OpenAI chat completions API with a fixed network latency"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        content = json.dumps(PARAMS) if "strict JSON" in kwargs["messages"][0]["content"] else "Improve the landing page."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def bench_cache(requests: int, concurrency: int, latency_ms: float) -> dict:
+    """OpenAI backend against a fake upstream: every request distinct (misses) vs one repeated request (hits)"""
+    completions = _FakeCompletions(latency_ms / 1000)
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    original_client, original_cache = gpt_utils.get_async_client, gpt_utils.params_cache
+    gpt_utils.get_async_client = lambda: fake_client
+    results = {}
+    try:
+        for scenario in ("miss", "hit"):
+            gpt_utils.params_cache = LLMCache(MemoryLRUCache(max_entries=requests * 2, ttl_seconds=3600))
+            # Distinct seeds keep concurrent repeats from coalescing, so every request reaches the cache
+            payloads = [
+                {"company_description": f"Company {i if scenario == 'miss' else 0}", "advertisement_goal": "Signups", "backend": "openai", "seed": i}
+                for i in range(requests)
+            ]
+            if scenario == "hit":
+                # Warm the single entry so the measured requests are all hits
+                asyncio.run(_load(payloads[:1], 1))
+            latencies, elapsed = asyncio.run(_load(payloads, concurrency))
+            summary = _summarize(latencies, elapsed)
+            summary["hit_rate"] = gpt_utils.params_cache.stats()["hit_rate"]
+            results[f"cache/{scenario}/c{concurrency}"] = summary
+    finally:
+        gpt_utils.get_async_client, gpt_utils.params_cache = original_client, original_cache
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return a message for every metric that is worse than baseline by more than tolerance"""
+    regressions = []
+    for scenario, metrics in results.items():
+        reference = baseline.get(scenario)
+        if not reference:
+            continue
+        for metric, floor in HIGHER_IS_WORSE.items():
+            if metric in metrics and reference.get(metric):
+                if metrics[metric] > reference[metric] * (1 + tolerance) and metrics[metric] - reference[metric] > floor:
+                    regressions.append(f"{scenario}: {metric} {metrics[metric]} > baseline {reference[metric]} (+{tolerance:.0%})")
+        for metric in LOWER_IS_WORSE:
+            # Throughput of sub-millisecond calls is as noisy as their latency
+            if metric in metrics and reference.get(metric) and reference.get("p50_ms", 0) >= 1.0:
+                if metrics[metric] < reference[metric] * (1 - tolerance):
+                    regressions.append(f"{scenario}: {metric} {metrics[metric]} < baseline {reference[metric]} (-{tolerance:.0%})")
+    return regressions
+
+
+def median_of_rounds(rounds: list) -> dict:
+    """Per-scenario median of every metric across rounds; peak RSS keeps its maximum"""
+    merged = {}
+    for scenario in rounds[0]:
+        runs = [results[scenario] for results in rounds]
+        merged[scenario] = {
+            metric: max(run[metric] for run in runs) if metric == "peak_rss_mb" else round(statistics.median(run[metric] for run in runs), 3)
+            for metric in runs[0]
+        }
+    return merged
+
+
+def run(quick: bool) -> dict:
+    results = {}
+    if quick:
+        results.update(bench_simulator([10**3, 10**4, 10**5, 10**6], ["per_impression", "aggregate", "analytic"], repeats=20))
+        results.update(bench_horizon(90, [10**4, 10**6], repeats=20))
+        results.update(bench_api(requests=200, concurrency=50, latency_ms=20, token_latency_ms=0.5))
+        results.update(bench_cache(requests=200, concurrency=50, latency_ms=20))
+    else:
+        results.update(bench_simulator([10**3, 10**4, 10**5, 10**6, 10**7, 10**8], ["per_impression", "aggregate", "analytic"], repeats=50))
+        results.update(bench_horizon(90, [10**4, 10**6, 10**8], repeats=50))
+        results.update(bench_api(requests=1000, concurrency=100, latency_ms=50, token_latency_ms=1))
+        results.update(bench_cache(requests=1000, concurrency=100, latency_ms=50))
+    return results
+
+
+def _print_table(results: dict):
+    print(f"{'scenario':<40}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>10}{'rss MB':>9}")
+    for scenario, metrics in results.items():
+        print(f"{scenario:<40}{metrics['p50_ms']:>10}{metrics['p95_ms']:>10}{metrics['p99_ms']:>10}{metrics['rps']:>10}{metrics['peak_rss_mb']:>9}")
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller impression counts and request volumes")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run's results as the baseline")
+    parser.add_argument("--rounds", type=int, default=3, help="runs of the whole suite, combined by median (default 3)")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown before failing (default 0.5)")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    args = parser.parse_args(argv)
+
+    mode = "quick" if args.quick else "full"
+    results = median_of_rounds([run(args.quick) for _ in range(max(1, args.rounds))])
+    _print_table(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+
+    if args.update_baseline:
+        stored[mode] = results
+        with open(args.baseline, "w") as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline '{mode}' written to {args.baseline}")
+        return 0
+
+    if mode not in stored:
+        print(f"No '{mode}' baseline in {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    regressions = compare(results, stored[mode], args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    print("Benchmarks regressed" if regressions else "Benchmarks within baseline tolerance")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,120 @@
+"""Accuracy check for the quantized CPU inference mode.
+
+Extracts ctr, engagement and conversion for a fixed prompt set with the Hugging Face model
+in full precision and then in the quantized mode, and fails when the quantized values drift
+from the full-precision ones by more than the tolerance (mean absolute error per field) or
+when more extractions fail. Both runs use the same sampling seeds, and each prompt is
+sampled several times and averaged so that sampling noise does not dominate the comparison.
+It also reports model size and time per extraction for both modes.
+
+Run from the api directory (needs transformers and torch):
+    python -m benchmarks.quantization_check                          # MODEL_NAME, int8 vs float32
+    python -m benchmarks.quantization_check --model gpt2 --samples 5
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+FIELDS = ("ctr", "engagement", "conversion")
+
+PROMPTS = [
+    ("An online store selling handmade ceramic mugs", "Increase sales during the holiday season"),
+    ("A B2B SaaS platform for payroll management aimed at small businesses", "Generate qualified demo requests"),
+    ("A mobile fitness app with personalized workout plans", "Grow monthly active users"),
+    ("A local bakery offering same-day cake delivery", "Drive online orders in the city"),
+    ("A fintech startup offering high-yield savings accounts", "Acquire new account sign-ups"),
+    ("A luxury watch brand launching a limited edition collection", "Build awareness among high-income buyers"),
+    ("An online course provider teaching data science", "Increase course enrollments"),
+    ("A sustainable fashion label selling recycled-fabric clothing", "Boost engagement on social media"),
+]
+
+
+def _model_megabytes(model) -> float:
+    # Dynamically quantized layers keep their int8 weights in packed (weight, bias) tuples of the state dict
+    total = 0
+    for value in model.state_dict().values():
+        tensors = value if isinstance(value, tuple) else (value,)
+        total += sum(t.numel() * t.element_size() for t in tensors if hasattr(t, "element_size"))
+    return round(total / (1024 * 1024), 1)
+
+
+def extract_all(prompts, samples: int, seed: int) -> dict:
+    """Mean extracted fields per prompt (None where every sample failed) with the currently loaded model"""
+    import torch
+    from app.utils import hf_utils
+
+    params, failures, started = [], 0, time.perf_counter()
+    for i, (company, goal) in enumerate(prompts):
+        values = []
+        for s in range(samples):
+            torch.manual_seed(seed + i * samples + s)
+            try:
+                values.append(hf_utils.extract_hf_params(company, goal)[:len(FIELDS)])
+            except Exception:
+                failures += 1
+        params.append(np.mean(values, axis=0).tolist() if values else None)
+    return {
+        "params": params,
+        "failures": failures,
+        "seconds_per_extraction": round((time.perf_counter() - started) / (len(prompts) * samples), 3)
+    }
+
+
+def compare_params(reference: list, candidate: list, tolerance: float) -> dict:
+    """Per-field mean and max absolute error of candidate against reference, over prompts both extracted"""
+    pairs = [(r, c) for r, c in zip(reference, candidate) if r is not None and c is not None]
+    errors = np.abs(np.array([c for _, c in pairs]) - np.array([r for r, _ in pairs])) if pairs else np.zeros((0, len(FIELDS)))
+    fields = {
+        field: {
+            "mean_abs_error": round(float(errors[:, k].mean()), 5) if pairs else None,
+            "max_abs_error": round(float(errors[:, k].max()), 5) if pairs else None
+        }
+        for k, field in enumerate(FIELDS)
+    }
+    # A prompt the quantized model cannot extract while full precision can is a regression too
+    lost = sum(1 for r, c in zip(reference, candidate) if r is not None and c is None)
+    passed = bool(pairs) and lost == 0 and all(stats["mean_abs_error"] <= tolerance for stats in fields.values())
+    return {"compared": len(pairs), "lost": lost, "fields": fields, "tolerance": tolerance, "passed": passed}
+
+
+def main_cli(argv=None) -> int:
+    from app.config import MODEL_NAME
+    from app.utils import hf_utils
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=MODEL_NAME, help="model to check (default MODEL_NAME)")
+    parser.add_argument("--mode", default="int8", choices=[m for m in hf_utils.CPU_QUANTIZATION_MODES if m != "none"], help="quantized mode to check")
+    parser.add_argument("--samples", type=int, default=3, help="extractions averaged per prompt (default 3)")
+    parser.add_argument("--seed", type=int, default=0, help="base sampling seed, shared by both modes")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="allowed mean absolute error per field (default 0.02)")
+    parser.add_argument("--output", help="also write the report to a JSON file")
+    args = parser.parse_args(argv)
+
+    runs = {}
+    for mode in ("none", args.mode):
+        generator = hf_utils.switch_hf_model(args.model, quantization=mode)
+        runs[mode] = {**extract_all(PROMPTS, args.samples, args.seed), "model_mb": _model_megabytes(generator.model)}
+        print(f"{mode:>5}: {runs[mode]['model_mb']} MB, {runs[mode]['seconds_per_extraction']} s per extraction, {runs[mode]['failures']} failed")
+
+    report = {
+        "model": args.model,
+        "mode": args.mode,
+        **compare_params(runs["none"]["params"], runs[args.mode]["params"], args.tolerance),
+        "runs": runs
+    }
+    for field, stats in report["fields"].items():
+        print(f"{field:>10}: mean abs error {stats['mean_abs_error']}, max {stats['max_abs_error']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"{args.mode} within tolerance" if report["passed"] else f"{args.mode} exceeds tolerance {args.tolerance}")
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,83 @@
+"""LLM backend registry and offline stub backend tests"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.utils import backends
+from app.utils.backends import StubBackend, get_backend, register_backend, resolve_backend
+
+PAYLOAD = {"company_description": "A SaaS startup for remote teams", "advertisement_goal": "Free trial signups"}
+
+
+def test_registry_resolution_order():
+    assert resolve_backend("stub").name == "stub"
+    assert resolve_backend(None, use_hugging_face=False).name == "openai"
+    # Explicit names win over the legacy flag
+    assert resolve_backend("stub", use_hugging_face=True).name == "stub"
+    with pytest.raises(ValueError):
+        get_backend("does-not-exist")
+
+
+def test_unavailable_backend_falls_back_to_openai(monkeypatch):
+    monkeypatch.setattr(backends.HuggingFaceBackend, "is_available", lambda self: False)
+    assert resolve_backend(None, use_hugging_face=True).name == "openai"
+
+
+def test_stub_params_are_deterministic_and_in_range():
+    stub = StubBackend(latency_ms=0)
+    first = asyncio.run(stub.extract_params(PAYLOAD["company_description"], PAYLOAD["advertisement_goal"]))
+    again = asyncio.run(stub.extract_params("a saas startup  for remote teams", "free trial signups"))
+    other = asyncio.run(stub.extract_params("A bakery", "Foot traffic"))
+    assert first == again
+    assert first != other
+    ctr, engagement, conversion, roi_threshold = first
+    assert 0.005 <= ctr <= 0.05 and 0.2 <= engagement <= 0.8 and 0.02 <= conversion <= 0.2 and 0.1 <= roi_threshold <= 0.6
+
+
+def test_stub_latency_is_applied():
+    stub = StubBackend(latency_ms=100)
+    elapsed = asyncio.run(_timed(stub.extract_params("a", "b")))
+    assert elapsed >= 0.1
+
+
+async def _timed(coro):
+    start = asyncio.get_running_loop().time()
+    await coro
+    return asyncio.get_running_loop().time() - start
+
+
+def test_simulate_runs_offline_on_stub_backend():
+    client = TestClient(main.app)
+    response = client.post("/simulate", json={**PAYLOAD, "backend": "stub", "simulation_engine": "analytic"})
+    assert response.status_code == 200
+    body = response.json()
+    assert "offline stub backend" in body["recommendations"][0]
+    assert body == client.post("/simulate", json={**PAYLOAD, "backend": "stub", "simulation_engine": "analytic"}).json()
+
+
+def test_custom_backend_can_be_registered(monkeypatch):
+    class FixedBackend(StubBackend):
+        name = "fixed"
+        label = "fixed test backend"
+
+        async def extract_params(self, company_description, advertisement_goal):
+            return 0.1, 0.9, 0.5, 0.01
+
+    monkeypatch.setitem(backends._BACKENDS, "fixed", None)
+    register_backend(FixedBackend(latency_ms=0))
+    response = TestClient(main.app).post("/simulate", json={**PAYLOAD, "backend": "fixed", "simulation_engine": "analytic"})
+    assert response.json()["roi_fit_tag"] == "High market fit"
+
+
+def test_unknown_backend_is_a_client_error():
+    response = TestClient(main.app).post("/simulate", json={**PAYLOAD, "backend": "nope"})
+    assert response.status_code == 400
+
+
+def test_backends_endpoint_lists_registry():
+    body = TestClient(main.app).get("/backends").json()
+    assert {"openai", "huggingface", "stub"} <= set(body["backends"])
+    assert body["backends"]["stub"] is True
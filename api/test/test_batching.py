@@ -0,0 +1,59 @@
+"""Micro-batching scheduler tests"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils.batching import MicroBatcher
+
+
+def test_concurrent_submissions_share_batches():
+    seen = []
+
+    def run_batch(items):
+        seen.append(len(items))
+        time.sleep(0.02)
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(run_batch, max_batch_size=8, max_wait_ms=50)
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda i: batcher.submit(i).result(), range(32)))
+
+    assert results == [i * 2 for i in range(32)]
+    assert max(seen) == 8
+    assert len(seen) < 32
+    stats = batcher.stats()
+    assert stats["items_processed"] == 32
+    assert stats["max_batch_size_seen"] == 8
+    assert stats["queue_depth"] == 0
+
+
+def test_lone_item_is_flushed_after_max_wait():
+    batcher = MicroBatcher(lambda items: items, max_batch_size=8, max_wait_ms=20)
+    start = time.perf_counter()
+    assert batcher.submit("only").result(timeout=1) == "only"
+    assert time.perf_counter() - start < 0.5
+
+
+def test_batch_failure_propagates_to_every_caller():
+    def run_batch(items):
+        raise ValueError("model crashed")
+
+    batcher = MicroBatcher(run_batch, max_batch_size=4, max_wait_ms=20)
+    futures = [batcher.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=1)
+    assert batcher.stats()["failed_batches"] >= 1
+
+    # The worker keeps serving after a failed batch
+    batcher.run_batch = lambda items: items
+    assert batcher.submit("next").result(timeout=1) == "next"
+
+
+def test_result_count_mismatch_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch_size=4, max_wait_ms=200)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        assert isinstance(future.exception(timeout=1), RuntimeError)
@@ -0,0 +1,37 @@
+"""Benchmark harness tests"""
+
+from benchmarks import bench
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"api/x": {"p95_ms": 100.0, "p50_ms": 50.0, "rps": 500.0}, "sim/y": {"p95_ms": 0.2, "p50_ms": 0.1, "rps": 9000.0}}
+    ok = {"api/x": {"p95_ms": 120.0, "p50_ms": 55.0, "rps": 450.0}, "sim/y": {"p95_ms": 0.6, "p50_ms": 0.3, "rps": 3000.0}}
+    assert bench.compare(ok, baseline, tolerance=0.5) == []
+
+    slow = {"api/x": {"p95_ms": 180.0, "p50_ms": 55.0, "rps": 200.0}}
+    messages = bench.compare(slow, baseline, tolerance=0.5)
+    assert len(messages) == 2
+    assert any("p95_ms" in message for message in messages)
+    assert any("rps" in message for message in messages)
+
+
+def test_rounds_are_combined_by_median():
+    rounds = [
+        {"api/x": {"count": 10, "p95_ms": 40.0, "rps": 500.0, "peak_rss_mb": 90.0}},
+        {"api/x": {"count": 10, "p95_ms": 95.0, "rps": 200.0, "peak_rss_mb": 95.0}},
+        {"api/x": {"count": 10, "p95_ms": 45.0, "rps": 480.0, "peak_rss_mb": 92.0}},
+    ]
+    assert bench.median_of_rounds(rounds) == {"api/x": {"count": 10, "p95_ms": 45.0, "rps": 480.0, "peak_rss_mb": 95.0}}
+
+
+def test_scenarios_report_latency_percentiles():
+    results = bench.bench_simulator([10**3, 10**5], ["aggregate", "per_impression"], repeats=3)
+    results.update(bench.bench_api(requests=10, concurrency=5, latency_ms=0, token_latency_ms=0))
+    results.update(bench.bench_cache(requests=10, concurrency=5, latency_ms=0))
+
+    assert "simulator/aggregate/1e5" in results
+    assert results["cache/hit/c5"]["hit_rate"] > 0.9
+    assert results["cache/miss/c5"]["hit_rate"] == 0.0
+    for metrics in results.values():
+        assert metrics["p50_ms"] <= metrics["p95_ms"] <= metrics["p99_ms"]
+        assert metrics["rps"] > 0 and metrics["peak_rss_mb"] > 0
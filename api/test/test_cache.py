@@ -0,0 +1,165 @@
+"""LLM parameter-extraction cache tests"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.utils import cache as cache_module
+from app.utils import gpt_utils
+from app.utils.cache import LLMCache, MemoryLRUCache, SQLiteCache, make_cache_key
+
+
+def test_cache_key_normalizes_whitespace_and_case():
+    a = make_cache_key("simulation_params", "openai", "gpt", "  A SaaS   startup\n", "More signups")
+    b = make_cache_key("simulation_params", "openai", "gpt", "a saas startup", "more  SIGNUPS")
+    assert a == b
+    assert a != make_cache_key("simulation_params", "huggingface", "gpt", "a saas startup", "more signups")
+    assert a != make_cache_key("simulation_params", "openai", "other-model", "a saas startup", "more signups")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    memory = MemoryLRUCache(max_entries=2, ttl_seconds=60)
+    memory.set("a", 1)
+    memory.set("b", 2)
+    memory.get("a")
+    memory.set("c", 3)
+    assert memory.get("b") is None
+    assert memory.get("a") == 1
+    assert memory.evictions == 1
+
+
+def test_memory_tier_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    memory = MemoryLRUCache(max_entries=10, ttl_seconds=5)
+    memory.set("a", 1)
+    now[0] += 6
+    assert memory.get("a") is None
+    assert memory.expirations == 1
+
+
+def test_disk_tier_survives_restart_and_promotes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    first = LLMCache(MemoryLRUCache(10, 60), SQLiteCache(path, 10, 60))
+    first.set("key", [0.1, 0.2, 0.3, 0.4])
+
+    second = LLMCache(MemoryLRUCache(10, 60), SQLiteCache(path, 10, 60))
+    assert second.get("key") == [0.1, 0.2, 0.3, 0.4]
+    assert second.get("key") == [0.1, 0.2, 0.3, 0.4]
+    assert second.get("missing") is None
+    stats = second.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_promoted_disk_hits_keep_their_expiry(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    path = str(tmp_path / "cache.db")
+    LLMCache(MemoryLRUCache(10, 60), SQLiteCache(path, 10, 60)).set("key", "value")
+
+    now[0] += 50
+    second = LLMCache(MemoryLRUCache(10, 60), SQLiteCache(path, 10, 60))
+    assert second.get("key") == "value"
+    # Promotion must not grant a fresh TTL: the entry was written 50 of its 60 seconds ago
+    now[0] += 11
+    assert second.memory.get("key") is None
+    assert second.get("key") is None
+
+
+def test_disk_tier_size_limit(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "cache.db"), max_entries=3, ttl_seconds=60)
+    for i in range(5):
+        disk.set(f"k{i}", i)
+    assert len(disk) == 3
+    assert disk.get("k0") is None
+    assert disk.get("k4") == 4
+
+
+def test_disk_reads_only_touch_stale_entries(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    disk = SQLiteCache(str(tmp_path / "cache.db"), max_entries=10, ttl_seconds=600, touch_seconds=60)
+    disk.set("key", "value")
+
+    writes = disk._conn.total_changes
+    now[0] += 30
+    assert disk.get("key") == "value"
+    assert disk._conn.total_changes == writes
+    now[0] += 31
+    assert disk.get("key") == "value"
+    assert disk._conn.total_changes == writes + 1
+
+
+def test_disk_row_count_follows_other_writers(tmp_path):
+    path = str(tmp_path / "cache.db")
+    disk = SQLiteCache(path, max_entries=4, ttl_seconds=60)
+    other = SQLiteCache(path, max_entries=4, ttl_seconds=60)
+    for i in range(3):
+        other.set(f"other{i}", i)
+    for i in range(5):
+        disk.set(f"own{i}", i)
+    # Passing its own count of the limit makes this connection recount, other writers' rows included
+    assert len(disk) <= 4
+    assert disk.get("own4") == 4
+    assert disk.get("other0") is None
+
+
+def test_async_access_reads_disk_off_the_event_loop(tmp_path, monkeypatch):
+    threaded = []
+    to_thread = asyncio.to_thread
+
+    async def counting_to_thread(func, *args):
+        threaded.append(func)
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(cache_module.asyncio, "to_thread", counting_to_thread)
+    path = str(tmp_path / "cache.db")
+    asyncio.run(LLMCache(MemoryLRUCache(10, 60), SQLiteCache(path, 10, 60)).aset("key", [0.1, 0.2]))
+    assert len(threaded) == 1
+
+    cache = LLMCache(MemoryLRUCache(10, 60), SQLiteCache(path, 10, 60))
+
+    async def lookups():
+        return [await cache.aget("key"), await cache.aget("key"), await cache.aget("missing")]
+
+    assert asyncio.run(lookups()) == [[0.1, 0.2], [0.1, 0.2], None]
+    # The disk hit and the miss went to a thread; the promoted repeat was answered from memory
+    assert len(threaded) == 3
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def _fake_client(create):
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def test_openai_params_are_cached(monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        content = json.dumps({"ctr": 0.02, "engagement": 0.4, "conversion": 0.05, "roi_threshold": 0.3})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    monkeypatch.setattr(gpt_utils, "params_cache", LLMCache(MemoryLRUCache(10, 60)))
+    monkeypatch.setattr(gpt_utils, "get_client", lambda: _fake_client(create))
+
+    first = gpt_utils.get_simulation_params_from_context("A SaaS startup", "Signups")
+    second = gpt_utils.get_simulation_params_from_context("a saas  startup ", "signups")
+    assert first == second == (0.02, 0.4, 0.05, 0.3)
+    assert len(calls) == 1
+
+
+def test_default_params_are_not_cached(monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="not json"))])
+
+    monkeypatch.setattr(gpt_utils, "params_cache", LLMCache(MemoryLRUCache(10, 60)))
+    monkeypatch.setattr(gpt_utils, "get_client", lambda: _fake_client(create))
+
+    gpt_utils.get_simulation_params_from_context("A SaaS startup", "Signups")
+    gpt_utils.get_simulation_params_from_context("A SaaS startup", "Signups")
+    assert len(calls) == 2
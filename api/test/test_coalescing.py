@@ -0,0 +1,88 @@
+"""Single-flight coalescing tests"""
+
+import asyncio
+
+import httpx
+
+from app import main
+from app.utils import gpt_utils, metrics
+from app.utils.coalescing import SingleFlight, make_request_key
+
+
+def test_concurrent_callers_share_one_computation():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def run():
+        first = await asyncio.gather(*(flights.do("key", compute) for _ in range(5)))
+        # Nothing is kept once the shared run finishes
+        second = await flights.do("key", compute)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == [1] * 5
+    assert second == 2
+    assert flights.stats() == {"started": 2, "coalesced": 4, "in_flight": 0}
+
+
+def test_failures_reach_every_waiter_and_cancellation_is_isolated():
+    flights = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("LLM unavailable")
+
+    async def run():
+        results = await asyncio.gather(*(flights.do("bad", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+        leader = asyncio.create_task(flights.do("slow", lambda: asyncio.sleep(0.05, result="done")))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("slow", lambda: asyncio.sleep(0.05, result="other")))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_request_key_normalizes_text_only():
+    assert make_request_key("stub", {"seed": 1}, texts=("  Bakery ", "ORDERS")) == make_request_key("stub", {"seed": 1}, texts=("bakery", "orders"))
+    assert make_request_key("stub", {"seed": 1}, texts=("bakery", "orders")) != make_request_key("stub", {"seed": 2}, texts=("bakery", "orders"))
+    assert make_request_key("stub", {}, texts=("bakery", "orders")) != make_request_key("openai", {}, texts=("bakery", "orders"))
+
+
+def test_identical_simulate_requests_coalesce(monkeypatch):
+    calls = []
+
+    async def slow_params(company_description, advertisement_goal):
+        calls.append("params")
+        await asyncio.sleep(0.1)
+        return 0.05, 0.5, 0.1, 0.3
+
+    async def slow_insight(*args):
+        calls.append("insight")
+        return "Improve the landing page"
+
+    monkeypatch.setattr(gpt_utils, "aget_simulation_params_from_context", slow_params)
+    monkeypatch.setattr(gpt_utils, "aget_chatgpt_marketing_insight", slow_insight)
+    before = metrics.coalesced_requests.value(route="/simulate")
+
+    async def burst():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            payloads = [{"company_description": "SaaS", "advertisement_goal": "Signups"}, {"company_description": " saas", "advertisement_goal": "SIGNUPS "}] * 5
+            payloads.append({"company_description": "SaaS", "advertisement_goal": "Signups", "seed": 3})
+            return await asyncio.gather(*(client.post("/simulate", json=payload) for payload in payloads))
+
+    responses = asyncio.run(burst())
+    assert all(response.status_code == 200 for response in responses)
+    # Ten identical requests and one with its own seed: two runs, nine coalesced
+    assert calls.count("params") == 2 and calls.count("insight") == 2
+    assert metrics.coalesced_requests.value(route="/simulate") == before + 9
+    assert len({response.json()["seed"] for response in responses[:10]}) == 1
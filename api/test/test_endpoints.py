@@ -0,0 +1,129 @@
+"""In-process endpoint tests with the LLM calls patched out"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.utils import gpt_utils
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+
+    async def fake_params(company_description, advertisement_goal):
+        calls.append((company_description, advertisement_goal))
+        return 0.05, 0.5, 0.1, 0.3
+
+    async def fake_insight(*args):
+        return "Improve the landing page"
+
+    monkeypatch.setattr(gpt_utils, "aget_simulation_params_from_context", fake_params)
+    monkeypatch.setattr(gpt_utils, "aget_chatgpt_marketing_insight", fake_insight)
+    test_client = TestClient(main.app)
+    test_client.llm_calls = calls
+    return test_client
+
+
+def test_simulate(client):
+    response = client.post("/simulate", json={"company_description": "SaaS", "advertisement_goal": "Signups"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["recommendations"] == ["Improve the landing page"]
+    assert body["user_journey_stats"]["total_impressions"] == 10000
+
+
+def test_sweep_uses_one_llm_call(client):
+    response = client.post("/simulate/sweep", json={
+        "company_description": "SaaS",
+        "advertisement_goal": "Signups",
+        "ctr_values": [0.01, 0.05, 0.1, 0.2],
+        "engagement_values": [0.2, 0.8],
+        "simulation_engine": "analytic",
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert len(client.llm_calls) == 1
+    assert body["base_params"] == {"ctr": 0.05, "engagement": 0.5, "conversion": 0.1, "roi_threshold": 0.3}
+    assert len(body["roi_fit_score_grid"]) == 4
+    assert len(body["roi_fit_score_grid"][0]) == 2
+    assert len(body["roi_fit_score_grid"][0][0]) == 1
+    # Higher CTR can only raise the expected fit score
+    assert body["roi_fit_score_grid"][3][1][0] > body["roi_fit_score_grid"][0][1][0]
+
+
+def test_sweep_with_explicit_params_skips_llm(client):
+    response = client.post("/simulate/sweep", json={"ctr": 0.05, "engagement": 0.5, "conversion": 0.1, "roi_threshold": 0.3})
+    assert response.status_code == 200
+    assert client.llm_calls == []
+
+
+def test_sweep_requires_params_or_context(client):
+    response = client.post("/simulate/sweep", json={"ctr": 0.05})
+    assert response.status_code == 400
+
+
+def test_sweep_rejects_invalid_probabilities_and_oversized_runs(client):
+    base = {"ctr": 0.05, "engagement": 0.5, "conversion": 0.1, "roi_threshold": 0.3}
+    assert client.post("/simulate/sweep", json={**base, "ctr_values": [-1, 2]}).status_code == 422
+    assert client.post("/simulate/sweep", json={**base, "engagement": 1.5}).status_code == 422
+
+    oversized = client.post("/simulate/sweep", json={**base, "ctr_values": [0.01 * i for i in range(1, 51)], "impressions": 10000000, "simulation_engine": "per_impression"})
+    assert oversized.status_code == 400
+    assert "draws" in oversized.json()["detail"]
+
+
+def test_simulate_requests_overlap_while_waiting_on_llm(monkeypatch):
+    async def slow_params(company_description, advertisement_goal):
+        await asyncio.sleep(0.2)
+        return 0.05, 0.5, 0.1, 0.3
+
+    async def slow_insight(*args):
+        await asyncio.sleep(0.2)
+        return "Improve the landing page"
+
+    monkeypatch.setattr(gpt_utils, "aget_simulation_params_from_context", slow_params)
+    monkeypatch.setattr(gpt_utils, "aget_chatgpt_marketing_insight", slow_insight)
+
+    async def burst():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # Distinct companies, so the requests overlap rather than coalesce
+            payloads = [{"company_description": f"SaaS {i}", "advertisement_goal": "Signups"} for i in range(50)]
+            return await asyncio.gather(*(client.post("/simulate", json=payload) for payload in payloads))
+
+    start = time.perf_counter()
+    responses = asyncio.run(burst())
+    elapsed = time.perf_counter() - start
+
+    assert all(response.status_code == 200 for response in responses)
+    # 50 serialized requests would take 20s; overlapping ones take about one request's latency
+    assert elapsed < 2.0
+
+
+def test_simulate_adaptive_reports_interval(client):
+    response = client.post("/simulate", json={"company_description": "SaaS", "advertisement_goal": "Signups", "adaptive": True, "simulation_engine": "aggregate"})
+    assert response.status_code == 200
+    body = response.json()
+    low, high = body["confidence_interval"]
+    assert low <= body["roi_fit_score"] <= high
+    assert body["samples_used"] == body["user_journey_stats"]["total_impressions"]
+    assert body["stopping_reason"] in ("precision", "decision", "max_impressions")
+
+    rejected = client.post("/simulate", json={"company_description": "SaaS", "advertisement_goal": "Signups", "adaptive": True, "simulation_engine": "analytic"})
+    assert rejected.status_code == 422
+
+
+def test_simulate_seed_is_echoed_and_reproducible(client):
+    payload = {"company_description": "SaaS", "advertisement_goal": "Signups", "simulation_engine": "per_impression", "seed": 1234}
+    first = client.post("/simulate", json=payload).json()
+    assert first["seed"] == 1234
+    assert client.post("/simulate", json=payload).json() == first
+
+    unseeded = client.post("/simulate", json={**payload, "seed": None}).json()
+    replay = client.post("/simulate", json={**payload, "seed": unseeded["seed"]}).json()
+    assert replay["user_journey_stats"] == unseeded["user_journey_stats"]
@@ -0,0 +1,120 @@
+"""Multi-segment funnel tests"""
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.models import FunnelSpec
+from app.simulator import funnel as funnel_module
+from app.simulator.funnel import allocate_impressions, resolve_funnel, run_funnel_simulation
+from app.simulator.simulator import run_market_fit_simulation
+from app.utils import gpt_utils
+
+PARAMS = {"ctr": 0.05, "engagement": 0.4, "conversion": 0.1, "roi_threshold": 0.5}
+
+SPEC = {
+    "impressions": 100000,
+    "stages": [
+        {"name": "views", "rate": 0.6, "noise": 0.05},
+        {"name": "clicks"},
+        {"name": "signups", "rate": 0.2},
+        {"name": "purchases", "rate": 0.3, "noise": 0.02},
+    ],
+    "channels": [
+        {"name": "search", "budget_share": 3, "stage_rates": {"clicks": 0.08}},
+        {"name": "social", "budget_share": 1},
+    ],
+    "segments": [
+        {"name": "students", "channel": "search", "weight": 1},
+        {"name": "parents", "channel": "search", "weight": 2, "stage_rates": {"purchases": 0.5}},
+        {"name": "teachers", "channel": "social"},
+    ],
+}
+
+
+def test_default_funnel_matches_classic_simulation():
+    funnel = run_funnel_simulation(FunnelSpec(), engine="analytic", **PARAMS)
+    classic = run_market_fit_simulation(10000, engine="analytic", **PARAMS)
+    assert funnel.total_conversions == classic.total_conversions
+    assert funnel.stage_counts == {
+        "clicks": classic.total_clicks,
+        "landings": classic.total_landings,
+        "engagements": classic.total_engagements,
+        "conversions": classic.total_conversions,
+    }
+    assert [segment.name for segment in funnel.segments] == ["default"]
+
+
+def test_budget_split_and_override_precedence():
+    funnel = resolve_funnel(FunnelSpec(**SPEC), 0.05, 0.4, 0.1)
+    assert funnel.stage_names == ["views", "clicks", "signups", "purchases"]
+    # search gets 3/4 of the budget, split 1:2 between its segments
+    assert funnel.impressions.tolist() == [25000, 50000, 25000]
+    assert funnel.rates[:, 1].tolist() == [0.08, 0.08, 0.05]
+    assert funnel.rates[:, 3].tolist() == [0.3, 0.5, 0.3]
+    assert allocate_impressions(10, np.array([1.0, 1.0, 1.0])).sum() == 10
+
+
+@pytest.mark.parametrize("engine", ["aggregate", "per_impression"])
+def test_sampled_segments_match_analytic(engine):
+    spec = FunnelSpec(**SPEC)
+    analytic = run_funnel_simulation(spec, engine="analytic", **PARAMS)
+    sampled = run_funnel_simulation(spec, engine=engine, rng=8, **PARAMS)
+
+    assert sampled.seed == 8
+    assert sampled.total_impressions == 100000
+    for expected, segment in zip(analytic.segments, sampled.segments):
+        assert segment.impressions == expected.impressions
+        for stage, count in expected.stage_counts.items():
+            assert segment.stage_counts[stage] == pytest.approx(count, abs=5 * np.sqrt(count) + 2)
+    assert sampled.total_conversions == sum(segment.stage_counts["purchases"] for segment in sampled.segments)
+
+
+def test_per_impression_chunks_span_segment_boundaries(monkeypatch):
+    # Chunks that straddle segments must still credit every impression to its own segment
+    monkeypatch.setattr(funnel_module, "BATCH_CHUNK_ELEMENTS", 7000)
+    spec = FunnelSpec(**SPEC)
+    analytic = run_funnel_simulation(spec, engine="analytic", **PARAMS)
+    sampled = run_funnel_simulation(spec, engine="per_impression", rng=9, **PARAMS)
+    for expected, segment in zip(analytic.segments, sampled.segments):
+        for stage, count in expected.stage_counts.items():
+            assert segment.stage_counts[stage] == pytest.approx(count, abs=5 * np.sqrt(count) + 2)
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"segments": [{"name": "a", "channel": "tv"}]}, "unknown channel"),
+    ({"channels": [{"name": "search", "stage_rates": {"shares": 0.1}}, {"name": "social"}]}, "unknown stage"),
+    ({"stages": [{"name": "shares"}]}, "needs a rate"),
+    ({"stages": [{"name": "clicks"}, {"name": "clicks"}]}, "Duplicate stage"),
+    ({"stages": [{"name": "impressions", "rate": 0.5}]}, "Reserved stage"),
+])
+def test_invalid_specs_are_rejected(change, message):
+    with pytest.raises(ValueError, match=message):
+        run_funnel_simulation(FunnelSpec(**{**SPEC, **change}), **PARAMS)
+
+
+def test_simulate_with_funnel_reports_segments(monkeypatch):
+    async def fake_params(company_description, advertisement_goal):
+        return 0.05, 0.5, 0.1, 0.3
+
+    async def fake_insight(*args):
+        return "Shift budget to search"
+
+    monkeypatch.setattr(gpt_utils, "aget_simulation_params_from_context", fake_params)
+    monkeypatch.setattr(gpt_utils, "aget_chatgpt_marketing_insight", fake_insight)
+    client = TestClient(main.app)
+
+    response = client.post("/simulate", json={"company_description": "Tutoring", "advertisement_goal": "Bookings", "funnel": SPEC, "seed": 3})
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["user_journey_stats"]) == {"total_impressions", "total_views", "total_clicks", "total_signups", "total_purchases"}
+    assert [segment["name"] for segment in body["segments"]] == ["students", "parents", "teachers"]
+    assert sum(segment["impressions"] for segment in body["segments"]) == 100000
+
+    bad = client.post("/simulate", json={"company_description": "Tutoring", "advertisement_goal": "Bookings", "funnel": {"stages": [{"name": "shares"}]}})
+    assert bad.status_code == 400
+
+    for funnel in ({"channels": []}, {"impressions": 10**8}):
+        invalid = client.post("/simulate", json={"company_description": "Tutoring", "advertisement_goal": "Bookings", "funnel": funnel})
+        assert invalid.status_code == 422
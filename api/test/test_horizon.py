@@ -0,0 +1,90 @@
+"""Cohort time-horizon simulation tests"""
+
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.simulator.horizon import DAILY_KEYS, conversion_delay_pmf, run_horizon_simulation
+from app.simulator.simulator import stage_probabilities
+
+PARAMS = {"ctr": 0.03, "engagement": 0.5, "conversion": 0.1, "roi_threshold": 0.5}
+
+
+def test_summary_matches_daily_series_and_seed_reproduces_it():
+    first = run_horizon_simulation(30, 100000, **PARAMS, rng=7)
+    second = run_horizon_simulation(30, 100000, **PARAMS, rng=7)
+    summary, daily = first["summary"], first["daily"]
+
+    assert summary == second["summary"]
+    assert all(np.array_equal(daily[key], second["daily"][key]) for key in DAILY_KEYS)
+    assert summary.engine == "cohort" and summary.seed == 7
+    assert summary.total_impressions == 3000000
+    for key in ("total_clicks", "total_landings", "total_engagements", "total_conversions"):
+        assert getattr(summary, key) == daily[key].sum()
+    assert np.array_equal(daily["prospecting_impressions"] + daily["retargeting_impressions"], daily["total_impressions"])
+
+
+def test_without_dynamics_it_matches_the_static_funnel():
+    # No fatigue, retargeting or delay: every day is an independent aggregate-engine snapshot
+    result = run_horizon_simulation(10, 1000000, **PARAMS, fatigue=0, retarget_share=0, conversion_delay_days=0, conversion_window_days=1, rng=1)
+    expected = 10 * 1000000 * np.prod(stage_probabilities(PARAMS["ctr"], PARAMS["engagement"], PARAMS["conversion"]))
+    assert result["summary"].total_conversions == pytest.approx(expected, rel=0.05)
+    assert result["pending_conversions"] == 0
+    assert result["daily"]["retargeting_impressions"].sum() == 0
+
+
+def test_fatigue_retargeting_and_delay_shape_the_series():
+    fatigued = run_horizon_simulation(30, 200000, **PARAMS, audience_size=100000, fatigue=0.2, retarget_share=0, rng=3)["daily"]
+    assert fatigued["total_clicks"][-1] < 0.5 * fatigued["total_clicks"][0]
+
+    retargeted = run_horizon_simulation(30, 200000, **PARAMS, retarget_share=0.3, rng=3)["daily"]
+    assert retargeted["retargeting_impressions"][0] == 0
+    assert retargeted["retargeting_impressions"][1:].min() > 0
+    assert np.all(retargeted["retargeting_impressions"] <= 0.3 * retargeted["total_impressions"])
+
+    delayed = run_horizon_simulation(5, 200000, **PARAMS, conversion_delay_days=3, conversion_window_days=10, rng=3)
+    # Day one only sees same-day conversions; later days add conversions carried over
+    assert delayed["daily"]["total_conversions"][0] < delayed["daily"]["total_conversions"][-1]
+    assert delayed["pending_conversions"] > 0
+
+
+def test_delay_distribution_and_input_checks():
+    pmf = conversion_delay_pmf(2.0, 7)
+    assert pmf.sum() == pytest.approx(1.0)
+    assert np.all(np.diff(pmf) < 0)
+    assert conversion_delay_pmf(0.0, 5).tolist() == [1.0, 0.0, 0.0, 0.0, 0.0]
+
+    with pytest.raises(ValueError):
+        run_horizon_simulation(3, [100, 200], **PARAMS)
+    with pytest.raises(ValueError):
+        run_horizon_simulation(2, 0, **PARAMS)
+
+
+def test_ninety_days_of_millions_of_impressions_finish_quickly():
+    started = time.perf_counter()
+    result = run_horizon_simulation(90, 5000000, **PARAMS, rng=0)
+    assert time.perf_counter() - started < 1.0
+    assert result["summary"].total_impressions == 450000000
+
+
+def test_horizon_endpoint():
+    client = TestClient(main.app)
+    schedule = [50000] * 7 + [100000] * 7
+    response = client.post("/simulate/horizon", json={**PARAMS, "days": 14, "daily_impressions": schedule, "seed": 5})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["seed"] == 5
+    assert [day["day"] for day in body["daily"]] == list(range(1, 15))
+    assert body["user_journey_stats"]["total_impressions"] == sum(schedule)
+    assert body["user_journey_stats"]["total_conversions"] == sum(day["total_conversions"] for day in body["daily"])
+
+    mismatched = client.post("/simulate/horizon", json={**PARAMS, "days": 3, "daily_impressions": [1, 2]})
+    assert mismatched.status_code == 400
+    missing = client.post("/simulate/horizon", json={"ctr": 0.03, "days": 3})
+    assert missing.status_code == 400
+    for daily_impressions in (10**20, [1, 10**20, 1], -5):
+        out_of_range = client.post("/simulate/horizon", json={**PARAMS, "days": 3, "daily_impressions": daily_impressions})
+        assert out_of_range.status_code == 422
@@ -0,0 +1,113 @@
+"""Batch job queue and result store tests"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.models import BatchItem
+from app.utils import gpt_utils, jobs
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    calls = []
+
+    async def fake_params(company_description, advertisement_goal):
+        calls.append(company_description)
+        if company_description == "Broken":
+            raise RuntimeError("LLM unavailable")
+        await asyncio.sleep(0.01)
+        return 0.05, 0.5, 0.1, 0.3
+
+    async def fake_insight(*args):
+        return "Improve the landing page"
+
+    monkeypatch.setattr(gpt_utils, "aget_simulation_params_from_context", fake_params)
+    monkeypatch.setattr(gpt_utils, "aget_chatgpt_marketing_insight", fake_insight)
+    monkeypatch.setattr(jobs, "_runner", jobs.JobRunner(jobs.JobStore(str(tmp_path / "jobs.db")), concurrency=2, rate_per_second=0))
+    # The context manager keeps one event loop running between requests, so jobs progress in the background
+    with TestClient(main.app) as test_client:
+        test_client.llm_calls = calls
+        yield test_client
+
+
+def _wait_for(client, job_id, **params):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        body = client.get(f"/jobs/{job_id}", params=params).json()
+        if body["status"] in ("done", "failed"):
+            return body
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_batch_job_runs_in_background_and_pages(client):
+    items = [
+        {"company_description": "Bakery", "advertisement_goal": "Orders"},
+        {"company_description": "Gym", "advertisement_goal": "Members"},
+        {"company_description": "  bakery ", "advertisement_goal": "ORDERS"},
+        {"company_description": "Broken", "advertisement_goal": "Anything"},
+    ]
+    response = client.post("/simulate/batch", json={"items": items, "seed": 5})
+    assert response.status_code == 202
+    queued = response.json()
+    assert queued["status"] == "queued" and queued["total"] == 4
+
+    job = _wait_for(client, queued["job_id"])
+    assert (job["status"], job["completed"], job["failed"]) == ("done", 3, 1)
+    # Duplicates share one evaluation
+    assert sorted(client.llm_calls) == ["Bakery", "Broken", "Gym"]
+    assert [item["status"] for item in job["items"]] == ["done", "done", "done", "failed"]
+    assert job["items"][2]["result"] == job["items"][0]["result"]
+    assert job["items"][0]["result"]["recommendations"] == ["Improve the landing page"]
+    assert job["items"][3]["error"] == "LLM unavailable"
+
+    page = client.get(f"/jobs/{queued['job_id']}", params={"offset": 1, "limit": 2}).json()
+    assert [item["index"] for item in page["items"]] == [1, 2]
+    failed = client.get(f"/jobs/{queued['job_id']}", params={"status": "failed"}).json()
+    assert [item["index"] for item in failed["items"]] == [3]
+
+
+def test_job_seed_spawns_reproducible_item_seeds(client):
+    body = {"items": [{"company_description": "Gym", "advertisement_goal": "Members"}], "seed": 11, "include_insight": False}
+    first = _wait_for(client, client.post("/simulate/batch", json=body).json()["job_id"])
+    second = _wait_for(client, client.post("/simulate/batch", json=body).json()["job_id"])
+    assert first["items"][0]["result"] == second["items"][0]["result"]
+    assert first["items"][0]["result"]["recommendations"] == []
+    assert first["items"][0]["result"]["seed"] != 11
+
+
+def test_unknown_job_and_oversized_batch(client, monkeypatch):
+    assert client.get("/jobs/missing").status_code == 404
+    monkeypatch.setattr(main, "MAX_BATCH_ITEMS", 1)
+    items = [{"company_description": "Gym", "advertisement_goal": "Members"}] * 2
+    assert client.post("/simulate/batch", json={"items": items}).status_code == 400
+
+
+def test_store_fails_jobs_of_dead_processes(tmp_path):
+    store = jobs.JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.create([BatchItem(company_description="Gym", advertisement_goal="Members")], {})
+    store._conn.execute("UPDATE jobs SET status = 'running', pid = ?, instance = 'previous'", (2 ** 22 + 1,))
+    store._conn.commit()
+
+    reopened = jobs.JobStore(str(tmp_path / "jobs.db"))
+    job = reopened.get(job_id)
+    assert (job["status"], job["failed"]) == ("failed", 1)
+    assert job["items"][0]["error"] == "interrupted by server restart"
+
+
+def test_store_fails_jobs_left_by_a_previous_process_with_the_same_pid(tmp_path):
+    # Containers restart their server as PID 1: the PID matches, the instance id does not
+    store = jobs.JobStore(str(tmp_path / "jobs.db"))
+    item = BatchItem(company_description="Gym", advertisement_goal="Members")
+    old_job, own_job = store.create([item], {}), store.create([item], {})
+    store._conn.execute("UPDATE jobs SET status = 'running'")
+    store._conn.execute("UPDATE jobs SET instance = 'previous' WHERE id = ?", (old_job,))
+    store._conn.commit()
+
+    reopened = jobs.JobStore(str(tmp_path / "jobs.db"))
+    assert reopened.get(old_job)["status"] == "failed"
+    assert reopened.get(own_job)["status"] == "running"
@@ -0,0 +1,60 @@
+"""Metrics exposition and structured logging tests"""
+
+import json
+import logging
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.utils import metrics
+from app.utils.logging_utils import JSONFormatter, SamplingFilter, StructuredLogger
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("demo_seconds", "Demo", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, stage="a")
+
+    lines = histogram.render().splitlines()
+    assert lines[:2] == ["# HELP demo_seconds Demo", "# TYPE demo_seconds histogram"]
+    assert 'demo_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="a",le="1.0"} 3' in lines
+    assert 'demo_seconds_bucket{stage="a",le="+Inf"} 4' in lines
+    assert 'demo_seconds_sum{stage="a"} 4.05' in lines
+    assert 'demo_seconds_count{stage="a"} 4' in lines
+
+
+def test_metrics_endpoint_reports_stages_and_routes():
+    client = TestClient(main.app)
+    params_before = metrics.stage_duration.count(stage="params", backend="stub")
+    tokens_before = metrics.llm_tokens.value(backend="stub", kind="completion")
+
+    response = client.post("/simulate", json={"company_description": "Bakery", "advertisement_goal": "Orders", "backend": "stub"})
+    assert response.status_code == 200
+
+    assert metrics.stage_duration.count(stage="params", backend="stub") == params_before + 1
+    assert metrics.stage_duration.count(stage="simulation", backend="stub") >= 1
+    assert metrics.stage_duration.count(stage="insight", backend="stub") >= 1
+    assert metrics.llm_tokens.value(backend="stub", kind="completion") > tokens_before
+
+    exposition = client.get("/metrics")
+    assert exposition.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="POST",route="/simulate",status="200"}' in exposition.text
+    assert 'stage_duration_seconds_bucket{stage="params",backend="stub",le="+Inf"}' in exposition.text
+    assert "# TYPE llm_cache_lookups_total counter" in exposition.text
+
+
+def test_structured_logs_are_json_and_sampled():
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "simulation_params", None, None)
+    msg, kwargs = StructuredLogger(logging.getLogger("app.test"), {}).process("simulation_params", {"ctr": 0.02, "exc_info": None})
+    record.fields = kwargs["extra"]["fields"]
+
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry["event"] == "simulation_params"
+    assert entry["ctr"] == 0.02
+    assert entry["level"] == "info"
+
+    drop_all = SamplingFilter(0.0)
+    assert not drop_all.filter(record)
+    record.levelno = logging.WARNING
+    assert drop_all.filter(record)
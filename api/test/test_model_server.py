@@ -0,0 +1,132 @@
+"""Shared model server tests"""
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from app.utils.model_server import ModelServer, ModelServerBusy, ModelServerClient, ModelServerError, _encode
+
+
+def _socket_path() -> str:
+    # Unix socket paths are limited to about 100 characters, so stay out of pytest's long tmp_path
+    return os.path.join(tempfile.mkdtemp(prefix="hf-"), "model.sock")
+
+
+async def _echo(prompt, kwargs):
+    await asyncio.sleep(0.01)
+    return f"{prompt}|{kwargs.get('max_new_tokens')}"
+
+
+async def _words(message):
+    for word in message["text"].split():
+        yield word + " "
+
+
+def _server(path, generate=_echo, max_pending=8):
+    return ModelServer(path, generate=generate, stream=_words, stats=lambda: {"load": {"loaded": True}}, max_pending=max_pending)
+
+
+def test_workers_share_the_server_and_see_batched_results():
+    path = _socket_path()
+    client = ModelServerClient(path, timeout=5)
+
+    async def run():
+        server = _server(path)
+        await server.start()
+        try:
+            results = await asyncio.gather(*(asyncio.to_thread(client.generate, f"prompt {i}", {"max_new_tokens": i}) for i in range(6)))
+            chunks = [chunk async for chunk in client.astream({"op": "stream", "text": "one two three"})]
+            stats = await asyncio.to_thread(client.stats)
+        finally:
+            await server.close()
+        return results, chunks, stats
+
+    results, chunks, stats = asyncio.run(run())
+    assert results == [f"prompt {i}|{i}" for i in range(6)]
+    assert chunks == ["one ", "two ", "three "]
+    assert stats["load"] == {"loaded": True}
+    assert stats["server"]["served"] == 7
+    assert not os.path.exists(path)
+
+
+def test_requests_beyond_max_pending_are_refused():
+    path = _socket_path()
+    client = ModelServerClient(path, timeout=5)
+    release = asyncio.Event()
+
+    async def slow(prompt, kwargs):
+        await release.wait()
+        return prompt
+
+    async def run():
+        server = _server(path, generate=slow, max_pending=1)
+        await server.start()
+        try:
+            first = asyncio.create_task(asyncio.to_thread(client.generate, "first", {}))
+            while server.in_flight == 0:
+                await asyncio.sleep(0.01)
+            with pytest.raises(ModelServerBusy):
+                await asyncio.to_thread(client.generate, "second", {})
+            release.set()
+            return await first, server.stats()
+        finally:
+            await server.close()
+
+    result, stats = asyncio.run(run())
+    assert result == "first"
+    assert stats["rejected"] == 1
+
+
+def test_client_reconnects_after_a_server_restart_and_reports_a_missing_server():
+    path = _socket_path()
+    client = ModelServerClient(path, timeout=5)
+
+    async def run():
+        for _ in range(2):
+            server = _server(path)
+            await server.start()
+            try:
+                assert await asyncio.to_thread(client.generate, "hello", {}) == "hello|None"
+            finally:
+                await server.close()
+
+    asyncio.run(run())
+    with pytest.raises(ModelServerError):
+        client.generate("hello", {})
+
+
+def test_worker_disconnecting_mid_stream_is_not_a_failure():
+    path = _socket_path()
+    closed = asyncio.Event()
+
+    async def endless(message):
+        try:
+            while True:
+                await asyncio.sleep(0.001)
+                yield "word " * 1000
+        finally:
+            closed.set()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        unhandled = []
+        loop.set_exception_handler(lambda loop, context: unhandled.append(context))
+        server = ModelServer(path, generate=_echo, stream=endless, stats=lambda: {})
+        await server.start()
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(_encode({"op": "stream", "text": ""}))
+            await reader.readexactly(100)
+            writer.transport.abort()
+            await asyncio.wait_for(closed.wait(), 5)
+            while server.connections:
+                await asyncio.sleep(0.01)
+            return server.stats(), unhandled
+        finally:
+            await server.close()
+
+    stats, unhandled = asyncio.run(run())
+    assert (stats["in_flight"], stats["failed"], stats["connections"]) == (0, 0, 0)
+    assert unhandled == []
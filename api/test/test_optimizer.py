@@ -0,0 +1,69 @@
+"""Budget allocation optimizer tests"""
+
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.models.models import OptimizeArm
+from app.simulator.optimizer import optimize_allocation
+
+ARMS = [
+    OptimizeArm(name="search", ctr=0.08, engagement=0.6, conversion=0.15),
+    OptimizeArm(name="social", ctr=0.03, engagement=0.4, conversion=0.05),
+    OptimizeArm(name="display", ctr=0.01, engagement=0.3, conversion=0.05),
+]
+
+
+def test_best_arm_takes_an_uncapped_budget():
+    result = optimize_allocation(ARMS, 100003, rng=4)
+    impressions = {arm["name"]: arm["impressions"] for arm in result["allocation"]}
+    assert impressions == {"search": 100003, "social": 0, "display": 0}
+    assert result["seed"] == 4
+    assert result["expected_conversions"] > result["even_split"]["expected_conversions"]
+
+
+def test_caps_are_respected_and_overflow_goes_to_next_best():
+    arms = [ARMS[0].model_copy(update={"max_impressions": 30000}), *ARMS[1:]]
+    result = optimize_allocation(arms, 100000, rng=4)
+    impressions = [arm["impressions"] for arm in result["allocation"]]
+    assert impressions == [30000, 70000, 0]
+    assert sum(arm["share"] for arm in result["allocation"]) == pytest.approx(1.0)
+
+
+def test_roi_fit_objective_beats_even_split():
+    result = optimize_allocation(ARMS, 20000, objective="roi_fit", roi_threshold=0.5, rng=2)
+    assert result["high_fit_probability"] > result["even_split"]["high_fit_probability"]
+    assert result == optimize_allocation(ARMS, 20000, objective="roi_fit", roi_threshold=0.5, rng=2)
+
+
+def test_dozens_of_arms_finish_quickly():
+    rng = np.random.default_rng(0)
+    arms = [
+        OptimizeArm(name=f"arm{i}", ctr=float(rng.uniform(0.01, 0.08)), engagement=float(rng.uniform(0.2, 0.8)), conversion=float(rng.uniform(0.02, 0.2)), max_impressions=int(rng.integers(50000, 400000)))
+        for i in range(40)
+    ]
+    started = time.perf_counter()
+    result = optimize_allocation(arms, 1000000, objective="roi_fit", rng=1)
+    assert time.perf_counter() - started < 1.0
+    assert sum(arm["impressions"] for arm in result["allocation"]) <= 1000000
+    for arm, allocated in zip(arms, result["allocation"]):
+        assert allocated["impressions"] <= arm.max_impressions
+
+
+def test_optimize_endpoint():
+    client = TestClient(main.app)
+    arms = [arm.model_dump() for arm in ARMS]
+    response = client.post("/optimize", json={"total_impressions": 50000, "arms": arms, "seed": 9})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["seed"] == 9
+    assert body["allocation"][0]["impressions"] == 50000
+
+    too_small = client.post("/optimize", json={"total_impressions": 5, "arms": arms})
+    assert too_small.status_code == 400
+    duplicated = client.post("/optimize", json={"total_impressions": 50000, "arms": [arms[0], arms[0]]})
+    assert duplicated.status_code == 400
+    assert "Duplicate arm names" in duplicated.json()["detail"]
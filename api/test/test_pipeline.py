@@ -0,0 +1,149 @@
+"""Pipelined /simulate tests, timed against a local stub model"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.utils import gpt_utils
+from app.utils.backends import get_backend
+
+PAYLOAD = {"company_description": "SaaS", "advertisement_goal": "Signups"}
+EXTRACT_SECONDS = 0.2
+PREFILL_SECONDS = 0.2
+TOKEN_SECONDS = 0.01
+TOKENS = ["Bottleneck: ", "low ", "CTR. ", "Fix: ", "test ", "new ", "creatives."] * 3
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    """Parameter extraction, prefix prefill and per-token decode each cost wall time"""
+
+    async def extract(company_description, advertisement_goal):
+        await asyncio.sleep(EXTRACT_SECONDS)
+        return 0.05, 0.5, 0.1, 0.3
+
+    async def prepare(company_description, advertisement_goal):
+        await asyncio.sleep(PREFILL_SECONDS)
+        return {"prefilled": True}
+
+    async def stream(simulation_data, company_description, advertisement_goal, prepared=None):
+        if not prepared:
+            await asyncio.sleep(PREFILL_SECONDS)
+        for token in TOKENS:
+            await asyncio.sleep(TOKEN_SECONDS)
+            yield token
+
+    async def insight(simulation_data, company_description, advertisement_goal):
+        return "".join([token async for token in stream(simulation_data, company_description, advertisement_goal)])
+
+    monkeypatch.setattr(gpt_utils, "aget_simulation_params_from_context", extract)
+    monkeypatch.setattr(gpt_utils, "aprepare_chatgpt_insight", prepare)
+    monkeypatch.setattr(gpt_utils, "astream_chatgpt_marketing_insight", stream)
+    monkeypatch.setattr(gpt_utils, "aget_chatgpt_marketing_insight", insight)
+
+
+async def _timed_post(payload):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        response = await client.post("/simulate", json=payload)
+        return [line for line in response.text.splitlines() if line], time.perf_counter() - start
+
+
+def test_pipelined_events_in_order(stub_model):
+    lines, _ = asyncio.run(_timed_post({**PAYLOAD, "pipelined": True}))
+    events = [json.loads(line) for line in lines]
+
+    assert [event["event"] for event in events[:2]] == ["params", "simulation"]
+    assert events[-1]["event"] == "done"
+    assert "".join(event["data"] for event in events if event["event"] == "insight") == "".join(TOKENS)
+    assert events[-1]["data"]["recommendations"] == ["".join(TOKENS).strip()]
+    assert events[1]["data"]["user_journey_stats"] == events[-1]["data"]["user_journey_stats"]
+
+
+async def _time_to_first_insight(data):
+    # httpx's ASGI transport buffers whole bodies, so time the event generator directly
+    start = time.perf_counter()
+    async for event, _ in main._simulate_pipelined(data, get_backend("openai")):
+        if event == "insight":
+            return time.perf_counter() - start
+
+
+def test_pipelined_mode_cuts_latency(stub_model):
+    _, serial_total = asyncio.run(_timed_post(PAYLOAD))
+    _, pipelined_total = asyncio.run(_timed_post({**PAYLOAD, "pipelined": True}))
+    first_insight = asyncio.run(_time_to_first_insight(main.SimulationRequest(**PAYLOAD, pipelined=True)))
+
+    decode = TOKEN_SECONDS * len(TOKENS)
+    # The prefix prefill hides behind parameter extraction...
+    assert pipelined_total < serial_total - PREFILL_SECONDS / 2
+    # ...and the first insight text arrives long before the full insight is decoded
+    assert first_insight < EXTRACT_SECONDS + decode / 2
+
+
+def _parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_endpoint_emits_staged_events(stub_model):
+    client = TestClient(main.app)
+    for response in (
+        client.post("/simulate/stream", json=PAYLOAD),
+        client.get("/simulate/stream", params={**PAYLOAD, "simulation_engine": "analytic"}),
+    ):
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _parse_sse(response.text)
+        assert [name for name, _ in events[:2]] == ["params", "simulation"]
+        assert events[0][1]["ctr"] == 0.05
+        assert {"user_journey_stats", "roi_fit_score", "roi_fit_tag", "samples_used"} <= set(events[1][1])
+        assert "".join(data for name, data in events if name == "insight") == "".join(TOKENS)
+        assert events[-1][0] == "done"
+
+
+def test_stream_endpoint_reports_errors(monkeypatch):
+    async def failing(company_description, advertisement_goal):
+        raise RuntimeError("upstream unavailable")
+
+    monkeypatch.setattr(gpt_utils, "aget_simulation_params_from_context", failing)
+    events = _parse_sse(TestClient(main.app).post("/simulate/stream", json=PAYLOAD).text)
+    assert events == [("error", {"detail": "upstream unavailable"})]
+
+
+def test_pipelined_simulation_failure_ends_stream_and_cancels_prefix(stub_model, monkeypatch):
+    prefix = {}
+
+    async def slow_prepare(company_description, advertisement_goal):
+        prefix["started"] = True
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            prefix["cancelled"] = True
+            raise
+
+    async def failing(params, data, backend):
+        raise RuntimeError("simulation failed")
+
+    monkeypatch.setattr(gpt_utils, "aprepare_chatgpt_insight", slow_prepare)
+    monkeypatch.setattr(main, "_run_simulation", failing)
+
+    async def run():
+        lines, elapsed = await _timed_post({**PAYLOAD, "pipelined": True})
+        await asyncio.sleep(0)  # let the cancellation reach the prefix task
+        return lines, elapsed
+
+    lines, elapsed = asyncio.run(run())
+    events = [json.loads(line) for line in lines]
+    assert [event["event"] for event in events] == ["params", "error"]
+    assert events[-1]["data"] == {"detail": "simulation failed"}
+    assert prefix == {"started": True, "cancelled": True}
+    assert elapsed < 5
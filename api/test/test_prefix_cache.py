@@ -0,0 +1,61 @@
+"""Prompt-prefix KV cache tests"""
+
+import threading
+import time
+
+from app.utils.prefix_cache import PrefixKVCache
+
+
+def test_least_recently_used_entry_is_evicted_to_fit_the_budget():
+    cache = PrefixKVCache(max_bytes=100)
+    cache.put(("gpt2", "params"), "params-kv", 40)
+    cache.put(("gpt2", "insight"), "insight-kv", 40)
+    assert cache.get(("gpt2", "params")) == "params-kv"
+
+    cache.put(("distilgpt2", "params"), "other-kv", 40)
+
+    assert cache.get(("gpt2", "insight")) is None
+    assert cache.get(("gpt2", "params")) == "params-kv"
+    stats = cache.stats()
+    assert stats["bytes"] == 80
+    assert stats["evictions"] == 1
+
+
+def test_entry_larger_than_the_budget_is_not_kept():
+    cache = PrefixKVCache(max_bytes=100)
+    cache.put(("gpt2", "params"), "params-kv", 40)
+
+    assert cache.put(("gpt2", "insight"), "huge", 200) is False
+    assert cache.get(("gpt2", "params")) == "params-kv"
+    assert cache.stats()["bytes"] == 40
+
+
+def test_drop_removes_matching_entries():
+    cache = PrefixKVCache(max_bytes=100)
+    cache.put(("gpt2", "params"), "a", 10)
+    cache.put(("gpt2", "insight"), "b", 10)
+    cache.put(("distilgpt2", "params"), "c", 10)
+
+    assert cache.drop(lambda key: key[0] == "gpt2") == 2
+    assert cache.stats()["entries"] == [["distilgpt2", "params"]]
+    assert cache.stats()["bytes"] == 10
+
+
+def test_concurrent_first_requests_build_once():
+    cache = PrefixKVCache(max_bytes=100)
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.05)
+        return "kv", 10
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_build(("gpt2", "params"), build))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["kv"] * 4
+    assert len(builds) == 1
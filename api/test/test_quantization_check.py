@@ -0,0 +1,27 @@
+"""Quantization accuracy check tests"""
+
+from benchmarks.quantization_check import compare_params
+
+
+def test_small_drift_passes_and_large_drift_fails():
+    reference = [[0.02, 0.5, 0.1], [0.03, 0.4, 0.05]]
+    close = [[0.021, 0.49, 0.1], [0.03, 0.41, 0.06]]
+    report = compare_params(reference, close, tolerance=0.02)
+    assert report["passed"]
+    assert report["compared"] == 2
+    assert report["fields"]["engagement"]["max_abs_error"] == 0.01
+
+    far = [[0.02, 0.8, 0.1], [0.03, 0.4, 0.05]]
+    report = compare_params(reference, far, tolerance=0.02)
+    assert not report["passed"]
+    assert report["fields"]["engagement"]["mean_abs_error"] == 0.15
+
+
+def test_prompts_lost_by_the_candidate_fail_the_check():
+    reference = [[0.02, 0.5, 0.1], None]
+    # The reference failing a prompt is not held against the candidate
+    assert compare_params(reference, [[0.02, 0.5, 0.1], [0.5, 0.5, 0.5]], tolerance=0.02)["passed"]
+
+    report = compare_params([[0.02, 0.5, 0.1], [0.03, 0.4, 0.05]], [[0.02, 0.5, 0.1], None], tolerance=0.02)
+    assert report["lost"] == 1
+    assert not report["passed"]
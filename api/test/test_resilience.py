@@ -0,0 +1,244 @@
+"""Resilient LLM client tests: deadline, retries, hedging and circuit breaker"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.models import SimulationResult
+from app.utils import gpt_utils
+from app.utils.resilience import CircuitBreaker, CircuitOpenError, ResilientCall
+
+SIMULATION = SimulationResult(
+    total_impressions=10000, total_clicks=50, total_landings=35, total_engagements=15, total_conversions=2,
+    roi_fit_score=0.02, roi_fit_tag="Low market fit"
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _call(**kwargs):
+    return ResilientCall("test", CircuitBreaker("test", failure_threshold=2, reset_seconds=0.1), backoff_ms=1, **kwargs)
+
+
+def test_retries_transient_errors_but_not_client_errors():
+    call = _call(retries=2)
+    attempts = []
+
+    async def flaky(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise StatusError(503)
+        return "ok"
+
+    assert asyncio.run(call.run(flaky)) == "ok"
+    assert len(attempts) == 3
+    assert attempts[1] < attempts[0]  # later attempts get what is left of the deadline
+
+    rejected = []
+
+    async def bad_request(timeout):
+        rejected.append(1)
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        asyncio.run(call.run(bad_request))
+    assert rejected == [1]
+    assert call.breaker.state == "closed"
+
+
+def test_programming_errors_are_not_retried():
+    call = _call(retries=2)
+    attempts = []
+
+    async def broken(timeout):
+        attempts.append(1)
+        raise KeyError("choices")
+
+    with pytest.raises(KeyError):
+        asyncio.run(call.run(broken))
+    assert attempts == [1]
+
+
+def test_deadline_bounds_latency_of_a_hung_upstream():
+    call = _call(deadline=0.2, retries=5)
+
+    async def hang(timeout):
+        await asyncio.sleep(10)
+
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        asyncio.run(call.run(hang))
+    assert time.perf_counter() - started < 0.5
+
+
+def test_hedge_answers_when_the_first_call_is_slow():
+    call = _call(hedge=True, hedge_quantile=0.95)
+    for _ in range(call.latencies.min_samples):
+        call.latencies.add(0.01)
+    calls = []
+
+    async def sometimes_slow(timeout):
+        calls.append(1)
+        await asyncio.sleep(5 if len(calls) == 1 else 0.01)
+        return len(calls)
+
+    started = time.perf_counter()
+    assert asyncio.run(call.run(sometimes_slow)) == 2
+    assert time.perf_counter() - started < 0.5
+
+
+def test_breaker_opens_then_probes_and_closes():
+    call = _call(retries=0)
+
+    async def fail(timeout):
+        raise ConnectionError("upstream down")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            asyncio.run(call.run(fail))
+    assert call.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call.run(fail))
+
+    time.sleep(0.1)
+
+    async def succeed(timeout):
+        return "ok"
+
+    assert asyncio.run(call.run(succeed)) == "ok"
+    assert call.breaker.state == "closed"
+
+
+def test_cancelled_probe_frees_the_half_open_slot():
+    call = _call(retries=0)
+
+    async def fail(timeout):
+        raise ConnectionError("upstream down")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            asyncio.run(call.run(fail))
+    time.sleep(0.1)
+
+    async def cancel_probe():
+        probe = asyncio.ensure_future(call.run(lambda timeout: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancel_probe())
+    assert call.breaker.state == "half_open"
+
+    async def succeed(timeout):
+        return "ok"
+
+    # Without the release, every later call would be refused as a second concurrent probe
+    assert asyncio.run(call.run(succeed)) == "ok"
+    assert call.breaker.state == "closed"
+
+
+def test_stalled_stream_falls_back_within_the_deadline(monkeypatch):
+    class StalledStream:
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            await asyncio.sleep(10)
+
+    async def create(**kwargs):
+        return StalledStream()
+
+    monkeypatch.setattr(gpt_utils, "insight_stream_call", ResilientCall("insight_stream", CircuitBreaker("test"), deadline=0.2, backoff_ms=1))
+    monkeypatch.setattr(gpt_utils, "get_async_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+
+    async def collect():
+        return [chunk async for chunk in gpt_utils.astream_chatgpt_marketing_insight(SIMULATION, "Unseen company", "Signups")]
+
+    started = time.perf_counter()
+    chunks = asyncio.run(collect())
+    assert time.perf_counter() - started < 0.5
+    assert "**Bottleneck:** Low click-through rate" in "".join(chunks)
+
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def test_long_stream_outlives_the_deadline_but_not_an_idle_gap(monkeypatch):
+    class SlowStream:
+        def __init__(self, gaps):
+            self.gaps = list(gaps)
+            self.closed = False
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            if not self.gaps:
+                raise StopAsyncIteration
+            await asyncio.sleep(self.gaps.pop(0))
+            return _chunk("word ")
+
+        async def close(self):
+            self.closed = True
+
+    streams = []
+
+    async def create(**kwargs):
+        streams.append(SlowStream(gaps))
+        return streams[-1]
+
+    monkeypatch.setattr(gpt_utils, "insight_stream_call", ResilientCall("insight_stream", CircuitBreaker("test"), deadline=0.2, backoff_ms=1))
+    monkeypatch.setattr(gpt_utils, "LLM_STREAM_IDLE_TIMEOUT_SECONDS", 0.1)
+    monkeypatch.setattr(gpt_utils, "get_async_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+
+    async def collect():
+        chunks = []
+        async for chunk in gpt_utils.astream_chatgpt_marketing_insight(SIMULATION, "Unseen company", "Signups"):
+            # The consumer is slow, but the stream gave up its concurrency slot after the first text
+            assert gpt_utils._llm_semaphore()._value == gpt_utils.LLM_MAX_CONCURRENCY
+            await asyncio.sleep(0.02)
+            chunks.append(chunk)
+        return chunks
+
+    # Eight steady chunks take well past the 0.2 s deadline
+    gaps = [0.05] * 8
+    assert asyncio.run(collect()) == ["word "] * 8
+    assert streams[-1].closed
+
+    # A gap longer than the idle timeout after text was sent fails the stream rather than falling back
+    gaps = [0.01, 0.3]
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(collect())
+    assert streams[-1].closed
+
+
+def test_openai_paths_fall_back_when_degraded(monkeypatch):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        raise ConnectionError("upstream down")
+
+    breaker = CircuitBreaker("openai", failure_threshold=1, reset_seconds=60)
+    monkeypatch.setattr(gpt_utils, "openai_breaker", breaker)
+    monkeypatch.setattr(gpt_utils, "params_call", ResilientCall("params", breaker, retries=1, backoff_ms=1))
+    monkeypatch.setattr(gpt_utils, "insight_call", ResilientCall("insight", breaker, retries=1, backoff_ms=1))
+    monkeypatch.setattr(gpt_utils, "get_async_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+
+    params = asyncio.run(gpt_utils.aget_simulation_params_from_context("Unseen company", "Signups"))
+    assert params == gpt_utils.DEFAULT_PARAMS
+    assert len(calls) == 2
+
+    # The failed call opened the breaker: the insight falls back without calling out
+    insight = asyncio.run(gpt_utils.aget_chatgpt_marketing_insight(SIMULATION, "Unseen company", "Signups"))
+    assert len(calls) == 2
+    assert breaker.state == "open"
+    assert "**Bottleneck:** Low click-through rate" in insight
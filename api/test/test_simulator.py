@@ -0,0 +1,202 @@
+"""Marketing Strategist Simulator Tests"""
+
+import math
+
+import numpy as np
+import pytest
+
+from app.simulator import simulator
+from app.simulator.pool import pool_stats, shutdown_pool, start_pool
+from app.simulator.simulator import (
+    run_adaptive_simulation,
+    run_market_fit_simulation,
+    run_market_fit_simulation_batch,
+    clipped_normal_mean,
+    stage_probabilities,
+)
+
+PARAMS = {"ctr": 0.05, "engagement": 0.4, "conversion": 0.1, "roi_threshold": 0.5}
+
+
+def test_clipped_normal_mean_matches_sampling():
+    """Closed-form clipped mean agrees with brute-force sampling, including heavy clipping"""
+    rng = np.random.default_rng(0)
+    for loc, scale in [(0.015, 0.01), (0.7, 0.05), (0.95, 0.1), (0.01, 0.02)]:
+        sampled = np.clip(rng.normal(loc, scale, 1_000_000), 0, 1).mean()
+        assert clipped_normal_mean(loc, scale) == pytest.approx(sampled, abs=2e-4)
+
+
+def test_array_erf_matches_math_erf():
+    x = np.linspace(-10, 10, 20001)
+    np.testing.assert_allclose(simulator._erf(x), [math.erf(value) for value in x], rtol=1e-14, atol=1e-15)
+    # Scalar and array inputs take different paths to the same values
+    loc = np.array([0.015, 0.7, 0.95, -0.5, 1.5])
+    scale = np.array([0.01, 0.05, 0.1, 0.1, 0.2])
+    np.testing.assert_allclose(clipped_normal_mean(loc, scale), [clipped_normal_mean(l, s) for l, s in zip(loc, scale)], rtol=1e-12)
+
+
+@pytest.mark.parametrize("engine", ["per_impression", "aggregate"])
+def test_sampling_engines_match_analytic_moments(engine):
+    """Sampled conversions have the analytic mean and variance"""
+    rng = np.random.default_rng(1)
+    analytic = run_market_fit_simulation(20000, engine="analytic", **PARAMS)
+    expected = analytic.total_conversions
+    variance = analytic.stage_variances["total_conversions"]
+
+    conversions = np.array([
+        run_market_fit_simulation(20000, engine=engine, rng=rng, **PARAMS).total_conversions
+        for _ in range(300)
+    ])
+    assert conversions.mean() == pytest.approx(expected, abs=4 * np.sqrt(variance / 300) + 1)
+    assert conversions.var() == pytest.approx(variance, rel=0.25)
+
+
+def test_analytic_engine_is_deterministic():
+    result = run_market_fit_simulation(10000, engine="analytic", **PARAMS)
+    p_click, p_land, p_engage, p_convert = stage_probabilities(0.05, 0.4, 0.1)
+    assert result.total_clicks == round(10000 * p_click)
+    assert result.total_conversions == round(10000 * p_click * p_land * p_engage * p_convert)
+    assert result == run_market_fit_simulation(10000, engine="analytic", **PARAMS)
+
+
+def test_aggregate_engine_handles_huge_impression_counts():
+    result = run_market_fit_simulation(10**9, engine="aggregate", **PARAMS)
+    assert result.total_impressions == 10**9
+    assert result.total_clicks >= result.total_landings >= result.total_engagements >= result.total_conversions > 0
+
+
+def test_unknown_engine_rejected():
+    with pytest.raises(ValueError):
+        run_market_fit_simulation(100, engine="quantum", **PARAMS)
+
+
+@pytest.mark.parametrize("engine", ["per_impression", "aggregate", "analytic"])
+def test_batch_matches_grid_shape_and_single_runs(engine):
+    ctr, engagement, conversion = np.meshgrid([0.02, 0.05, 0.1], [0.3, 0.6], [0.05, 0.2], indexing="ij")
+    batch = run_market_fit_simulation_batch(5000, ctr, engagement, conversion, 0.5, engine=engine, rng=2)
+
+    assert batch["total_conversions"].shape == (3, 2, 2)
+    assert np.all(batch["total_clicks"] >= batch["total_conversions"])
+    single = run_market_fit_simulation(5000, 0.1, 0.6, 0.2, 0.5, engine="analytic")
+    assert batch["total_conversions"][2, 1, 1] == pytest.approx(single.total_conversions, abs=5 * np.sqrt(single.stage_variances["total_conversions"]) + 1)
+    assert batch["roi_fit_tag"][2, 1, 1] == single.roi_fit_tag
+
+
+def test_per_impression_batch_chunks_long_rows(monkeypatch):
+    # More impressions than BATCH_CHUNK_ELEMENTS: every draw stays within the chunk size
+    monkeypatch.setattr(simulator, "BATCH_CHUNK_ELEMENTS", 1000)
+    rng = np.random.default_rng(3)
+    sizes = []
+
+    class RecordingRng:
+        def normal(self, loc, scale, size):
+            sizes.append(size)
+            return rng.normal(loc, scale, size)
+
+        def binomial(self, n, p):
+            return rng.binomial(n, p)
+
+    ctr = np.array([0.05, 0.1])
+    counts = simulator._simulate_per_impression_chunk(RecordingRng(), 4500, ctr, np.full(2, 0.4), np.full(2, 0.1))
+    assert max(rows * width for rows, width in sizes) <= 1000
+    assert sum(width for _, width in sizes[::4]) == 4500
+
+    expected = run_market_fit_simulation_batch(4500, ctr, 0.4, 0.1, 0.5, engine="analytic")
+    variance = expected["stage_variances"]["total_clicks"]
+    np.testing.assert_allclose(counts["total_clicks"], expected["total_clicks"], atol=5 * np.sqrt(variance.max()) + 1)
+
+
+def test_batch_analytic_matches_scalar_engine():
+    ctr = np.linspace(0.005, 0.2, 50)
+    batch = run_market_fit_simulation_batch(10000, ctr, 0.5, 0.1, 0.3, engine="analytic")
+    for i in (0, 25, 49):
+        single = run_market_fit_simulation(10000, float(ctr[i]), 0.5, 0.1, 0.3, engine="analytic")
+        assert batch["total_conversions"][i] == single.total_conversions
+        assert batch["roi_fit_score"][i] == single.roi_fit_score
+
+
+def test_adaptive_spends_samples_where_conversion_is_rare():
+    # A threshold at the true rate keeps the tag unsettled, leaving precision as the stopping rule
+    def true_score(*rates):
+        return float(np.prod(stage_probabilities(*rates))) * 100
+
+    rare = run_adaptive_simulation(0.02, 0.4, 0.05, roi_threshold=true_score(0.02, 0.4, 0.05), engine="aggregate", target_half_width=0.1, rng=3)
+    common = run_adaptive_simulation(0.2, 0.8, 0.5, roi_threshold=true_score(0.2, 0.8, 0.5), engine="aggregate", target_half_width=0.1, rng=3)
+
+    assert rare.stopping_reason == common.stopping_reason == "precision"
+    assert rare.total_impressions > 10 * common.total_impressions
+    for result in (rare, common):
+        low, high = result.confidence_interval
+        assert low <= result.roi_fit_score <= high
+        assert (high - low) / 2 <= 0.1 * result.roi_fit_score + 0.01
+
+
+def test_adaptive_interval_covers_analytic_rate():
+    rng = np.random.default_rng(4)
+    expected = run_market_fit_simulation(10000, engine="analytic", **PARAMS).roi_fit_score
+    misses = 0
+    for _ in range(40):
+        low, high = run_adaptive_simulation(engine="aggregate", target_half_width=0.05, rng=rng, **{**PARAMS, "roi_threshold": 50}).confidence_interval
+        misses += not (low <= expected <= high)
+    assert misses <= 4
+
+
+def test_adaptive_stops_once_decision_is_settled():
+    result = run_adaptive_simulation(0.05, 0.4, 0.1, roi_threshold=5.0, engine="per_impression", target_half_width=0.001, max_impressions=200000, rng=5)
+    assert result.stopping_reason == "decision"
+    assert result.roi_fit_tag == "Low market fit"
+    assert result.confidence_interval[1] < 5.0
+    assert result.total_impressions < 200000
+
+
+def test_adaptive_caps_impressions_and_rejects_analytic():
+    result = run_adaptive_simulation(0.001, 0.1, 0.01, roi_threshold=0.001, engine="aggregate", target_half_width=0.001, max_impressions=50000, rng=6)
+    assert result.total_impressions == 50000
+    assert result.stopping_reason == "max_impressions"
+    with pytest.raises(ValueError):
+        run_adaptive_simulation(engine="analytic", **PARAMS)
+
+
+@pytest.mark.parametrize("engine", ["per_impression", "aggregate"])
+def test_seed_reproduces_results_and_is_echoed(engine):
+    first = run_market_fit_simulation(20000, engine=engine, rng=42, **PARAMS)
+    assert first.seed == 42
+    assert run_market_fit_simulation(20000, engine=engine, rng=42, **PARAMS) == first
+    assert run_market_fit_simulation(20000, engine=engine, rng=43, **PARAMS) != first
+
+    unseeded = run_market_fit_simulation(20000, engine=engine, **PARAMS)
+    assert unseeded.seed is not None
+    assert run_market_fit_simulation(20000, engine=engine, rng=unseeded.seed, **PARAMS) == unseeded
+
+
+@pytest.mark.parametrize("engine", ["per_impression", "aggregate"])
+def test_batch_is_identical_for_any_worker_count(engine, monkeypatch):
+    # Small chunks so the grid is split across several spawned generators
+    monkeypatch.setattr(simulator, "BATCH_CHUNK_ELEMENTS", 2000)
+    ctr = np.linspace(0.01, 0.2, 40)
+    serial = run_market_fit_simulation_batch(500, ctr, 0.5, 0.1, 0.3, engine=engine, rng=7, workers=1)
+    threaded = run_market_fit_simulation_batch(500, ctr, 0.5, 0.1, 0.3, engine=engine, rng=7, workers=4)
+    assert serial["seed"] == threaded["seed"] == 7
+    for key in ("total_clicks", "total_conversions"):
+        np.testing.assert_array_equal(serial[key], threaded[key])
+
+
+def test_process_pool_shards_match_inline_run(monkeypatch):
+    # Only the shard size and batch chunking are patched: both are decided in this process.
+    # Spawned workers see module defaults, so per-shard chunking must stay at its default.
+    monkeypatch.setattr(simulator, "SIMULATION_SHARD_IMPRESSIONS", 50_000)
+    inline = run_market_fit_simulation(230_000, engine="per_impression", rng=11, **PARAMS)
+    monkeypatch.setattr(simulator, "BATCH_CHUNK_ELEMENTS", 2000)
+    ctr = np.linspace(0.01, 0.2, 40)
+    inline_batch = run_market_fit_simulation_batch(500, ctr, 0.5, 0.1, 0.3, engine="per_impression", rng=12)
+
+    start_pool(2)
+    try:
+        assert pool_stats() == {"running": True, "processes": 2}
+        pooled_batch = run_market_fit_simulation_batch(500, ctr, 0.5, 0.1, 0.3, engine="per_impression", rng=12)
+        monkeypatch.setattr(simulator, "BATCH_CHUNK_ELEMENTS", 1_000_000)
+        assert run_market_fit_simulation(230_000, engine="per_impression", rng=11, **PARAMS) == inline
+    finally:
+        shutdown_pool()
+    np.testing.assert_array_equal(pooled_batch["total_conversions"], inline_batch["total_conversions"])
+    assert pool_stats()["running"] is False
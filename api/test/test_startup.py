@@ -0,0 +1,71 @@
+"""Cold-start, preload and readiness tests"""
+
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+def test_importing_app_skips_heavy_backends():
+    # A fresh interpreter, without an API key, so nothing earlier in the session leaks in
+    code = "import sys, app.main; print(sorted(m for m in ('openai', 'transformers', 'torch') if m in sys.modules))"
+    env = {"PATH": "", "OPENAI_API_KEY": ""}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, cwd=main.__file__.rsplit("/app/", 1)[0])
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_health_and_ready_without_preload():
+    client = TestClient(main.app)
+    assert client.get("/health").json() == {"status": "ok"}
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["backends"]["huggingface"]["preload"] == main._hf_preload["state"]
+
+
+def test_preload_warms_model_and_gates_readiness(monkeypatch):
+    stats = {"loaded": False, "model": None, "load_seconds": None, "warmup_seconds": None}
+
+    def warm_up(run_generation):
+        time.sleep(0.2)
+        stats.update(loaded=True, model="stub", load_seconds=0.15, warmup_seconds=0.05 if run_generation else None)
+        return stats
+
+    fake_hf = SimpleNamespace(warm_up_hf_model=warm_up, get_hf_load_stats=lambda: dict(stats))
+    monkeypatch.setattr(main, "_hf_utils", lambda: fake_hf)
+    monkeypatch.setitem(sys.modules, "app.utils.hf_utils", fake_hf)
+    monkeypatch.setitem(main._hf_preload, "state", "pending")
+    monkeypatch.setitem(main._hf_preload, "error", None)
+
+    with TestClient(main.app) as client:
+        assert client.get("/ready").status_code == 503
+        deadline = time.time() + 5
+        while client.get("/ready").status_code != 200 and time.time() < deadline:
+            time.sleep(0.02)
+        body = client.get("/ready").json()
+
+    assert body["ready"] is True
+    assert body["backends"]["huggingface"]["loaded"] is True
+    assert body["backends"]["huggingface"]["warmup_seconds"] == 0.05
+
+
+def test_failed_preload_reports_error(monkeypatch):
+    def broken():
+        raise ImportError("no torch")
+
+    monkeypatch.setattr(main, "_hf_utils", broken)
+    monkeypatch.setitem(main._hf_preload, "state", "pending")
+    monkeypatch.setitem(main._hf_preload, "error", None)
+
+    with TestClient(main.app) as client:
+        deadline = time.time() + 5
+        while main._hf_preload["state"] != "failed" and time.time() < deadline:
+            time.sleep(0.02)
+        response = client.get("/ready")
+
+    assert response.status_code == 503
+    assert response.json()["backends"]["huggingface"]["error"] == "no torch"
@@ -0,0 +1,77 @@
+"""Structured parameter output tests: schema, validating parser and decoding grammar"""
+
+import json
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import gpt_utils, metrics
+from app.utils.cache import LLMCache, MemoryLRUCache
+from app.utils.structured import ParamsGrammar, ParamsParseError, extract_json_object, params_json_schema, parse_params
+
+VOCAB = list('{}"., :0123456789') + ["ctr", "engagement", "conversion", "roi_threshold", '{"', '": ', "0.", "05", ', "', "1.5", "99", " the", "<eos>"]
+EOS = VOCAB.index("<eos>")
+
+
+def test_extract_json_object_stops_at_the_balanced_brace():
+    text = 'Sure! {"ctr": 0.02, "note": "use {braces}"} and then {"ctr": 0.9}'
+    assert extract_json_object(text) == '{"ctr": 0.02, "note": "use {braces}"}'
+    assert extract_json_object("no object here") is None
+
+
+@pytest.mark.parametrize("text, reason", [
+    ("I think the CTR is about 2%", "no_json"),
+    ('{"ctr": 0.02, "engagement": }', "invalid_json"),
+    ('{"ctr": 0.02, "engagement": 0.4, "conversion": 1.7, "roi_threshold": 0.3}', "invalid_params"),
+    ('{"ctr": 0.02, "engagement": 0.4}', "invalid_params"),
+])
+def test_parse_failures_are_counted_by_reason(text, reason):
+    before = metrics.llm_parse_failures.value(backend="test", reason=reason)
+    with pytest.raises(ParamsParseError) as error:
+        parse_params(text, "test")
+    assert error.value.reason == reason
+    assert metrics.llm_parse_failures.value(backend="test", reason=reason) == before + 1
+
+
+def test_parse_accepts_valid_output_with_surrounding_text():
+    text = 'Here you go:\n{"ctr": 0.02, "engagement": 0.4, "conversion": 0.05, "roi_threshold": 0.3}\nGood luck'
+    assert parse_params(text, "test") == (0.02, 0.4, 0.05, 0.3)
+
+
+def test_grammar_only_admits_valid_parameter_objects():
+    grammar = ParamsGrammar(VOCAB, eos_token_ids=[EOS])
+    for seed in range(100):
+        rng = random.Random(seed)
+        text = ""
+        while not grammar.done(text):
+            state, allowed = grammar.allowed(text)
+            assert allowed, text
+            text += VOCAB[rng.choice(allowed)]
+        assert parse_params(text, "test")
+
+    assert grammar.allowed('{"ctr": 0.02, "engagement": 0.4, "conversion": 0.05, "roi_threshold": 0.3}')[1] == (EOS,)
+    # After a leading 1 only zero decimals keep the value a probability
+    _, allowed = grammar.allowed('{"ctr": 1.')
+    assert {VOCAB[i] for i in allowed} == {"0"}
+    assert grammar.allowed('{"ctr": 2')[0] is None
+
+
+def test_openai_requests_strict_schema_and_validates(monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        content = json.dumps({"ctr": 0.02, "engagement": 0.4, "conversion": 0.05, "roi_threshold": 3})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    monkeypatch.setattr(gpt_utils, "params_cache", LLMCache(MemoryLRUCache(10, 60)))
+    monkeypatch.setattr(gpt_utils, "get_client", lambda: SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+
+    # roi_threshold 3 is out of range: rejected, and defaults are used instead
+    assert gpt_utils.get_simulation_params_from_context("A SaaS startup", "Signups") == gpt_utils.DEFAULT_PARAMS
+    response_format = calls[0]["response_format"]
+    assert response_format["type"] == "json_schema"
+    assert response_format["json_schema"]["schema"] == params_json_schema()
+    assert params_json_schema()["required"] == ["ctr", "engagement", "conversion", "roi_threshold"]
+    assert params_json_schema()["additionalProperties"] is False